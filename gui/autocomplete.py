@@ -0,0 +1,151 @@
+"""
+入力候補（オートコンプリート）GUI
+テキスト欄の下に候補の一覧を表示し、↑↓キーで選択、Enter・クリックで確定、Escで閉じる
+候補の取得は入力のたびに行う（取得する関数はミリ秒以下で返すこと）
+"""
+import logging
+import tkinter as tk
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 候補の取得を行わないキー（候補の操作・確定用。素材・加工方法のインクリメンタルサーチでも使用）
+IGNORED_KEYS = {"Up", "Down", "Return", "KP_Enter", "Tab", "Escape",
+                "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+
+class AutocompletePopup:
+    """テキスト欄の入力候補を表示するクラス"""
+
+    # 一度に表示する候補の行数
+    VISIBLE_ROWS = 8
+
+    def __init__(self, entry: tk.Entry, variable: tk.StringVar, fetch: Callable[[str], List[str]],
+                 on_select: Optional[Callable[[str], None]] = None):
+        """
+        fetch: 入力中の文字列から候補の一覧を返す関数
+        on_select: 候補を確定した時に呼び出す関数
+        """
+        self.entry = entry
+        self.variable = variable
+        self.fetch = fetch
+        self.on_select = on_select
+        self.window: Optional[tk.Toplevel] = None
+        self.listbox: Optional[tk.Listbox] = None
+
+        entry.bind("<KeyRelease>", self._on_key_release, add="+")
+        entry.bind("<Down>", lambda e: self._move(1))
+        entry.bind("<Up>", lambda e: self._move(-1))
+        entry.bind("<Return>", self._on_return)
+        entry.bind("<KP_Enter>", self._on_return)
+        entry.bind("<Escape>", self._on_escape)
+        # 候補のクリックが先に処理されるよう、フォーカスが外れてから少し待って閉じる
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self._hide_unless_focused), add="+")
+
+    def is_visible(self) -> bool:
+        """候補を表示中かチェック"""
+        return self.window is not None
+
+    def _on_key_release(self, event):
+        """入力に合わせて候補を更新"""
+        if event.keysym in IGNORED_KEYS:
+            return
+        self.refresh()
+
+    def refresh(self):
+        """現在の入力の候補を表示（候補がない・入力と同じ1件だけの場合は閉じる）"""
+        text = self.variable.get()
+        try:
+            candidates = self.fetch(text)
+        except Exception as e:
+            logger.warning(f"入力候補を取得できませんでした: {e}")
+            candidates = []
+        if not candidates or candidates == [text]:
+            self.hide()
+            return
+        self._show(candidates)
+
+    def _show(self, candidates: List[str]):
+        """候補の一覧をテキスト欄の下に表示"""
+        if self.window is None:
+            self.window = tk.Toplevel(self.entry)
+            self.window.overrideredirect(True)
+            self.listbox = tk.Listbox(
+                self.window,
+                font=("SF Pro Display", 11),
+                bg="#ffffff",
+                fg="#1f2937",
+                selectbackground="#3b82f6",
+                selectforeground="#ffffff",
+                relief="solid",
+                bd=1,
+                activestyle="none",
+                exportselection=False
+            )
+            self.listbox.pack(fill="both", expand=True)
+            self.listbox.bind("<ButtonRelease-1>", self._on_click)
+        self.listbox.delete(0, "end")
+        for candidate in candidates:
+            self.listbox.insert("end", candidate)
+        self.listbox.configure(height=min(len(candidates), self.VISIBLE_ROWS))
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self.window.geometry(f"{self.entry.winfo_width()}x{self.listbox.winfo_reqheight()}+{x}+{y}")
+        self.window.lift()
+
+    def hide(self):
+        """候補の一覧を閉じる"""
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+            self.listbox = None
+
+    def _hide_unless_focused(self):
+        """テキスト欄にフォーカスが戻っていなければ閉じる"""
+        try:
+            if self.entry.focus_get() is not self.entry:
+                self.hide()
+        except (KeyError, tk.TclError):
+            self.hide()
+
+    def _move(self, step: int):
+        """選択中の候補を移動（候補の表示中は画面のスクロールを行わない）"""
+        if self.window is None:
+            return None
+        size = self.listbox.size()
+        selection = self.listbox.curselection()
+        index = (selection[0] + step) % size if selection else (0 if step > 0 else size - 1)
+        self.listbox.selection_clear(0, "end")
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return "break"
+
+    def _on_return(self, event):
+        """選択中の候補を確定（候補を選択していない場合は通常のEnterの処理を行う）"""
+        if self.window is None or not self.listbox.curselection():
+            self.hide()
+            return None
+        self._select(self.listbox.get(self.listbox.curselection()[0]))
+        return "break"
+
+    def _on_escape(self, event):
+        """候補の一覧を閉じる"""
+        if self.window is None:
+            return None
+        self.hide()
+        return "break"
+
+    def _on_click(self, event):
+        """クリックした候補を確定"""
+        index = self.listbox.nearest(event.y)
+        if index >= 0:
+            self._select(self.listbox.get(index))
+
+    def _select(self, value: str):
+        """候補を入力欄に設定"""
+        self.hide()
+        self.variable.set(value)
+        self.entry.icursor("end")
+        self.entry.focus_set()
+        if self.on_select:
+            self.on_select(value)
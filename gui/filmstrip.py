@@ -0,0 +1,341 @@
+"""
+サムネイル一覧（フィルムストリップ）GUI
+フォルダ内の画像を横一列のサムネイルで表示し、クリックした画像に移動する
+表示中の範囲のサムネイルだけを描画し、スクロール時は表示枠（Canvasの図形とPhotoImage）を使い回す
+"""
+import tkinter as tk
+from typing import Callable, List, Optional, Set
+from utils.coalescing_scheduler import CoalescingScheduler
+from utils.thumbnail_cache import THUMBNAIL_BACKGROUND, THUMBNAIL_SIZE, ThumbnailCache
+
+
+class _Slot:
+    """1枚分の表示枠（Canvasの図形とPhotoImage）"""
+
+    __slots__ = ('index', 'path', 'has_thumbnail', 'photo', 'frame_id', 'image_id', 'label_id')
+
+    def __init__(self):
+        self.index = -1  # 表示中の画像のインデックス（-1は未使用）
+        self.path: Optional[str] = None
+        self.has_thumbnail = False
+        self.photo = None
+        self.frame_id = None
+        self.image_id = None
+        self.label_id = None
+
+
+class Filmstrip:
+    """サムネイル一覧を管理するクラス"""
+
+    # 1枚分の表示枠のサイズ
+    CELL_WIDTH = THUMBNAIL_SIZE[0] + 14
+    CELL_HEIGHT = THUMBNAIL_SIZE[1] + 30
+
+    # 表示範囲の前後で先にサムネイルを作成しておく枚数
+    PREFETCH_CELLS = 20
+
+    # 枠線の色
+    CURRENT_COLOR = "#3b82f6"
+    RENAMED_COLOR = "#22c55e"
+    NORMAL_COLOR = "#e5e7eb"
+    SELECTED_COLOR = "#f59e0b"
+    SELECTED_FILL = "#fef3c7"
+
+    def __init__(self, parent_frame: tk.Frame):
+        self.parent_frame = parent_frame
+        self.select_callback: Optional[Callable[[int], None]] = None
+        self.selection_callback: Optional[Callable[[List[int]], None]] = None
+
+        self.image_files: List[str] = []
+        self.renamed: List[bool] = []
+        self.duplicates: Set[int] = set()  # 重複画像のインデックス
+        self.current_index = -1
+        # 複数選択（Ctrl/⌘+クリックで追加・解除、Shift+クリックで範囲選択）
+        self.selected: Set[int] = set()
+        self._selection_anchor: Optional[int] = None
+
+        self._slots: List[_Slot] = []
+        self._blank_image = None  # 未作成のサムネイルの代わりに表示する画像
+
+        self.canvas: Optional[tk.Canvas] = None
+        self.scrollbar: Optional[tk.Scrollbar] = None
+        self._create_widgets()
+
+        self.thumbnail_cache = ThumbnailCache(self.canvas, self._on_thumbnail_ready)
+        # スクロール中の再配置は1フレームに1回にまとめる
+        self.layout_scheduler = CoalescingScheduler(self.canvas)
+
+    def _create_widgets(self):
+        """サムネイル一覧のウィジェットを作成"""
+        container = tk.Frame(self.parent_frame, bg="#ffffff")
+        container.pack(side="bottom", fill="x", padx=20, pady=(0, 10))
+
+        self.canvas = tk.Canvas(
+            container,
+            height=self.CELL_HEIGHT,
+            bg="#ffffff",
+            highlightthickness=0,
+            bd=0,
+            xscrollincrement=self.CELL_WIDTH
+        )
+        self.scrollbar = tk.Scrollbar(container, orient="horizontal", command=self.canvas.xview)
+        self.canvas.configure(xscrollcommand=self._on_scroll)
+
+        self.canvas.pack(side="top", fill="x")
+        self.scrollbar.pack(side="bottom", fill="x")
+
+        self.canvas.bind("<Configure>", lambda e: self._request_layout())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Control-Button-1>", self._on_toggle_click)
+        self.canvas.bind("<Shift-Button-1>", self._on_range_click)
+        if self.canvas.tk.call("tk", "windowingsystem") == "aqua":
+            self.canvas.bind("<Command-Button-1>", self._on_toggle_click)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Shift-MouseWheel>", self._on_mousewheel)
+
+    def set_select_callback(self, callback: Callable[[int], None]):
+        """サムネイルがクリックされた時のコールバックを設定（引数は画像のインデックス）"""
+        self.select_callback = callback
+
+    def set_selection_callback(self, callback: Callable[[List[int]], None]):
+        """複数選択が変わった時のコールバックを設定（引数は選択中のインデックスの昇順リスト）"""
+        self.selection_callback = callback
+
+    def get_selection(self) -> List[int]:
+        """選択中の画像のインデックスを昇順で取得"""
+        return sorted(self.selected)
+
+    def clear_selection(self):
+        """複数選択を解除"""
+        self._set_selection(set())
+
+    def set_files(self, image_files: List[str], renamed: List[bool]):
+        """表示する画像の一覧を設定（フォルダを選択した時）"""
+        self._selection_anchor = None
+        self._set_selection(set())
+        self.thumbnail_cache.clear()
+        self.image_files = list(image_files)
+        self.renamed = list(renamed)
+        self.duplicates = set()
+        self.current_index = -1
+        for slot in self._slots:
+            self._release_slot(slot)
+        self.canvas.configure(scrollregion=(0, 0, len(self.image_files) * self.CELL_WIDTH, self.CELL_HEIGHT))
+        self.canvas.xview_moveto(0)
+        self._request_layout()
+
+    def set_duplicates(self, duplicates: Set[int]):
+        """重複画像のインデックスを設定（ラベルに印を付ける）"""
+        self.duplicates = set(duplicates)
+        for slot in self._slots:
+            if slot.index >= 0:
+                self._update_slot_marks(slot)
+
+    def update_file(self, index: int, image_path: str, renamed: bool):
+        """画像のパスとリネーム済みの状態を更新（リネームした時）"""
+        if not 0 <= index < len(self.image_files):
+            return
+        self.thumbnail_cache.rename(self.image_files[index], image_path)
+        self.image_files[index] = image_path
+        self.renamed[index] = renamed
+        for slot in self._slots:
+            if slot.index == index:
+                slot.path = image_path
+                self._update_slot_marks(slot)
+
+    def set_current(self, index: int):
+        """現在の画像を強調表示し、表示範囲外の場合はスクロールして表示"""
+        previous = self.current_index
+        self.current_index = index
+        for slot in self._slots:
+            if slot.index in (previous, index):
+                self._update_slot_marks(slot)
+
+        if not self.image_files:
+            return
+        visible = max(1, self.canvas.winfo_width() // self.CELL_WIDTH)
+        first = int(self.canvas.canvasx(0) // self.CELL_WIDTH)
+        if index < first or index >= first + visible:
+            # 現在の画像が中央付近に来るようにスクロール
+            target = max(0, index - visible // 2)
+            self.canvas.xview_moveto(target / len(self.image_files))
+
+    def clear(self):
+        """表示をクリア"""
+        self.set_files([], [])
+
+    def _on_scroll(self, first: str, last: str):
+        """スクロール位置が変わった時の処理（スクロールバーを更新し、再配置を予約）"""
+        self.scrollbar.set(first, last)
+        self._request_layout()
+
+    def _on_mousewheel(self, event):
+        """マウスホイールで横にスクロール"""
+        # macOSではdeltaが小さい値になるため、最低1枚分はスクロールする
+        step = int(-1 * (event.delta / 120))
+        if step == 0:
+            step = -1 if event.delta > 0 else 1
+        self.canvas.xview_scroll(step, "units")
+
+    def _index_at(self, event) -> Optional[int]:
+        """クリックされた位置の画像のインデックス（画像がない位置はNone）"""
+        index = int(self.canvas.canvasx(event.x) // self.CELL_WIDTH)
+        return index if 0 <= index < len(self.image_files) else None
+
+    def _on_click(self, event):
+        """クリックされたサムネイルの画像に移動（複数選択は解除）"""
+        index = self._index_at(event)
+        if index is None:
+            return
+        self._selection_anchor = index
+        self._set_selection(set())
+        if self.select_callback:
+            self.select_callback(index)
+
+    def _on_toggle_click(self, event):
+        """クリックされた画像を選択に追加、または選択を解除"""
+        index = self._index_at(event)
+        if index is None:
+            return
+        selected = set(self.selected)
+        if not selected and 0 <= self.current_index != index:
+            # 最初の追加選択では現在の画像も選択に含める
+            selected.add(self.current_index)
+        selected ^= {index}
+        self._selection_anchor = index
+        self._set_selection(selected)
+
+    def _on_range_click(self, event):
+        """前回クリックした画像（なければ現在の画像）からクリックした画像までを選択"""
+        index = self._index_at(event)
+        if index is None:
+            return
+        anchor = self._selection_anchor
+        if anchor is None:
+            anchor = max(self.current_index, 0)
+        low, high = min(anchor, index), max(anchor, index)
+        self._set_selection(self.selected | set(range(low, high + 1)))
+
+    def _set_selection(self, selected: Set[int]):
+        """選択を変更し、表示中の枠の表示とコールバックを更新"""
+        if selected == self.selected:
+            return
+        changed = self.selected ^ selected
+        self.selected = selected
+        for slot in self._slots:
+            if slot.index in changed:
+                self._update_slot_marks(slot)
+        if self.selection_callback:
+            self.selection_callback(self.get_selection())
+
+    def _request_layout(self):
+        """表示枠の再配置を予約"""
+        self.layout_scheduler.schedule(self._layout)
+
+    def _layout(self, _fields=None):
+        """表示範囲の画像に表示枠を割り当て、サムネイルの作成を要求"""
+        total = len(self.image_files)
+        first = max(0, int(self.canvas.canvasx(0) // self.CELL_WIDTH))
+        count = self.canvas.winfo_width() // self.CELL_WIDTH + 2
+
+        while len(self._slots) < count:
+            self._slots.append(self._create_slot())
+
+        # 表示範囲から外れた枠を、新たに表示範囲に入った画像に割り当てる
+        wanted = set(range(first, min(first + count, total)))
+        free_slots = []
+        for slot in self._slots:
+            if slot.index in wanted:
+                wanted.discard(slot.index)
+            else:
+                free_slots.append(slot)
+        for index in sorted(wanted):
+            self._assign_slot(free_slots.pop(), index)
+        for slot in free_slots:
+            if slot.index != -1:
+                self._release_slot(slot)
+
+        # 表示範囲の画像を優先し、前後の画像も先に作成しておく
+        last = min(first + count, total)
+        prefetch_before = range(max(0, first - self.PREFETCH_CELLS), first)
+        prefetch_after = range(last, min(total, last + self.PREFETCH_CELLS))
+        order = list(range(first, last)) + list(prefetch_after) + list(reversed(prefetch_before))
+        self.thumbnail_cache.request([self.image_files[index] for index in order])
+
+    def _create_slot(self) -> _Slot:
+        """表示枠を1つ作成（最初は非表示）"""
+        from PIL import Image, ImageTk
+        if self._blank_image is None:
+            self._blank_image = Image.new('RGB', THUMBNAIL_SIZE, THUMBNAIL_BACKGROUND)
+
+        slot = _Slot()
+        slot.photo = ImageTk.PhotoImage(self._blank_image)
+        slot.frame_id = self.canvas.create_rectangle(0, 0, 0, 0, outline=self.NORMAL_COLOR, width=2,
+                                                     state="hidden")
+        slot.image_id = self.canvas.create_image(0, 0, image=slot.photo, anchor="nw", state="hidden")
+        slot.label_id = self.canvas.create_text(0, 0, text="", font=("SF Pro Display", 9),
+                                                fill="#6b7280", anchor="n", state="hidden")
+        return slot
+
+    def _assign_slot(self, slot: _Slot, index: int):
+        """表示枠を指定した画像の位置に移動し、サムネイルを表示"""
+        slot.index = index
+        slot.path = self.image_files[index]
+        x = index * self.CELL_WIDTH + 7
+        self.canvas.coords(slot.frame_id, x - 3, 3, x + THUMBNAIL_SIZE[0] + 3, THUMBNAIL_SIZE[1] + 9)
+        self.canvas.coords(slot.image_id, x, 6)
+        self.canvas.coords(slot.label_id, x + THUMBNAIL_SIZE[0] // 2, THUMBNAIL_SIZE[1] + 12)
+        for item in (slot.frame_id, slot.image_id, slot.label_id):
+            self.canvas.itemconfigure(item, state="normal")
+        self._update_slot_thumbnail(slot)
+        self._update_slot_marks(slot)
+
+    def _release_slot(self, slot: _Slot):
+        """表示枠を未使用にして非表示にする"""
+        slot.index = -1
+        slot.path = None
+        for item in (slot.frame_id, slot.image_id, slot.label_id):
+            self.canvas.itemconfigure(item, state="hidden")
+
+    def _update_slot_thumbnail(self, slot: _Slot):
+        """表示枠のPhotoImageにサムネイル（未作成の場合は空白）を貼り付け"""
+        thumbnail = self.thumbnail_cache.get(slot.path)
+        if thumbnail is not None:
+            slot.photo.paste(thumbnail)
+            slot.has_thumbnail = True
+        elif slot.has_thumbnail:
+            slot.photo.paste(self._blank_image)
+            slot.has_thumbnail = False
+
+    def _update_slot_marks(self, slot: _Slot):
+        """枠線とラベルで現在の画像・リネーム済みの画像を表示"""
+        index = slot.index
+        renamed = self.renamed[index]
+        if index == self.current_index:
+            outline, width = self.CURRENT_COLOR, 3
+        elif renamed:
+            outline, width = self.RENAMED_COLOR, 2
+        else:
+            outline, width = self.NORMAL_COLOR, 2
+        if index in self.selected:
+            if index != self.current_index:
+                outline, width = self.SELECTED_COLOR, 3
+            fill = self.SELECTED_FILL
+        else:
+            fill = ""
+        self.canvas.itemconfigure(slot.frame_id, outline=outline, width=width, fill=fill)
+
+        label = f"✓ {index + 1}" if renamed else str(index + 1)
+        if index in self.duplicates:
+            label += " ≈"
+        if self.thumbnail_cache.has_failed(slot.path):
+            label += " ⚠"
+        self.canvas.itemconfigure(slot.label_id, text=label,
+                                  fill=self.RENAMED_COLOR if renamed else "#6b7280")
+
+    def _on_thumbnail_ready(self, image_path: str):
+        """サムネイルが作成された時、表示中の枠に貼り付け"""
+        for slot in self._slots:
+            if slot.path == image_path:
+                self._update_slot_thumbnail(slot)
+                self._update_slot_marks(slot)
@@ -4,7 +4,8 @@
 """
 import tkinter as tk
 from tkinter import ttk
-from typing import Optional, Callable
+from typing import Optional, Callable, List
+from gui.loupe import Loupe
 from utils.image_processor import ImageProcessor
 
 
@@ -22,12 +23,21 @@ class ImageViewer:
         # ウィジェットの参照
         self.image_label: Optional[tk.Label] = None
         self.progress_label: Optional[tk.Label] = None
+        self.warmup_label: Optional[tk.Label] = None
+        self.output_label: Optional[tk.Label] = None
         self.prev_button: Optional[tk.Button] = None
         self.next_button: Optional[tk.Button] = None
+        self.zoom_button: Optional[tk.Button] = None
         self.filename_label: Optional[tk.Label] = None
+        self.duplicate_label: Optional[tk.Label] = None
+        self.quality_label: Optional[tk.Label] = None
         
         # 現在の画像オブジェクト（参照を保持するため）
         self.current_image = None
+        self.current_path: Optional[str] = None
+        
+        # 拡大表示（等倍まで拡大してドラッグで移動）
+        self.loupe = Loupe(parent_frame)
         
         self._create_widgets()
     
@@ -57,6 +67,26 @@ class ImageViewer:
         )
         self.progress_label.pack(side="right")
         
+        # プレビュー先読みの進捗表示
+        self.warmup_label = tk.Label(
+            header_frame,
+            text="",
+            font=("SF Pro Display", 10),
+            fg="#6b7280",
+            bg="#ffffff"
+        )
+        self.warmup_label.pack(side="right", padx=(0, 12))
+        
+        # リネーム後の出力処理（派生画像の作成など）の残り件数
+        self.output_label = tk.Label(
+            header_frame,
+            text="",
+            font=("SF Pro Display", 10),
+            fg="#6b7280",
+            bg="#ffffff"
+        )
+        self.output_label.pack(side="right", padx=(0, 12))
+        
         # 現在のファイル名表示
         self.filename_label = tk.Label(
             self.parent_frame,
@@ -68,6 +98,26 @@ class ImageViewer:
         )
         self.filename_label.pack(pady=(0, 15), padx=20)
         
+        # 重複画像の注意表示（重複していない場合は非表示）
+        self.duplicate_label = tk.Label(
+            self.parent_frame,
+            text="",
+            font=("SF Pro Display", 10, "bold"),
+            fg="#d97706",
+            bg="#ffffff",
+            wraplength=500
+        )
+        
+        # 画質（ピンぼけ・露出）の注意表示（問題がない場合は非表示）
+        self.quality_label = tk.Label(
+            self.parent_frame,
+            text="",
+            font=("SF Pro Display", 10, "bold"),
+            fg="#dc2626",
+            bg="#ffffff",
+            wraplength=500
+        )
+        
         # 画像表示エリアのフレーム（カード風）
         image_frame = tk.Frame(
             self.parent_frame,
@@ -98,6 +148,8 @@ class ImageViewer:
             fg="#9ca3af"
         )
         self.image_label.pack(expand=True, fill="both", padx=15, pady=15)
+        # ダブルクリックで拡大表示
+        self.image_label.bind("<Double-Button-1>", lambda e: self.open_loupe())
         
         # ナビゲーションボタンのフレーム
         nav_frame = tk.Frame(self.parent_frame, bg="#ffffff")
@@ -121,6 +173,25 @@ class ImageViewer:
         )
         self.prev_button.pack(side="left", padx=15)
         
+        # 拡大表示ボタン
+        self.zoom_button = tk.Button(
+            nav_frame,
+            text="🔍 拡大",
+            font=("SF Pro Display", 11, "bold"),
+            bg="#f3f4f6",
+            fg="#1f2937",
+            activebackground="#e5e7eb",
+            activeforeground="#1f2937",
+            relief="flat",
+            bd=0,
+            padx=20,
+            pady=10,
+            cursor="hand2",
+            state="disabled",
+            command=self.open_loupe
+        )
+        self.zoom_button.pack(side="left", padx=15)
+        
         # 次へボタン
         self.next_button = tk.Button(
             nav_frame,
@@ -160,19 +231,31 @@ class ImageViewer:
         
         if photo_image:
             self.current_image = photo_image  # 参照を保持
+            self.current_path = image_path
             self.image_label.configure(
                 image=photo_image,
                 text="",
                 compound="center"
             )
+            self.zoom_button.configure(state="normal")
+            # 拡大表示中は表示する画像も切り替える
+            if self.loupe.is_open():
+                self.loupe.open(image_path)
         else:
-            self._show_placeholder("画像の読み込みに失敗しました")
+            self.current_path = None
+            self.zoom_button.configure(state="disabled")
+            self._show_placeholder(self.image_processor.last_error or "画像の読み込みに失敗しました")
         
         # ファイル名を表示
         import os
         filename = os.path.basename(image_path)
         self.filename_label.configure(text=filename)
     
+    def open_loupe(self):
+        """現在の画像を拡大表示"""
+        if self.current_path:
+            self.loupe.open(self.current_path)
+    
     def _show_placeholder(self, message: str):
         """プレースホルダー表示"""
         placeholder_image = self.image_processor.create_placeholder_image()
@@ -190,6 +273,41 @@ class ImageViewer:
         if self.progress_label:
             self.progress_label.configure(text=f"{current} / {total}")
     
+    def set_warmup_progress(self, done: int, total: int):
+        """プレビュー先読みの進捗を表示（完了したら非表示）"""
+        text = f"先読み {done} / {total}" if done < total else ""
+        if self.warmup_label.cget("text") != text:
+            self.warmup_label.configure(text=text)
+    
+    def set_output_backlog(self, backlog: int, failed: int, rates: Optional[List[str]] = None):
+        """リネーム後の出力処理の残り件数・処理速度と失敗件数を表示（どちらも0の場合は非表示）"""
+        parts = []
+        if backlog:
+            parts.append(f"出力 残り{backlog}件" + (f"（{', '.join(rates)}）" if rates else ""))
+        if failed:
+            parts.append(f"出力失敗 {failed}件")
+        text = " / ".join(parts)
+        if self.output_label.cget("text") != text:
+            self.output_label.configure(text=text, fg="#dc2626" if failed else "#6b7280")
+    
+    def set_duplicate_notice(self, text: str):
+        """重複画像の注意を表示（空文字の場合は非表示）"""
+        if text:
+            self.duplicate_label.configure(text=text)
+            if not self.duplicate_label.winfo_ismapped():
+                self.duplicate_label.pack(after=self.filename_label, pady=(0, 10), padx=20)
+        else:
+            self.duplicate_label.pack_forget()
+    
+    def set_quality_warnings(self, warnings: List[str]):
+        """画質の注意を表示（空の場合は非表示）"""
+        if warnings:
+            self.quality_label.configure(text="画質: " + " / ".join(warnings))
+            if not self.quality_label.winfo_ismapped():
+                self.quality_label.pack(after=self.filename_label, pady=(0, 10), padx=20)
+        else:
+            self.quality_label.pack_forget()
+    
     def update_navigation_buttons(self, has_prev: bool, has_next: bool):
         """ナビゲーションボタンの状態を更新"""
         if self.prev_button:
@@ -203,6 +321,9 @@ class ImageViewer:
     def clear_display(self):
         """表示をクリア"""
         self.current_image = None
+        self.current_path = None
+        self.zoom_button.configure(state="disabled")
+        self.loupe.close()
         self.image_label.configure(
             image="",
             text="画像を読み込んでください",
@@ -227,6 +348,9 @@ class ImageViewer:
     
     def show_completion_message(self):
         """完了メッセージを表示"""
+        self.current_path = None
+        self.zoom_button.configure(state="disabled")
+        self.loupe.close()
         self.image_label.configure(
             image="",
             text="すべての画像の処理が完了しました！\\n\\nお疲れさまでした。",
@@ -5,7 +5,20 @@
 import tkinter as tk
 from tkinter import ttk
 import re
-from typing import Dict, List, Optional, Callable
+from typing import Dict, Iterable, List, Optional, Callable
+from gui.autocomplete import IGNORED_KEYS, AutocompletePopup
+from utils.coalescing_scheduler import CoalescingScheduler
+
+
+# インクリメンタルサーチで候補に表示する最大件数
+TYPEAHEAD_LIMIT = 50
+
+# 未入力ハイライトの背景色
+HIGHLIGHT_BG = "#fef2f2"
+NORMAL_BG = "#f9fafb"
+
+# 写真区分のコードと選択肢の表示
+PHOTO_TYPE_LABELS = {"P": "部品写真(P) - 部品のみの写真", "M": "素材込み(M) - 素材も含む写真"}
 
 
 class InputPanel:
@@ -15,6 +28,7 @@ class InputPanel:
         self.parent_frame = parent_frame
         self.validation_callback: Optional[Callable] = None
         self.excel_reader = None  # ExcelReaderインスタンスへの参照
+        self.rename_history = None  # RenameHistoryインスタンスへの参照（部品名・重量の入力候補）
         
         # 入力フィールドの変数
         self.number_var = tk.StringVar()  # 番号
@@ -24,7 +38,7 @@ class InputPanel:
         self.material_category_var = tk.StringVar()  # 素材区分
         self.material_var = tk.StringVar()  # 素材名
         self.processing_var = tk.StringVar()
-        self.photo_type_var = tk.StringVar(value="部品写真(P) - 部品のみの写真")  # デフォルト値
+        self.photo_type_var = tk.StringVar(value=PHOTO_TYPE_LABELS["P"])  # デフォルト値
         self.notes_var = tk.StringVar(value="なし(0) - 特記事項なし")  # デフォルト値
         
         # ウィジェットの参照
@@ -38,6 +52,23 @@ class InputPanel:
         self.photo_type_combo: Optional[ttk.Combobox] = None
         self.notes_combo: Optional[ttk.Combobox] = None
         self.apply_button: Optional[tk.Button] = None
+        self.bulk_apply_button: Optional[tk.Button] = None
+        self.part_name_popup: Optional[AutocompletePopup] = None
+        self.weight_popup: Optional[AutocompletePopup] = None
+        
+        # 一括適用の対象（サムネイル一覧で選択中の画像）の数と、入力がそろっているか
+        self._bulk_selection_count = 0
+        self._apply_enabled = False
+        self._bulk_button_config = None
+        
+        # 検索語が空の時に表示する全候補
+        self._material_candidates: List[str] = []
+        self._processing_candidates: List[str] = []
+        
+        # 入力変更ごとの検証をまとめて、1フレームにつき最大1回だけ実行する
+        self.validation_scheduler = CoalescingScheduler(parent_frame)
+        # テキスト欄の現在の背景色（変化がない場合は再設定しない）
+        self._field_backgrounds: Dict[str, str] = {}
         
         # 半角英数字のみ許可する入力検証用
         self.weight_validation = parent_frame.register(self._validate_weight_input)
@@ -120,6 +151,11 @@ class InputPanel:
             highlightbackground="#e5e7eb"
         )
         self.part_name_entry.pack(padx=20, pady=(5, 15), fill="x", ipady=8)
+        # 過去のリネーム履歴からの入力候補（使用回数と最近の使用の順）
+        self.part_name_popup = AutocompletePopup(
+            self.part_name_entry, self.part_name_var, self._suggest_part_names,
+            on_select=self._on_part_name_selected
+        )
         
         # 重量
         self._create_input_section(
@@ -141,6 +177,8 @@ class InputPanel:
             validatecommand=(self.weight_validation, "%P")
         )
         self.weight_entry.pack(padx=20, pady=(5, 15), fill="x", ipady=8)
+        # 入力中の部品名で使った重量を優先して候補に表示
+        self.weight_popup = AutocompletePopup(self.weight_entry, self.weight_var, self._suggest_weights)
         
         # 単位
         self._create_input_section(
@@ -183,7 +221,7 @@ class InputPanel:
         # 素材名
         self._create_input_section(
             "📦 素材名 (必須)",
-            "素材区分を選択した後、素材名を選択してください"
+            "素材区分を選択した後、素材名を選択してください（入力すると候補を絞り込み）"
         )
         self.material_combo = ttk.Combobox(
             self.parent_frame,
@@ -193,20 +231,22 @@ class InputPanel:
             style="Modern.TCombobox"
         )
         self.material_combo.pack(padx=20, pady=(5, 15), fill="x", ipady=6)
+        self.material_combo.bind('<KeyRelease>', self._on_material_typeahead)
         
         # 加工方法
         self._create_input_section(
             "⚙️ 加工方法 (必須)",
-            "Excelマスターから加工方法を選択してください"
+            "Excelマスターから加工方法を選択してください（入力すると候補を絞り込み）"
         )
         self.processing_combo = ttk.Combobox(
             self.parent_frame,
             textvariable=self.processing_var,
             font=("SF Pro Display", 11),
-            state="readonly",
+            state="normal",
             style="Modern.TCombobox"
         )
         self.processing_combo.pack(padx=20, pady=(5, 15), fill="x", ipady=6)
+        self.processing_combo.bind('<KeyRelease>', self._on_processing_typeahead)
         
         # 写真区分
         self._create_input_section(
@@ -216,7 +256,7 @@ class InputPanel:
         self.photo_type_combo = ttk.Combobox(
             self.parent_frame,
             textvariable=self.photo_type_var,
-            values=["部品写真(P) - 部品のみの写真", "素材込み(M) - 素材も含む写真"],
+            values=list(PHOTO_TYPE_LABELS.values()),
             font=("SF Pro Display", 11),
             state="readonly",
             style="Modern.TCombobox",
@@ -260,6 +300,24 @@ class InputPanel:
             state="disabled"
         )
         self.apply_button.pack(fill="x", ipady=5)
+        
+        # 選択した画像に一括適用ボタン（サムネイル一覧で2枚以上選択した時のみ有効）
+        self.bulk_apply_button = tk.Button(
+            button_frame,
+            text="📚 選択した画像に適用",
+            font=("SF Pro Display", 11, "bold"),
+            bg="#f59e0b",
+            fg="white",
+            activebackground="#d97706",
+            activeforeground="white",
+            relief="flat",
+            bd=0,
+            padx=30,
+            pady=8,
+            cursor="hand2",
+            state="disabled"
+        )
+        self.bulk_apply_button.pack(fill="x", pady=(10, 0))
     
     def _validate_weight_input(self, value: str) -> bool:
         """重量入力の検証（半角英数字のみ許可）"""
@@ -277,21 +335,25 @@ class InputPanel:
     
     def _setup_validation(self):
         """入力検証とボタン状態の設定"""
-        def on_input_change(*args):
-            if self.validation_callback:
-                # 入力変更時の検証は少し遅延させて、連続する変更を安定化
-                self.parent_frame.after(100, self.validation_callback)
+        def watch(variable: tk.StringVar, field: str):
+            # 入力変更時の検証はまとめて実行し、変更された項目名を渡す
+            variable.trace('w', lambda *args: self._request_validation(field))
         
         # 各変数の変更を監視
-        self.part_name_var.trace('w', on_input_change)
-        self.weight_var.trace('w', on_input_change)
-        self.unit_var.trace('w', on_input_change)
-        self.number_var.trace('w', on_input_change)
+        watch(self.part_name_var, 'part_name')
+        watch(self.weight_var, 'weight')
+        watch(self.unit_var, 'unit')
+        watch(self.number_var, 'number')
         self.material_category_var.trace('w', self._on_material_category_change)
-        self.material_var.trace('w', on_input_change)
-        self.processing_var.trace('w', on_input_change)
-        self.photo_type_var.trace('w', on_input_change)
-        self.notes_var.trace('w', on_input_change)
+        watch(self.material_var, 'material')
+        watch(self.processing_var, 'processing')
+        watch(self.photo_type_var, 'photo_type')
+        watch(self.notes_var, 'notes')
+    
+    def _request_validation(self, field: Optional[str] = None):
+        """入力検証の実行を予約（連続する変更は1回の検証にまとめられる）"""
+        if self.validation_callback:
+            self.validation_scheduler.schedule(self.validation_callback, field)
     
     def set_validation_callback(self, callback: Callable):
         """入力検証コールバックを設定"""
@@ -302,10 +364,37 @@ class InputPanel:
         if self.apply_button:
             self.apply_button.configure(command=callback)
     
+    def set_bulk_apply_button_callback(self, callback: Callable):
+        """一括適用ボタンのコールバックを設定"""
+        if self.bulk_apply_button:
+            self.bulk_apply_button.configure(command=callback)
+    
     def set_excel_reader(self, excel_reader):
         """ExcelReaderインスタンスを設定"""
         self.excel_reader = excel_reader
     
+    def set_rename_history(self, rename_history):
+        """RenameHistoryインスタンスを設定（部品名・重量の入力候補に使用）"""
+        self.rename_history = rename_history
+    
+    def _suggest_part_names(self, text: str) -> List[str]:
+        """部品名の入力候補を取得"""
+        if not self.rename_history:
+            return []
+        return self.rename_history.suggest_part_names(text)
+    
+    def _on_part_name_selected(self, part_name: str):
+        """部品名の候補を確定したら重量欄に移動（重量が未入力ならその部品名で使った重量を候補に表示）"""
+        self.weight_entry.focus_set()
+        if not self.weight_var.get():
+            self.weight_popup.refresh()
+    
+    def _suggest_weights(self, text: str) -> List[str]:
+        """重量の入力候補を取得"""
+        if not self.rename_history:
+            return []
+        return self.rename_history.suggest_weights(self.part_name_var.get().strip(), text)
+    
     def set_scroll_callback(self, callback):
         """スクロールコールバックを設定"""
         self.scroll_callback = callback
@@ -333,26 +422,46 @@ class InputPanel:
         if selected_category:
             # 選択された区分の素材名リストを取得
             materials = self.excel_reader.get_materials_by_category(selected_category)
+            self._material_candidates = materials
             
-            # 素材名ドロップダウンを更新して活性化
+            # 素材名ドロップダウンを更新して活性化（入力による絞り込みを可能にする）
             if self.material_combo:
                 self.material_combo['values'] = materials
-                self.material_combo['state'] = 'readonly'
+                self.material_combo['state'] = 'normal'
                 self.material_var.set("")  # 現在の選択をクリア
-                
-                # バリデーションコールバックがあれば呼び出し
-                if self.validation_callback:
-                    self.validation_callback()
+                self._request_validation('material_category')
         else:
             # 素材区分が未選択の場合、素材名を非活性に
+            self._material_candidates = []
             if self.material_combo:
                 self.material_combo['values'] = []
                 self.material_combo['state'] = 'disabled'
                 self.material_var.set("")
-                
-                # バリデーションコールバックがあれば呼び出し
-                if self.validation_callback:
-                    self.validation_callback()
+                self._request_validation('material_category')
+    
+    def _on_material_typeahead(self, event):
+        """素材名の入力に合わせて候補を絞り込む"""
+        if event.keysym in IGNORED_KEYS or not self.excel_reader:
+            return
+        query = self.material_var.get()
+        if query.strip():
+            candidates = self.excel_reader.search_materials(
+                self.material_category_var.get(), query, TYPEAHEAD_LIMIT
+            )
+        else:
+            candidates = self._material_candidates
+        self.material_combo['values'] = candidates
+    
+    def _on_processing_typeahead(self, event):
+        """加工方法の入力に合わせて候補を絞り込む"""
+        if event.keysym in IGNORED_KEYS or not self.excel_reader:
+            return
+        query = self.processing_var.get()
+        if query.strip():
+            candidates = self.excel_reader.search_processing_methods(query, TYPEAHEAD_LIMIT)
+        else:
+            candidates = self._processing_candidates
+        self.processing_combo['values'] = candidates
     
     def update_material_categories_list(self, categories: List[str]):
         """素材区分リストを更新"""
@@ -372,12 +481,44 @@ class InputPanel:
     
     def update_processing_list(self, processing_methods: List[str]):
         """加工方法リストを更新"""
+        self._processing_candidates = processing_methods
         if self.processing_combo:
             self.processing_combo['values'] = processing_methods
             if processing_methods and not self.processing_var.get():
                 # デフォルト選択はしない（空のまま）
                 pass
     
+    def apply_master_diff(self, kind: str, diff):
+        """
+        マスターの再読み込み結果を反映（差分のあるドロップダウンだけを更新）
+        現在の選択は、再読み込み後も存在する場合はそのまま保持する
+        """
+        if not self.excel_reader:
+            return
+        
+        if kind == 'materials':
+            categories = self.excel_reader.get_material_categories_list()
+            if list(self.material_category_combo['values']) != categories:
+                self.update_material_categories_list(categories)
+            
+            selected_category = self.material_category_var.get()
+            if selected_category and selected_category not in categories:
+                # 選択中の区分がなくなった場合は区分を解除（素材名も連動してクリアされる）
+                self.material_category_var.set("")
+            elif selected_category in diff.affected_categories:
+                materials = self.excel_reader.get_materials_by_category(selected_category)
+                self._material_candidates = materials
+                if self.material_combo:
+                    self.material_combo['values'] = materials
+                if self.material_var.get() and self.material_var.get() not in materials:
+                    self.material_var.set("")
+        else:
+            if diff.display_names_changed:
+                processing_methods = self.excel_reader.get_processing_methods_list()
+                self.update_processing_list(processing_methods)
+                if self.processing_var.get() and self.processing_var.get() not in processing_methods:
+                    self.processing_var.set("")
+    
     def clear_text_inputs(self):
         """テキスト入力項目をクリア（部品名と重量のみ）- 現在は保持するため何もしない"""
         # 部品名と重量は保持するためクリアしない
@@ -426,6 +567,12 @@ class InputPanel:
         else:
             return "P"  # デフォルト
     
+    def set_photo_type_code(self, code: str):
+        """写真区分をコード（P/M）で設定"""
+        label = PHOTO_TYPE_LABELS.get(code)
+        if label and self.photo_type_var.get() != label:
+            self.photo_type_var.set(label)
+    
     def get_notes_code(self) -> str:
         """特記事項の有無からコードを取得"""
         notes_value = self.notes_var.get()
@@ -445,48 +592,80 @@ class InputPanel:
             bool(values['material']) and
             bool(values['processing']) and
             bool(values['photo_type']) and
-            bool(values['notes'])
+            bool(values['notes']) and
+            self._is_master_selection_valid(values)
+        )
+    
+    def _is_master_selection_valid(self, values: Dict[str, str]) -> bool:
+        """素材名・加工方法が入力途中の文字列ではなくマスターの値かチェック（素材名は選択中の素材区分のもの）"""
+        if not self.excel_reader:
+            return True
+        return (
+            self.excel_reader.is_material_in_category(values['material_category'], values['material']) and
+            self.excel_reader.get_processing_method_code(values['processing']) is not None
         )
     
     def set_apply_button_state(self, enabled: bool):
         """適用ボタンの状態を設定"""
+        self._apply_enabled = enabled
         if self.apply_button:
             state = "normal" if enabled else "disabled"
             self.apply_button.configure(state=state)
+        self._update_bulk_apply_button()
+    
+    def set_bulk_selection_count(self, count: int):
+        """一括適用の対象の数を設定（ボタンの表示と状態を更新）"""
+        self._bulk_selection_count = count
+        self._update_bulk_apply_button()
+    
+    def _update_bulk_apply_button(self):
+        """一括適用ボタンの表示と状態を更新"""
+        if not self.bulk_apply_button:
+            return
+        count = self._bulk_selection_count
+        text = f"📚 選択した{count}枚に適用" if count >= 2 else "📚 選択した画像に適用"
+        state = "normal" if self._apply_enabled and count >= 2 else "disabled"
+        # 入力検証のたびに呼ばれるため、変化がない場合は再設定しない
+        if self._bulk_button_config != (text, state):
+            self.bulk_apply_button.configure(text=text, state=state)
+            self._bulk_button_config = (text, state)
     
-    def highlight_empty_fields(self):
-        """未入力フィールドをハイライト"""
+    def highlight_empty_fields(self, fields: Optional[Iterable[str]] = None):
+        """
+        未入力フィールドをハイライト
+        fieldsを指定した場合はその項目だけを確認する（Noneはすべて）
+        """
         values = self.get_input_values()
         
-        # 番号
-        if not values['number']:
-            self.number_entry.configure(bg="#fef2f2")
-        else:
-            self.number_entry.configure(bg="#f9fafb")
-        
-        # 部品名
-        if not values['part_name']:
-            self.part_name_entry.configure(bg="#fef2f2")
-        else:
-            self.part_name_entry.configure(bg="#f9fafb")
-        
-        # 重量
-        if not values['weight']:
-            self.weight_entry.configure(bg="#fef2f2")
-        else:
-            self.weight_entry.configure(bg="#f9fafb")
+        # 番号・部品名・重量
+        for field, entry in self._highlight_targets(fields):
+            self._set_field_background(field, entry, NORMAL_BG if values[field] else HIGHLIGHT_BG)
         
         # コンボボックスのハイライトは視覚的な変更のみ（フォーカス移動を避ける）
         # フォーカス設定は削除してテキストボックスの入力を妨げないようにする
     
-    def clear_highlight(self):
+    def clear_highlight(self, fields: Optional[Iterable[str]] = None):
         """ハイライトをクリア"""
-        if self.number_entry:
-            self.number_entry.configure(bg="#f9fafb")
-        if self.part_name_entry:
-            self.part_name_entry.configure(bg="#f9fafb")
-        if self.weight_entry:
-            self.weight_entry.configure(bg="#f9fafb")
+        for field, entry in self._highlight_targets(fields):
+            self._set_field_background(field, entry, NORMAL_BG)
+    
+    def _highlight_targets(self, fields: Optional[Iterable[str]]):
+        """ハイライト対象のテキスト欄を (項目名, ウィジェット) で返す"""
+        targets = (
+            ('number', self.number_entry),
+            ('part_name', self.part_name_entry),
+            ('weight', self.weight_entry),
+        )
+        if fields is not None:
+            fields = set(fields)
+        return [(field, entry) for field, entry in targets
+                if entry and (fields is None or field in fields)]
+    
+    def _set_field_background(self, field: str, entry: tk.Entry, color: str):
+        """テキスト欄の背景色を設定（同じ色の場合は何もしない）"""
+        if self._field_backgrounds.get(field) != color:
+            entry.configure(bg=color)
+            self._field_backgrounds[field] = color
     
     def set_enabled(self, enabled: bool):
         """全フィールドの有効/無効を設定"""
@@ -506,11 +685,12 @@ class InputPanel:
         if self.material_combo:
             # 素材名は素材区分が選択されている場合のみ有効
             if enabled and self.material_category_var.get():
-                self.material_combo.configure(state="readonly")
+                self.material_combo.configure(state="normal")
             else:
                 self.material_combo.configure(state="disabled")
         if self.processing_combo:
-            self.processing_combo.configure(state=readonly_state)
+            # 加工方法は入力による絞り込みのため編集可能
+            self.processing_combo.configure(state=state)
         if self.photo_type_combo:
             self.photo_type_combo.configure(state=readonly_state)
         if self.notes_combo:
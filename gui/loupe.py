@@ -0,0 +1,296 @@
+"""
+拡大表示（ルーペ）GUI
+画像を別ウィンドウで等倍まで拡大し、ドラッグで移動して細部（刻印された部品番号など）を確認する
+表示中の範囲のタイルだけをPhotoImageに変換し、等倍の画像全体をTkの画像として保持しない
+"""
+import os
+import tkinter as tk
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from utils.background_task import BackgroundTask
+from utils.coalescing_scheduler import CoalescingScheduler
+from utils.tile_pyramid import TILE_SIZE, TilePyramid
+
+
+class Loupe:
+    """拡大表示ウィンドウを管理するクラス"""
+
+    # ウィンドウの初期サイズ
+    WINDOW_WIDTH = 900
+    WINDOW_HEIGHT = 700
+
+    # 保持するタイルのPhotoImageの最大数（1枚約256KB）
+    MAX_TILE_PHOTOS = 96
+
+    # 1回の再描画で新たに作成するタイルの最大数（残りは次のフレームで作成し、ドラッグを止めない）
+    TILES_PER_FRAME = 6
+
+    def __init__(self, root: tk.Misc):
+        self.root = root
+        self.window: Optional[tk.Toplevel] = None
+        self.canvas: Optional[tk.Canvas] = None
+        self.info_label: Optional[tk.Label] = None
+        self.layout_scheduler: Optional[CoalescingScheduler] = None
+
+        self.pyramid: Optional[TilePyramid] = None
+        self.level = 0
+        # (レベル, 列, 行) -> 表示中のCanvasの画像ID
+        self._tile_items: Dict[Tuple[int, int, int], int] = {}
+        # (レベル, 列, 行) -> タイルのPhotoImage（表示範囲外のものも上限まで保持する）
+        self._tile_photos: "OrderedDict[Tuple[int, int, int], object]" = OrderedDict()
+        self._decode_task: Optional[BackgroundTask] = None
+        self._has_view = False  # 現在の画像の表示位置が設定済みか
+
+    def is_open(self) -> bool:
+        """ウィンドウが表示されているかチェック"""
+        return self.window is not None
+
+    def open(self, image_path: str):
+        """画像を拡大表示（ウィンドウが表示されていない場合は作成する）"""
+        if self.window is None:
+            self._create_window()
+        else:
+            self.window.deiconify()
+            self.window.lift()
+
+        self._reset_tiles()
+        try:
+            self.pyramid = TilePyramid(image_path)
+        except Exception as e:
+            self.pyramid = None
+            self.info_label.configure(text=f"画像の読み込みに失敗しました: {e}")
+            return
+
+        self.window.title(f"🔍 拡大表示 - {os.path.basename(image_path)}")
+        self.window.update_idletasks()
+        self._has_view = False
+        self._set_level(self._fit_level())
+
+    def close(self):
+        """ウィンドウを閉じる"""
+        if self.window is None:
+            return
+        self._reset_tiles()
+        self.pyramid = None
+        self.layout_scheduler.cancel()
+        self.window.destroy()
+        self.window = None
+        self.canvas = None
+        self.info_label = None
+
+    def _create_window(self):
+        """拡大表示のウィンドウを作成"""
+        self.window = tk.Toplevel(self.root)
+        self.window.geometry(f"{self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT}")
+        self.window.configure(bg="#1f2937")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = tk.Frame(self.window, bg="#ffffff")
+        toolbar.pack(side="top", fill="x")
+        tk.Button(toolbar, text="全体", command=lambda: self._set_level(self._fit_level())).pack(
+            side="left", padx=(12, 4), pady=6)
+        tk.Button(toolbar, text="等倍(100%)", command=lambda: self._set_level(0)).pack(side="left", padx=4)
+        tk.Button(toolbar, text="＋", command=lambda: self._zoom(-1)).pack(side="left", padx=4)
+        tk.Button(toolbar, text="－", command=lambda: self._zoom(1)).pack(side="left", padx=4)
+        self.info_label = tk.Label(toolbar, text="", font=("SF Pro Display", 10), fg="#6b7280", bg="#ffffff")
+        self.info_label.pack(side="right", padx=12)
+
+        self.canvas = tk.Canvas(self.window, bg="#1f2937", highlightthickness=0, bd=0, cursor="fleur")
+        self.canvas.pack(fill="both", expand=True)
+        self.layout_scheduler = CoalescingScheduler(self.canvas)
+
+        # ドラッグで移動、ホイール・キーで拡大/縮小
+        self.canvas.bind("<ButtonPress-1>", lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Configure>", lambda e: self._request_layout())
+        self.window.bind("<plus>", lambda e: self._zoom(-1))
+        self.window.bind("<minus>", lambda e: self._zoom(1))
+        self.window.bind("<Key-1>", lambda e: self._set_level(0))
+        self.window.bind("<Escape>", lambda e: self.close())
+
+    def _viewport_size(self) -> Tuple[int, int]:
+        """表示領域のサイズ（ウィンドウの表示前は初期サイズから推定）"""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return (self.WINDOW_WIDTH, self.WINDOW_HEIGHT - 40)
+        return (width, height)
+
+    def _fit_level(self) -> int:
+        """ウィンドウに画像全体が収まる最も大きいレベル（縮小率が最も小さいレベル）"""
+        width, height = self._viewport_size()
+        for level in range(self.pyramid.level_count):
+            level_width, level_height = self.pyramid.level_size(level)
+            if level_width <= width and level_height <= height:
+                return level
+        return self.pyramid.level_count - 1
+
+    def _zoom(self, step: int, anchor: Optional[Tuple[int, int]] = None):
+        """レベルを変更（stepが負の場合は拡大）"""
+        if self.pyramid is None:
+            return
+        level = min(max(self.level + step, 0), self.pyramid.level_count - 1)
+        if level != self.level:
+            self._set_level(level, anchor)
+
+    def _set_level(self, level: int, anchor: Optional[Tuple[int, int]] = None):
+        """
+        表示するレベルを変更
+        anchor: 変更の前後で同じ位置に表示する点（ウィンドウ内の座標、Noneは中央）
+        """
+        if self.pyramid is None:
+            return
+        width, height = self._viewport_size()
+        if anchor is None:
+            anchor = (width // 2, height // 2)
+
+        # 変更前のレベルでanchorの位置にある画像上の点（等倍の座標）
+        scale = 2 ** self.level
+        if self._has_view:
+            point_x = self.canvas.canvasx(anchor[0]) * scale
+            point_y = self.canvas.canvasy(anchor[1]) * scale
+        else:
+            point_x, point_y = self.pyramid.width / 2, self.pyramid.height / 2
+
+        for item in self._tile_items.values():
+            self.canvas.delete(item)
+        self._tile_items = {}
+        self.level = level
+
+        level_width, level_height = self.pyramid.level_size(level)
+        # 画像がウィンドウより小さい場合は中央に表示
+        margin_x = max(0, (width - level_width) // 2)
+        margin_y = max(0, (height - level_height) // 2)
+        self.canvas.configure(scrollregion=(-margin_x, -margin_y, level_width + margin_x, level_height + margin_y))
+        total_width = level_width + margin_x * 2
+        total_height = level_height + margin_y * 2
+        new_scale = 2 ** level
+        self.canvas.xview_moveto((point_x / new_scale - anchor[0] + margin_x) / total_width)
+        self.canvas.yview_moveto((point_y / new_scale - anchor[1] + margin_y) / total_height)
+        self._has_view = True
+
+        self._update_info()
+        if self.pyramid.has_level(level):
+            self._request_layout()
+        else:
+            self._start_decode(level)
+
+    def _start_decode(self, level: int):
+        """レベルのデコードをワーカースレッドで開始"""
+        if self._decode_task is not None:
+            self._decode_task.cancel()
+        pyramid = self.pyramid
+        self.info_label.configure(text=f"{self.info_label.cget('text')}  読み込み中...")
+        self._decode_task = BackgroundTask(
+            self.canvas,
+            lambda progress: pyramid.decode_level(level),
+            lambda result: self._on_level_decoded(pyramid, level),
+            on_error=lambda e: self.info_label.configure(text=f"画像の読み込みに失敗しました: {e}")
+        )
+        self._decode_task.start()
+
+    def _on_level_decoded(self, pyramid: TilePyramid, level: int):
+        """レベルのデコード完了時の処理"""
+        self._decode_task = None
+        if pyramid is self.pyramid and level == self.level:
+            self._update_info()
+            self._request_layout()
+
+    def _update_info(self):
+        """倍率と画像サイズを表示"""
+        percent = 100 / 2 ** self.level
+        self.info_label.configure(text=f"倍率 {percent:g}%  ({self.pyramid.width}x{self.pyramid.height})")
+
+    def _on_drag(self, event):
+        """ドラッグで表示範囲を移動"""
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self._request_layout()
+
+    def _on_mousewheel(self, event):
+        """ホイールでマウス位置を中心に拡大/縮小"""
+        self._zoom(-1 if event.delta > 0 else 1, (event.x, event.y))
+
+    def _request_layout(self):
+        """タイルの再配置を予約"""
+        if self.layout_scheduler is not None:
+            self.layout_scheduler.schedule(self._layout)
+
+    def _layout(self, _fields=None):
+        """表示範囲のタイルを配置し、範囲外のタイルをCanvasから外す"""
+        if self.pyramid is None or not self.pyramid.has_level(self.level):
+            return
+        level = self.level
+        columns, rows = self.pyramid.tile_count(level)
+        left = self.canvas.canvasx(0)
+        top = self.canvas.canvasy(0)
+        width, height = self._viewport_size()
+        right = left + width
+        bottom = top + height
+
+        # 表示範囲のタイル（周囲1枚分を含む）
+        first_column = max(0, int(left // TILE_SIZE) - 1)
+        last_column = min(columns - 1, int(right // TILE_SIZE) + 1)
+        first_row = max(0, int(top // TILE_SIZE) - 1)
+        last_row = min(rows - 1, int(bottom // TILE_SIZE) + 1)
+        wanted = {
+            (level, column, row)
+            for column in range(first_column, last_column + 1)
+            for row in range(first_row, last_row + 1)
+        }
+
+        for key in [key for key in self._tile_items if key not in wanted]:
+            self.canvas.delete(self._tile_items.pop(key))
+
+        # 画面の中央に近いタイルから作成する
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        missing = sorted(
+            (key for key in wanted if key not in self._tile_items),
+            key=lambda key: abs((key[1] + 0.5) * TILE_SIZE - center_x) + abs((key[2] + 0.5) * TILE_SIZE - center_y)
+        )
+        created = 0
+        for key in missing:
+            photo = self._tile_photos.get(key)
+            if photo is None:
+                if created >= self.TILES_PER_FRAME:
+                    self._request_layout()  # 残りは次のフレームで作成
+                    break
+                photo = self._create_tile_photo(key)
+                if photo is None:
+                    return
+                created += 1
+            else:
+                self._tile_photos.move_to_end(key)
+            _, column, row = key
+            self._tile_items[key] = self.canvas.create_image(
+                column * TILE_SIZE, row * TILE_SIZE, image=photo, anchor="nw"
+            )
+
+    def _create_tile_photo(self, key: Tuple[int, int, int]):
+        """タイルを切り出してPhotoImageに変換（上限を超えた古いタイルは破棄）"""
+        from PIL import ImageTk
+        level, column, row = key
+        tile = self.pyramid.crop_tile(level, column, row)
+        if tile is None:
+            self._start_decode(level)  # 他のレベルのデコードで破棄された
+            return None
+        photo = ImageTk.PhotoImage(tile)
+        self._tile_photos[key] = photo
+
+        excess = len(self._tile_photos) - self.MAX_TILE_PHOTOS
+        if excess > 0:
+            # 表示中のタイルは残し、古いものから破棄する
+            evictable = [cached for cached in self._tile_photos if cached not in self._tile_items and cached != key]
+            for cached in evictable[:excess]:
+                del self._tile_photos[cached]
+        return photo
+
+    def _reset_tiles(self):
+        """表示中のタイルとPhotoImageをすべて破棄"""
+        if self._decode_task is not None:
+            self._decode_task.cancel()
+            self._decode_task = None
+        if self.canvas is not None:
+            for item in self._tile_items.values():
+                self.canvas.delete(item)
+        self._tile_items = {}
+        self._tile_photos.clear()
@@ -2,12 +2,34 @@
 メインウィンドウGUI
 アプリケーションのレイアウト構成とイベント処理を管理
 """
+import logging
+import os
+import sqlite3
+import threading
+import time
 import tkinter as tk
-from tkinter import messagebox, Menu
+from tkinter import filedialog, messagebox, simpledialog, Menu
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from gui.filmstrip import Filmstrip
 from gui.input_panel import InputPanel
 from gui.image_viewer import ImageViewer
+from gui.performance_panel import PerformancePanel
+from utils.background_task import BackgroundTask
+from utils.capture_pairs import PairProposal, index_capture_pairs
+from utils.derivatives import DERIVATIVE_MAX_SIDE, make_derivative
+from utils.duplicate_finder import find_duplicates
 from utils.excel_reader import ExcelReader
 from utils.file_handler import FileHandler
+from utils.heic_transcoder import TRANSCODE_QUALITY, is_heic, pending_transcodes, transcode_heic
+from utils.metadata_writer import embed_metadata
+from utils.output_stage import OutputStage
+from utils.perf_trace import STAGE_APPLY_AND_NEXT, STAGE_FIRST_IMAGE, STAGE_VALIDATION, traced, tracer
+from utils.preview_store import FileKey, FolderWarmer, PreviewStore
+from utils.quality_check import quality_warnings
+from utils.rename_history import RenameHistory
+from utils.stall_watchdog import StallWatchdog
+
+logger = logging.getLogger(__name__)
 
 
 class MainWindow:
@@ -37,10 +59,46 @@ class MainWindow:
         # バックエンドクラスのインスタンス
         self.excel_reader = ExcelReader()
         self.file_handler = FileHandler()
+        # 確定したリネームの履歴（部品名・重量の入力候補と過去の作業の検索に使用）
+        self.rename_history = RenameHistory()
         
         # GUIコンポーネント
         self.input_panel: InputPanel = None
         self.image_viewer: ImageViewer = None
+        self.filmstrip: Filmstrip = None
+        self.performance_panel = PerformancePanel(self.root, tracer)
+        
+        # フォルダ内のプレビューの先読み（複数プロセスで作成し、画像の切り替えを速くする）
+        self.preview_store = PreviewStore()
+        self.folder_warmer: FolderWarmer = None
+        
+        # 重複画像の検出（重複画像のインデックス -> 同じグループで最初の画像のインデックス）
+        self.duplicates: Dict[int, int] = {}
+        self._duplicate_task: Optional[BackgroundTask] = None
+        self._duplicate_cancel: Optional[threading.Event] = None
+        
+        # 撮影時刻から推定したペア（画像のインデックス -> 提案）と、直前に自動設定した番号
+        self.capture_pairs: Dict[int, PairProposal] = {}
+        self._capture_task: Optional[BackgroundTask] = None
+        self._auto_number: Optional[str] = None
+        
+        # リネーム後の出力処理（プロセスプールで実行し、画像の移動を待たせない）
+        self.derivative_stage = OutputStage(self.root, "派生画像の作成", make_derivative,
+                                            on_progress=self._on_output_progress)
+        self.derivative_folder: Optional[str] = None
+        self.metadata_stage = OutputStage(self.root, "メタデータの書き込み", embed_metadata,
+                                          on_progress=self._on_output_progress,
+                                          on_result=self._on_metadata_written)
+        self.transcode_stage = OutputStage(self.root, "HEICのJPEG変換", transcode_heic,
+                                           on_progress=self._on_output_progress)
+        self.transcode_folder: Optional[str] = None
+        self.transcode_quality = TRANSCODE_QUALITY
+        self.output_stages: List[OutputStage] = [self.metadata_stage, self.derivative_stage,
+                                                 self.transcode_stage]
+        
+        # 入力検証の前回の結果と、テキスト入力中のためハイライトを見送った項目（Noneはすべて）
+        self._last_validation_result: Optional[bool] = None
+        self._pending_highlight_fields: Optional[Set[str]] = None
         
         self._create_menu()
         self._create_layout()
@@ -50,7 +108,15 @@ class MainWindow:
         # InputPanelにExcelReaderを設定
         if self.input_panel:
             self.input_panel.set_excel_reader(self.excel_reader)
+            self.input_panel.set_rename_history(self.rename_history)
             self.input_panel.set_scroll_callback(self._scroll_to_widget)
+        
+        # 読み込み済みマスターファイルの変更を監視（作業中の編集を自動で反映）
+        self.excel_reader.start_watching(self.root, self._on_master_reloaded)
+        
+        # メインスレッドの停止（フリーズ）を検出してログに記録
+        self.watchdog = StallWatchdog(self.root)
+        self.watchdog.start()
     
     def _scroll_to_widget(self, widget):
         """指定されたウィジェットが見える位置にスクロール"""
@@ -78,6 +144,8 @@ class MainWindow:
         menubar.add_cascade(label="ファイル", menu=file_menu)
         file_menu.add_command(label="素材マスターを読み込み", command=self._load_materials)
         file_menu.add_command(label="加工方法マスターを読み込み", command=self._load_processing_methods)
+        file_menu.add_command(label="両方のマスターを読み込み", command=self._load_all_masters)
+        file_menu.add_command(label="両方のシートを含むブックを読み込み", command=self._load_combined_workbook)
         file_menu.add_separator()
         file_menu.add_command(label="画像フォルダを選択", command=self._select_image_folder)
         file_menu.add_separator()
@@ -85,12 +153,286 @@ class MainWindow:
         file_menu.add_separator()
         file_menu.add_command(label="終了", command=self.root.quit)
         
+        # ツールメニュー
+        tools_menu = Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="ツール", menu=tools_menu)
+        self.tracing_var = tk.BooleanVar(value=tracer.enabled)
+        tools_menu.add_checkbutton(label="処理時間を計測", variable=self.tracing_var,
+                                   command=self._toggle_tracing)
+        tools_menu.add_command(label="パフォーマンスを表示", command=self._show_performance_panel)
+        self.warm_folder_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="フォルダ選択時にプレビューを先読み", variable=self.warm_folder_var,
+                                   command=self._toggle_folder_warming)
+        self.find_duplicates_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="フォルダ選択時に重複画像を検出", variable=self.find_duplicates_var,
+                                   command=self._toggle_duplicate_scan)
+        self.pair_by_time_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="撮影時刻で番号・写真区分を提案", variable=self.pair_by_time_var,
+                                   command=self._toggle_capture_pairing)
+        self.derivatives_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label=f"リネーム後にWeb用JPEG（{DERIVATIVE_MAX_SIDE}px）を作成...",
+                                   variable=self.derivatives_var, command=self._toggle_derivatives)
+        self.metadata_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="リネーム後に部品の情報を画像に埋め込む(XMP)", variable=self.metadata_var)
+        self.transcode_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="リネーム後にHEICをJPEGに変換...", variable=self.transcode_var,
+                                   command=self._toggle_transcoding)
+        tools_menu.add_command(label="計測データを保存(JSON)...", command=self.performance_panel.export_json)
+        
         # ヘルプメニュー
         help_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="ヘルプ", menu=help_menu)
         help_menu.add_command(label="使い方", command=self._show_help)
         help_menu.add_command(label="バージョン情報", command=self._show_about)
     
+    def _toggle_tracing(self):
+        """処理時間の計測を有効/無効にする"""
+        tracer.enabled = self.tracing_var.get()
+    
+    def _toggle_folder_warming(self):
+        """プレビューの先読みを有効/無効にする"""
+        if self.warm_folder_var.get():
+            self._start_folder_warming()
+        else:
+            self.folder_warmer.stop()
+            self.image_viewer.set_warmup_progress(0, 0)
+            self._update_quality_notice()
+    
+    def _start_folder_warming(self):
+        """選択中のフォルダのプレビューの先読みを開始"""
+        if not self.warm_folder_var.get() or not self.file_handler.image_files:
+            return
+        processor = self.image_viewer.image_processor
+        self.folder_warmer.start(self.file_handler.image_files,
+                                 (processor.max_width, processor.max_height),
+                                 self.file_handler.current_index)
+    
+    def _on_warmup_progress(self, done: int, total: int):
+        """先読みの進捗を表示し、現在の画像の画質の判定が届いていれば注意を表示"""
+        self.image_viewer.set_warmup_progress(done, total)
+        self._update_quality_notice()
+    
+    def _update_quality_notice(self):
+        """現在の画像の画質（ピンぼけ・露出）の注意を表示（先読みで判定済みの場合のみ）"""
+        image_path = self.file_handler.get_current_image_path()
+        quality = self.preview_store.get_quality(image_path) if image_path else None
+        if quality is None or not self.warm_folder_var.get():
+            self.image_viewer.set_quality_warnings([])
+            return
+        self.image_viewer.set_quality_warnings(quality_warnings(quality))
+    
+    def _toggle_derivatives(self):
+        """リネーム後の派生画像の作成を有効/無効にする（有効にする時に出力フォルダを選択）"""
+        if not self.derivatives_var.get():
+            return
+        folder = filedialog.askdirectory(
+            title="Web用JPEGの出力フォルダを選択してください",
+            initialdir=self.derivative_folder or os.path.expanduser("~")
+        )
+        if not folder:
+            self.derivatives_var.set(False)
+            return
+        if any(self._is_same_folder(folder, other)
+               for other in (self.file_handler.image_folder, self.transcode_folder)):
+            messagebox.showwarning("警告", "画像フォルダ・HEICの変換の出力フォルダとは別のフォルダを選択してください。")
+            self.derivatives_var.set(False)
+            return
+        self.derivative_folder = folder
+    
+    @staticmethod
+    def _is_same_folder(folder: str, other: Optional[str]) -> bool:
+        """2つのフォルダが同じかチェック（以前に選択したフォルダが削除・取り外された場合は別のフォルダとみなす）"""
+        if not other:
+            return False
+        try:
+            return os.path.samefile(folder, other)
+        except OSError:
+            return False
+    
+    def _toggle_transcoding(self):
+        """リネーム後のHEICのJPEG変換を有効/無効にする（有効にする時に出力フォルダと画質を選択）"""
+        if not self.transcode_var.get():
+            return
+        folder = filedialog.askdirectory(
+            title="JPEGに変換したHEICの出力フォルダを選択してください",
+            initialdir=self.transcode_folder or os.path.expanduser("~")
+        )
+        if not folder:
+            self.transcode_var.set(False)
+            return
+        if any(self._is_same_folder(folder, other)
+               for other in (self.file_handler.image_folder, self.derivative_folder)):
+            messagebox.showwarning("警告", "画像フォルダ・Web用JPEGの出力フォルダとは別のフォルダを選択してください。")
+            self.transcode_var.set(False)
+            return
+        quality = simpledialog.askinteger("JPEGの画質", "JPEGの画質（1〜100）を入力してください。",
+                                          initialvalue=self.transcode_quality, minvalue=1, maxvalue=100,
+                                          parent=self.root)
+        if quality is None:
+            self.transcode_var.set(False)
+            return
+        self.transcode_folder = folder
+        self.transcode_quality = quality
+        self._resume_transcoding()
+    
+    def _resume_transcoding(self):
+        """リネーム済みのHEICのうち、変換していない・変換後に更新されたものを変換に投入"""
+        if not self.transcode_var.get() or not self.transcode_folder:
+            return
+        renamed = [path for path in self.file_handler.image_files if self.file_handler.is_renamed_file(path)]
+        for path in pending_transcodes(renamed, self.transcode_folder):
+            self.transcode_stage.submit(path, self.transcode_folder, self.transcode_quality)
+    
+    def _feed_output_stages(self, indices: List[int], values: Dict[str, str], material_id: str,
+                            processing_id: str):
+        """リネームした画像をリネーム後の出力処理に投入（待ち行列に追加するだけで、すぐに戻る）"""
+        if self.metadata_var.get():
+            for index in indices:
+                path = self.file_handler.image_files[index]
+                parsed = self.file_handler.parse_renamed_file(path)
+                attributes = {key: values[key] for key in ('part_name', 'weight', 'unit', 'material',
+                                                           'processing', 'notes')}
+                attributes.update(material_id=material_id, processing_id=processing_id)
+                if parsed:
+                    attributes.update(number=str(parsed[0]), photo_type=parsed[1])
+                self.metadata_stage.submit(path, attributes)
+        if self.derivatives_var.get() and self.derivative_folder:
+            for index in indices:
+                self.derivative_stage.submit(self.file_handler.image_files[index], self.derivative_folder)
+        if self.transcode_var.get() and self.transcode_folder:
+            for index in indices:
+                path = self.file_handler.image_files[index]
+                if is_heic(path):
+                    self.transcode_stage.submit(path, self.transcode_folder, self.transcode_quality)
+    
+    def _on_output_progress(self, changed_stage: OutputStage):
+        """リネーム後の出力処理の残り件数と、処理中の出力処理の処理速度を表示"""
+        rates = [f"{stage.name} {stage.throughput():.1f}件/秒" for stage in self.output_stages
+                 if stage.backlog() and stage.done_count]
+        self.image_viewer.set_output_backlog(sum(stage.backlog() for stage in self.output_stages),
+                                             sum(stage.failed_count for stage in self.output_stages), rates)
+    
+    def _on_metadata_written(self, keys: Optional[Tuple[FileKey, FileKey]]):
+        """メタデータを書き込んだ画像（inodeとサイズが変わる）の先読み済みのプレビューを引き継ぐ"""
+        if keys is not None:
+            self.preview_store.rekey(*keys)
+    
+    def _finish_output_stages(self):
+        """終了時に、残っている出力処理を完了するか確認"""
+        backlog = sum(stage.backlog() for stage in self.output_stages)
+        wait = False
+        if backlog:
+            try:
+                wait = messagebox.askyesno(
+                    "確認", f"リネーム後の出力処理が{backlog}件残っています。\n完了するまで待ちますか？"
+                )
+            except tk.TclError:
+                wait = True  # ウィンドウが破棄された後は確認せずに完了を待つ
+        for stage in self.output_stages:
+            if wait:
+                stage.drain()
+            else:
+                stage.stop()
+    
+    def _toggle_duplicate_scan(self):
+        """重複画像の検出を有効/無効にする"""
+        if self.find_duplicates_var.get():
+            self._start_duplicate_scan()
+        else:
+            self._stop_duplicate_scan()
+            self._set_duplicates({})
+    
+    def _start_duplicate_scan(self):
+        """選択中のフォルダの重複画像の検出をワーカースレッドで開始"""
+        self._stop_duplicate_scan()
+        if not self.find_duplicates_var.get() or not self.file_handler.image_files:
+            return
+        image_files = list(self.file_handler.image_files)
+        cancel_event = threading.Event()
+        started = time.perf_counter()
+        
+        def on_complete(duplicates: Dict[int, int]):
+            logger.debug(f"重複画像の検出完了 ({len(image_files)}枚中{len(duplicates)}枚, "
+                         f"{time.perf_counter() - started:.1f}秒)")
+            self._duplicate_task = None
+            self._set_duplicates(duplicates)
+        
+        self._duplicate_cancel = cancel_event
+        self._duplicate_task = BackgroundTask(
+            self.root,
+            lambda progress: find_duplicates(image_files, progress, cancel_event),
+            on_complete,
+            on_error=lambda e: logger.warning(f"重複画像の検出に失敗しました: {e}")
+        )
+        self._duplicate_task.start()
+    
+    def _stop_duplicate_scan(self):
+        """実行中の重複画像の検出を中止"""
+        if self._duplicate_task is not None:
+            self._duplicate_cancel.set()
+            self._duplicate_task.cancel()
+            self._duplicate_task = None
+    
+    def _set_duplicates(self, duplicates: Dict[int, int]):
+        """重複画像の検出結果をサムネイル一覧と画像表示に反映"""
+        self.duplicates = duplicates
+        self.filmstrip.set_duplicates(set(duplicates))
+        self._update_duplicate_notice()
+    
+    def _update_duplicate_notice(self):
+        """現在の画像が重複画像の場合、どの画像とほぼ同じかを表示"""
+        original = self.duplicates.get(self.file_handler.current_index)
+        if original is None or original >= len(self.file_handler.image_files):
+            self.image_viewer.set_duplicate_notice("")
+            return
+        name = os.path.basename(self.file_handler.image_files[original])
+        self.image_viewer.set_duplicate_notice(
+            f"⚠ {original + 1}枚目の画像（{name}）とほぼ同じ画像です（スキップできます）"
+        )
+    
+    def _toggle_capture_pairing(self):
+        """撮影時刻によるペアの提案を有効/無効にする"""
+        if self.pair_by_time_var.get():
+            self._start_capture_indexing()
+        else:
+            if self._capture_task is not None:
+                self._capture_task.cancel()
+                self._capture_task = None
+            self.capture_pairs = {}
+    
+    def _start_capture_indexing(self):
+        """選択中のフォルダの撮影時刻の読み取りとペアの推定をワーカースレッドで開始"""
+        if self._capture_task is not None:
+            self._capture_task.cancel()
+            self._capture_task = None
+        self.capture_pairs = {}
+        if not self.pair_by_time_var.get() or not self.file_handler.image_files:
+            return
+        image_files = list(self.file_handler.image_files)
+        started = time.perf_counter()
+        
+        def on_complete(proposals: Dict[int, PairProposal]):
+            logger.debug(f"撮影時刻によるペアの推定完了 ({len(image_files)}枚中{len(proposals)}枚, "
+                         f"{time.perf_counter() - started:.1f}秒)")
+            self._capture_task = None
+            self.capture_pairs = proposals
+            # 自動設定した番号のまま（手動で変更していない）場合は、推定したペアの番号に置き換える
+            if self._is_image_loaded() and self.input_panel.number_var.get() == self._auto_number:
+                self._auto_set_number()
+        
+        self._capture_task = BackgroundTask(
+            self.root,
+            lambda progress: index_capture_pairs(image_files, progress),
+            on_complete,
+            on_error=lambda e: logger.warning(f"撮影時刻の読み取りに失敗しました: {e}")
+        )
+        self._capture_task.start()
+    
+    def _show_performance_panel(self):
+        """パフォーマンスパネルを表示（計測も有効にする）"""
+        self.performance_panel.show()
+        self.tracing_var.set(True)
+    
     def _create_layout(self):
         """レイアウトを作成"""
         # メインフレーム
@@ -261,9 +603,18 @@ class MainWindow:
         
         # 入力パネルの作成（スクロール可能なフレーム内に配置）
         self.input_panel = InputPanel(self.scrollable_frame)
+        tracer.register_counter("入力検証の間引き", self.input_panel.validation_scheduler.summary)
         
-        # 画像表示パネルの作成
+        # サムネイル一覧の作成（画像表示パネルより先に下端へ配置し、表示領域を確保）
+        self.filmstrip = Filmstrip(right_frame)
+        
+        # 画像表示パネルの作成（サムネイル一覧の分だけプレビューの高さを抑える）
         self.image_viewer = ImageViewer(right_frame)
+        self.image_viewer.image_processor.set_max_size(800, 480)
+        self.image_viewer.image_processor.preview_store = self.preview_store
+        self.folder_warmer = FolderWarmer(self.root, self.preview_store,
+                                          on_progress=self._on_warmup_progress,
+                                          memory_budget=self.image_viewer.image_processor.memory_budget)
         
         # 初期状態では入力パネルを無効化
         self.input_panel.set_enabled(False)
@@ -276,12 +627,19 @@ class MainWindow:
         
         # 適用ボタンコールバック
         self.input_panel.set_apply_button_callback(self._apply_and_next)
+        self.input_panel.set_bulk_apply_button_callback(self._apply_to_selection)
         
         # ナビゲーションコールバック
         self.image_viewer.set_navigation_callbacks(
             self._go_to_previous_image,
             self._go_to_next_image
         )
+        
+        # サムネイル一覧のクリックで画像を移動
+        self.filmstrip.set_select_callback(self._go_to_image)
+        self.filmstrip.set_selection_callback(
+            lambda indices: self.input_panel.set_bulk_selection_count(len(indices))
+        )
     
     def _setup_keyboard_shortcuts(self):
         """キーボードショートカットを設定"""
@@ -311,8 +669,84 @@ class MainWindow:
             self.input_panel.force_clear_text_inputs()
     
     def _load_materials(self):
-        """素材マスターを読み込み"""
-        if self.excel_reader.select_and_load_materials_file():
+        """素材マスターを選択し、バックグラウンドで読み込み"""
+        file_path = self.excel_reader.select_materials_file()
+        if file_path:
+            self._start_materials_load(file_path)
+    
+    def _load_processing_methods(self):
+        """加工方法マスターを選択し、バックグラウンドで読み込み"""
+        file_path = self.excel_reader.select_processing_methods_file()
+        if file_path:
+            self._start_processing_methods_load(file_path)
+    
+    def _load_all_masters(self):
+        """素材マスターと加工方法マスターを選択し、並行して読み込み"""
+        materials_path = self.excel_reader.select_materials_file()
+        if not materials_path:
+            return
+        processing_path = self.excel_reader.select_processing_methods_file()
+        
+        self._start_materials_load(materials_path)
+        if processing_path:
+            self._start_processing_methods_load(processing_path)
+    
+    def _load_combined_workbook(self):
+        """素材・加工方法の両方のシートを含むブックを選択し、1回の読み込みで両方を反映"""
+        file_path = self.excel_reader.select_combined_workbook_file()
+        if not file_path:
+            return
+        
+        self.materials_button.configure(text="⏳ 素材マスター読み込み中...", state="disabled")
+        self.processing_button.configure(text="⏳ 加工方法マスター読み込み中...", state="disabled")
+        self._update_status_display()
+        self.excel_reader.load_combined_workbook_async(
+            file_path,
+            self.root,
+            self._on_combined_workbook_loaded,
+            on_progress=lambda count: self.materials_button.configure(
+                text=f"⏳ マスター読み込み中... ({count:,}行)"
+            )
+        )
+    
+    def _on_combined_workbook_loaded(self, success: bool):
+        """両方のシートを含むブックの読み込み完了時の処理"""
+        # 途中で個別の読み込みが開始された種類は、その読み込みの完了時に処理する
+        if not self.excel_reader.is_loading('materials'):
+            self._on_materials_loaded(success)
+        if not self.excel_reader.is_loading('processing_methods'):
+            self._on_processing_methods_loaded(success)
+    
+    def _start_materials_load(self, file_path: str):
+        """素材マスターの読み込みを開始（完了までボタンに進捗を表示）"""
+        self.materials_button.configure(text="⏳ 素材マスター読み込み中...", state="disabled")
+        self._update_status_display()
+        self.excel_reader.load_materials_file_async(
+            file_path,
+            self.root,
+            self._on_materials_loaded,
+            on_progress=lambda count: self.materials_button.configure(
+                text=f"⏳ 素材マスター読み込み中... ({count:,}行)"
+            )
+        )
+    
+    def _start_processing_methods_load(self, file_path: str):
+        """加工方法マスターの読み込みを開始（完了までボタンに進捗を表示）"""
+        self.processing_button.configure(text="⏳ 加工方法マスター読み込み中...", state="disabled")
+        self._update_status_display()
+        self.excel_reader.load_processing_methods_file_async(
+            file_path,
+            self.root,
+            self._on_processing_methods_loaded,
+            on_progress=lambda count: self.processing_button.configure(
+                text=f"⏳ 加工方法マスター読み込み中... ({count:,}行)"
+            )
+        )
+    
+    def _on_materials_loaded(self, success: bool):
+        """素材マスターの読み込み完了時の処理"""
+        self.materials_button.configure(state="normal")
+        if success:
             # 素材区分リストを更新
             self.input_panel.update_material_categories_list(
                 self.excel_reader.get_material_categories_list()
@@ -325,12 +759,17 @@ class MainWindow:
                 activebackground="#16a34a",
                 fg="#1f2937"
             )
-            self._update_status_display()
             self._check_ready_state()
+        elif self.excel_reader.material_table:
+            self.materials_button.configure(text="✓ 素材マスター読み込み済み")
+        else:
+            self.materials_button.configure(text="📊 素材マスター読み込み")
+        self._update_status_display()
     
-    def _load_processing_methods(self):
-        """加工方法マスターを読み込み"""
-        if self.excel_reader.select_and_load_processing_methods_file():
+    def _on_processing_methods_loaded(self, success: bool):
+        """加工方法マスターの読み込み完了時の処理"""
+        self.processing_button.configure(state="normal")
+        if success:
             self.input_panel.update_processing_list(self.excel_reader.get_processing_methods_list())
             self.processing_button.configure(
                 bg="#22c55e",
@@ -338,18 +777,45 @@ class MainWindow:
                 activebackground="#16a34a",
                 fg="#1f2937"
             )
-            self._update_status_display()
             self._check_ready_state()
+        elif self.excel_reader.processing_table:
+            self.processing_button.configure(text="✓ 加工方法マスター読み込み済み")
+        else:
+            self.processing_button.configure(text="⚙️ 加工方法マスター読み込み")
+        self._update_status_display()
+    
+    def _on_master_reloaded(self, kind: str, diff):
+        """マスターファイルが外部で更新され、再読み込みされた時の処理"""
+        self.input_panel.apply_master_diff(kind, diff)
+        
+        name = "素材マスター" if kind == 'materials' else "加工方法マスター"
+        self.status_icon.configure(text="🔄", fg="#3b82f6")
+        self.status_label.configure(
+            text=f"{name}の変更を反映しました ({diff.summary()})",
+            fg="#3b82f6"
+        )
+        self._validate_inputs()
     
     def _select_image_folder(self):
         """画像フォルダを選択"""
-        if self.file_handler.select_folder():
+        with self.watchdog.operation("select_folder"):
+            selected = self.file_handler.select_folder()
+        if selected:
             self.folder_button.configure(
                 bg="#22c55e",
                 text="✓ 画像フォルダ選択済み",
                 activebackground="#16a34a",
                 fg="#1f2937"
             )
+            self.filmstrip.set_files(
+                self.file_handler.image_files,
+                [self.file_handler.is_renamed_file(path) for path in self.file_handler.image_files]
+            )
+            self._start_folder_warming()
+            self._resume_transcoding()
+            self._set_duplicates({})
+            self._start_duplicate_scan()
+            self._start_capture_indexing()
             self._update_status_display()
             self._check_ready_state()
             if self._is_ready():
@@ -377,6 +843,7 @@ class MainWindow:
         """画像が読み込まれているかチェック"""
         return self.file_handler.get_current_image_path() is not None
     
+    @traced(STAGE_FIRST_IMAGE)
     def _load_first_image(self):
         """最初の画像を読み込み"""
         self._update_image_display()
@@ -391,9 +858,15 @@ class MainWindow:
         """現在の画像を表示"""
         image_path = self.file_handler.get_current_image_path()
         if image_path:
-            self.image_viewer.display_image(image_path)
+            with self.watchdog.operation("display_image"):
+                self.image_viewer.display_image(image_path)
             current, total = self.file_handler.get_current_image_info()
             self.image_viewer.update_progress(current, total)
+            self.filmstrip.set_current(self.file_handler.current_index)
+            if self.folder_warmer.is_running():
+                self.folder_warmer.set_current(self.file_handler.current_index, self.file_handler.image_files)
+            self._update_duplicate_notice()
+            self._update_quality_notice()
     
     def _update_ui_state(self):
         """UI状態を更新"""
@@ -408,32 +881,78 @@ class MainWindow:
         # 入力検証
         self._validate_inputs()
     
-    def _validate_inputs(self):
-        """入力検証を実行"""
+    @traced(STAGE_VALIDATION)
+    def _validate_inputs(self, dirty_fields: Optional[FrozenSet[str]] = None):
+        """
+        入力検証を実行
+        dirty_fields: 前回の検証以降に変更された項目名（Noneはすべての項目を見直す）
+        """
         if not self.input_panel:
             return
         
         is_valid = self.input_panel.is_all_filled()
         self.input_panel.set_apply_button_state(is_valid)
         
-        # ハイライト処理は現在のフォーカス状態を考慮して実行
-        focused_widget = self.root.focus_get()
+        # 検証結果が変わった場合と、前回ハイライトを見送った項目はすべて見直す
+        if (dirty_fields is None or self._pending_highlight_fields is None or
+                is_valid != self._last_validation_result):
+            fields = None
+        else:
+            fields = self._pending_highlight_fields | dirty_fields
+        self._last_validation_result = is_valid
         
         if not is_valid:
+            # ハイライト処理は現在のフォーカス状態を考慮して実行
+            focused_widget = self.root.focus_get()
             # テキスト入力中でない場合のみハイライトを適用
             if (not focused_widget or 
                 focused_widget not in [self.input_panel.part_name_entry, self.input_panel.weight_entry]):
-                self.input_panel.highlight_empty_fields()
+                self.input_panel.highlight_empty_fields(fields)
+                self._pending_highlight_fields = set()
+            else:
+                self._pending_highlight_fields = fields
         else:
-            self.input_panel.clear_highlight()
+            self.input_panel.clear_highlight(fields)
+            self._pending_highlight_fields = set()
     
     def _auto_set_number(self):
-        """番号を自動設定"""
+        """番号を自動設定（撮影時刻でペアと推定した画像は、ペアの番号と写真区分を設定）"""
         if self.input_panel and hasattr(self.input_panel, 'number_var'):
+            proposal = self.capture_pairs.get(self.file_handler.current_index)
             # 常に最新の自動番号を設定
-            next_number = self.file_handler.get_next_number()
-            print(f"デバッグ: 自動番号を {next_number} に設定")
-            self.input_panel.number_var.set(str(next_number))
+            with self.watchdog.operation("get_next_number"):
+                if proposal is not None:
+                    next_number = self.file_handler.get_pair_number(proposal.partner)
+                else:
+                    next_number = self.file_handler.get_next_number()
+            self._auto_number = str(next_number)
+            self.input_panel.number_var.set(self._auto_number)
+            
+            if proposal is not None:
+                photo_type = proposal.photo_type
+                partner = self.file_handler.parse_renamed_file(self.file_handler.image_files[proposal.partner])
+                if partner is not None:
+                    # 相手がリネーム済みの場合は、相手と反対の写真区分にする
+                    photo_type = {'P': 'M', 'M': 'P'}.get(partner[1], photo_type)
+                self.input_panel.set_photo_type_code(photo_type)
+    
+    def _get_manual_number(self) -> Tuple[str, bool]:
+        """
+        リネームに使う手動番号と、新しいペアとして番号を決めるかを取得
+        自動番号のまま変更されていない場合は空文字を返し、番号はリネーム時にロックを取得して決め直す
+        （表示後に他の端末が同じ番号を使っても重複しない）。撮影時刻のペアの相手がリネーム済みの場合は相手の番号を使う
+        """
+        if not hasattr(self.input_panel, 'number_var'):
+            return "", False
+        number = self.input_panel.number_var.get().strip()
+        if number != self._auto_number:
+            return number, False
+        proposal = self.capture_pairs.get(self.file_handler.current_index)
+        if proposal is None:
+            return "", False
+        if self.file_handler.parse_renamed_file(self.file_handler.image_files[proposal.partner]) is not None:
+            return number, False
+        return "", True
     
     def _apply_and_next(self):
         """現在の設定を適用して次の画像に進む"""
@@ -444,8 +963,8 @@ class MainWindow:
         # 入力値を取得
         values = self.input_panel.get_input_values()
         
-        # 手動で入力された番号を取得（空の場合は自動番号を使用）
-        manual_number = self.input_panel.number_var.get().strip() if hasattr(self.input_panel, 'number_var') else ""
+        # 手動で入力された番号を取得（自動番号のままの場合は、リネーム時にロックを取得して決め直す）
+        manual_number, new_pair = self._get_manual_number()
         
         # ID値を取得
         material_id = self.input_panel.get_material_id()  # 新しいメソッドを使用
@@ -458,20 +977,30 @@ class MainWindow:
             return
         
         # ファイルリネーム実行（手動番号を含む）
-        success = self.file_handler.rename_current_file(
-            values['part_name'],
-            values['weight'],
-            values['unit'],
-            material_id,
-            processing_id,
-            photo_type_code,
-            notes_code,
-            manual_number  # 手動番号を追加
-        )
+        started = time.perf_counter()
+        with self.watchdog.operation("rename_current_file"):
+            success = self.file_handler.rename_current_file(
+                values['part_name'],
+                values['weight'],
+                values['unit'],
+                material_id,
+                processing_id,
+                photo_type_code,
+                notes_code,
+                manual_number,  # 手動番号を追加
+                new_pair
+            )
         
         if not success:
             return  # エラーメッセージは file_handler 内で表示済み
         
+        tracer.mark_image_processed()
+        self.filmstrip.update_file(
+            self.file_handler.current_index, self.file_handler.get_current_image_path(), True
+        )
+        self._record_history([self.file_handler.current_index], values, material_id, processing_id)
+        self._feed_output_stages([self.file_handler.current_index], values, material_id, processing_id)
+        
         # 次の画像に移動
         if self.file_handler.has_next_image():
             self.file_handler.next_image()
@@ -479,10 +1008,78 @@ class MainWindow:
             self.input_panel.set_focus_to_part_name()  # フォーカスのみ設定、データは保持
             self._update_image_display()
             self._update_ui_state()
+            # リネームから次の画像の表示までの時間
+            tracer.record(STAGE_APPLY_AND_NEXT, time.perf_counter() - started, started)
         else:
             # 最後の画像の場合、完了メッセージを表示
             self._show_completion()
     
+    def _record_history(self, indices: List[int], values: Dict[str, str], material_id: str, processing_id: str):
+        """リネームした画像を履歴に記録（記録に失敗してもリネームは成功しているため、ログのみ出力）"""
+        renamed = []
+        for index in indices:
+            path = self.file_handler.image_files[index]
+            parsed = self.file_handler.parse_renamed_file(path)
+            renamed.append((path, parsed[1] if parsed else ""))
+        try:
+            self.rename_history.record(renamed, values['part_name'], values['weight'], values['unit'],
+                                       material_id, processing_id)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"リネーム履歴を記録できませんでした: {e}")
+    
+    def _apply_to_selection(self):
+        """サムネイル一覧で選択した画像すべてに現在の設定を適用し、まとめてリネーム"""
+        indices = self.filmstrip.get_selection()
+        if len(indices) < 2:
+            return
+        if not self.input_panel.is_all_filled():
+            messagebox.showwarning("警告", "すべての項目を入力してください。")
+            return
+        
+        values = self.input_panel.get_input_values()
+        manual_number, _ = self._get_manual_number()
+        material_id = self.input_panel.get_material_id()
+        processing_id = self.excel_reader.get_processing_method_code(values['processing'])
+        
+        if not material_id or not processing_id:
+            messagebox.showerror("エラー", "素材または加工方法のIDが見つかりません。")
+            return
+        
+        # 番号の割り当てとリネームを1回でまとめて実行
+        with self.watchdog.operation("rename_selected_files"):
+            success = self.file_handler.rename_selected_files(
+                indices,
+                values['part_name'],
+                values['weight'],
+                values['unit'],
+                material_id,
+                processing_id,
+                self.input_panel.get_photo_type_code(),
+                self.input_panel.get_notes_code(),
+                manual_number
+            )
+        
+        if not success:
+            return  # エラーメッセージは file_handler 内で表示済み
+        
+        for index in indices:
+            tracer.mark_image_processed()
+            self.filmstrip.update_file(index, self.file_handler.image_files[index], True)
+        self._record_history(indices, values, material_id, processing_id)
+        self._feed_output_stages(indices, values, material_id, processing_id)
+        self.filmstrip.clear_selection()
+        
+        # 選択した最後の画像の次に移動
+        next_index = indices[-1] + 1
+        if next_index < self.file_handler.get_total_files():
+            self.file_handler.go_to_image(next_index)
+            self._auto_set_number()  # 番号を自動設定（画像移動直後）
+            self.input_panel.set_focus_to_part_name()  # フォーカスのみ設定、データは保持
+            self._update_image_display()
+            self._update_ui_state()
+        else:
+            self._show_completion()
+    
     def _go_to_previous_image(self):
         """前の画像に移動"""
         if self.file_handler.has_previous_image():
@@ -501,6 +1098,14 @@ class MainWindow:
             self._update_image_display()
             self._update_ui_state()
     
+    def _go_to_image(self, index: int):
+        """指定した画像に移動（サムネイル一覧のクリック、リネームなし）"""
+        if self.file_handler.go_to_image(index):
+            self._auto_set_number()  # 番号を自動設定（画像移動直後）
+            self.input_panel.set_focus_to_part_name()  # フォーカスのみ設定、データは保持
+            self._update_image_display()
+            self._update_ui_state()
+    
     def _on_enter_pressed(self, event):
         """Enterキーが押された時の処理"""
         if (self.input_panel and 
@@ -521,11 +1126,17 @@ class MainWindow:
     
     def _update_status_display(self):
         """状態表示を更新"""
-        materials_loaded = bool(self.excel_reader.materials)
-        processing_loaded = bool(self.excel_reader.processing_methods)
+        materials_loaded = bool(self.excel_reader.material_table)
+        processing_loaded = bool(self.excel_reader.processing_table)
         folder_loaded = self.file_handler.is_ready()
         
-        if materials_loaded and processing_loaded and folder_loaded:
+        if self.excel_reader.is_loading():
+            self.status_icon.configure(text="⏳", fg="#3b82f6")
+            self.status_label.configure(
+                text="マスターを読み込んでいます...",
+                fg="#3b82f6"
+            )
+        elif materials_loaded and processing_loaded and folder_loaded:
             self.status_icon.configure(text="✅", fg="#22c55e")
             self.status_label.configure(
                 text="準備完了！画像処理を開始できます",
@@ -568,10 +1179,12 @@ class MainWindow:
    • 各項目に情報を入力
    • 「適用&次へ」ボタンをクリック
    • 次の画像に自動で移動
+   • サムネイルをCtrl/⌘+クリックで複数選択し、「選択した画像に適用」でまとめてリネーム
 
 ⌨️ キーボードショートカット:
    • Enter: 適用&次へ
    • ←→: 前の画像/次の画像へ移動
+   • 画像をダブルクリック: 拡大表示（ホイールで拡大/縮小、ドラッグで移動）
 
 📋 ファイル名形式:
    部品名_重量_単位_素材ID_加工ID_写真区分_特記事項.拡張子
@@ -610,4 +1223,9 @@ class MainWindow:
                           "📁 3. 画像フォルダを選択\\n\\n"
                           "✨ 簡単で美しいファイル名に変更できます！")
         
-        self.root.mainloop()
\ No newline at end of file
+        self.root.mainloop()
+        # 先読み・重複検出のワーカープロセスを終了
+        self.folder_warmer.stop()
+        self._stop_duplicate_scan()
+        self._finish_output_stages()
+        self.rename_history.close()
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+パフォーマンスパネルGUI
+処理段階ごとの処理時間（p50/p95）と1分あたりの処理枚数を別ウィンドウに表示する
+"""
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox
+from typing import Optional
+from utils.perf_trace import STAGE_LABELS, Tracer
+
+
+class PerformancePanel:
+    """処理時間の集計を定期的に更新して表示するウィンドウを管理するクラス"""
+
+    # 表示の更新間隔（ミリ秒）
+    REFRESH_INTERVAL_MS = 1000
+
+    def __init__(self, root: tk.Misc, tracer: Tracer):
+        self.root = root
+        self.tracer = tracer
+        self.window: Optional[tk.Toplevel] = None
+        self.stats_label: Optional[tk.Label] = None
+        self._after_id = None
+
+    def show(self):
+        """パネルを表示（計測が無効の場合は有効にする）"""
+        self.tracer.enabled = True
+        if self.window is not None:
+            self.window.deiconify()
+            self.window.lift()
+            return
+
+        self.window = tk.Toplevel(self.root)
+        self.window.title("📈 パフォーマンス")
+        self.window.configure(bg="#ffffff")
+        self.window.attributes("-topmost", True)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.stats_label = tk.Label(
+            self.window,
+            text="",
+            font=("Menlo", 11),
+            fg="#1f2937",
+            bg="#ffffff",
+            justify="left",
+            anchor="nw"
+        )
+        self.stats_label.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+
+        button_frame = tk.Frame(self.window, bg="#ffffff")
+        button_frame.pack(fill="x", padx=12, pady=(0, 12))
+        tk.Button(button_frame, text="JSONで保存", command=self.export_json).pack(side="left")
+        tk.Button(button_frame, text="リセット", command=self._reset).pack(side="left", padx=(8, 0))
+
+        self._refresh()
+
+    def close(self):
+        """パネルを閉じる（計測は継続する）"""
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+            self.stats_label = None
+
+    def export_json(self):
+        """現在のセッションの計測データをJSONファイルに保存"""
+        file_path = filedialog.asksaveasfilename(
+            title="計測データの保存先を選択してください",
+            defaultextension=".json",
+            initialfile=time.strftime("performance_%Y%m%d_%H%M%S.json"),
+            filetypes=[("JSON files", "*.json")]
+        )
+        if not file_path:
+            return
+        try:
+            self.tracer.export_json(file_path)
+        except OSError as e:
+            messagebox.showerror("エラー", f"計測データの保存に失敗しました:\\n{str(e)}")
+
+    def _reset(self):
+        """計測データを破棄"""
+        self.tracer.reset()
+        self._update_text()
+
+    def _refresh(self):
+        """表示を更新し、次の更新を予約"""
+        self._update_text()
+        self._after_id = self.window.after(self.REFRESH_INTERVAL_MS, self._refresh)
+
+    def _update_text(self):
+        """集計結果をテキストで表示"""
+        if self.stats_label is None:
+            return
+        stats = self.tracer.stage_stats()
+        lines = [f"{'処理':<14}{'回数':>6}{'p50(ms)':>10}{'p95(ms)':>10}"]
+        for stage, label in STAGE_LABELS.items():
+            values = stats.get(stage)
+            if values is None:
+                lines.append(f"{label:<14}{'-':>6}{'-':>10}{'-':>10}")
+            else:
+                lines.append(
+                    f"{label:<14}{values['count']:>6}{values['p50_ms']:>10.1f}{values['p95_ms']:>10.1f}"
+                )
+        lines.append("")
+        lines.append(f"処理枚数: {self.tracer.images_per_minute():.1f} 枚/分")
+        for label, value in self.tracer.counter_values().items():
+            lines.append(f"{label}: {value}")
+        self.stats_label.configure(text="\n".join(lines))
@@ -13,6 +13,14 @@ Mac環境で動作する、画像ファイル名の一括変更システム
 
 import sys
 import os
+import time
+
+# 起動時間の計測開始時刻（起動ベンチマーク用）
+_START_TIME = time.perf_counter()
+
+import argparse
+import importlib.util
+import logging
 import tkinter as tk
 from tkinter import messagebox
 
@@ -28,24 +36,21 @@ except ImportError as e:
     sys.exit(1)
 
 
+# 起動から最初のウィンドウ表示までの目標時間（秒）
+STARTUP_TARGET_SECONDS = 1.0
+
+# 起動時にはインポートしない（必要になった時点でインポートする）モジュール
+DEFERRED_MODULES = ("openpyxl", "PIL.Image", "pillow_heif", "numpy")
+
+
 def check_dependencies():
-    """必要なライブラリがインストールされているかチェック"""
+    """必要なライブラリがインストールされているかチェック（インポートはせず、存在のみ確認）"""
     missing_packages = []
     
-    try:
-        import PIL
-    except ImportError:
-        missing_packages.append("Pillow")
-    
-    try:
-        import openpyxl
-    except ImportError:
-        missing_packages.append("openpyxl")
-    
-    try:
-        import pillow_heif
-    except ImportError:
-        missing_packages.append("pillow-heif")
+    for module_name, package_name in (("PIL", "Pillow"), ("openpyxl", "openpyxl"),
+                                      ("pillow_heif", "pillow-heif"), ("numpy", "numpy")):
+        if importlib.util.find_spec(module_name) is None:
+            missing_packages.append(package_name)
     
     if missing_packages:
         error_msg = (
@@ -70,14 +75,109 @@ def check_dependencies():
     return True
 
 
+def run_startup_benchmark(target_seconds: float = STARTUP_TARGET_SECONDS) -> bool:
+    """
+    起動から最初のウィンドウが表示されるまでの時間を計測（目標時間内かを返す）
+    インポートの内訳は python -X importtime main.py --startup-benchmark で確認できる
+    """
+    app = MainWindow()
+    # 最初のウィンドウが描画されるまでイベントを処理
+    app.root.update()
+    elapsed = time.perf_counter() - _START_TIME
+    
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    app.excel_reader.stop_watching()
+    app.root.destroy()
+    
+    within_target = elapsed <= target_seconds
+    print(f"最初のウィンドウ表示まで: {elapsed * 1000:.0f}ms (目標 {target_seconds * 1000:.0f}ms) "
+          f"{'OK' if within_target else '目標超過'}")
+    if loaded:
+        print(f"起動時に読み込まれたモジュール（遅延読み込みの対象）: {', '.join(loaded)}")
+    return within_target and not loaded
+
+
+def jpeg_quality(text: str) -> int:
+    """--qualityの値（1〜100の整数）を変換（範囲外の場合は引数のエラー）"""
+    try:
+        quality = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数を指定してください: {text}")
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"1〜100の範囲で指定してください: {quality}")
+    return quality
+
+
 def main():
     """メイン関数"""
+    parser = argparse.ArgumentParser(description="画像ファイル名変更システム")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="起動時間を計測して終了する（目標時間を超えた場合は終了コード1）")
+    parser.add_argument("--startup-target", type=float, default=STARTUP_TARGET_SECONDS,
+                        help="起動ベンチマークの目標時間（秒）")
+    parser.add_argument("--decode-benchmark", metavar="FOLDER", default=None,
+                        help="フォルダ内の画像を1枚ずつデコードし、所要時間と最大使用メモリを表示して終了する")
+    parser.add_argument("--memory-budget", type=int, default=None, metavar="MB",
+                        help="1枚のデコードに使うメモリの上限（MB、--decode-benchmark用）")
+    parser.add_argument("--master-benchmark", type=int, nargs="?", const=100000, default=None, metavar="ROWS",
+                        help="合成した素材マスター（既定 100000行）の読み込み時間と使用メモリを計測して終了する")
+    parser.add_argument("--search-history", metavar="TEXT", default=None,
+                        help="過去のリネーム履歴を部品名・重量・素材ID・加工ID・パスで検索して表示し、終了する")
+    parser.add_argument("--transcode-heic", nargs=2, metavar=("FOLDER", "OUTPUT"), default=None,
+                        help="フォルダ内のHEICをJPEGに変換して出力フォルダに保存し、終了する（変換済みのものは省略）")
+    parser.add_argument("--quality", type=jpeg_quality, default=None,
+                        help="JPEGの画質（1〜100、--transcode-heic用）")
+    parser.add_argument("--profile", action="store_true",
+                        help="起動から終了までのプロファイルを記録する（終了時にファイルへ出力）")
+    parser.add_argument("--profile-mode", choices=["cprofile", "sampling"], default="cprofile",
+                        help="プロファイルの方式（sampling: スタックのサンプリングで負荷を抑える）")
+    parser.add_argument("--profile-dir", default=None,
+                        help="プロファイルの保存先（既定: ~/.picture_rename/profiles）")
+    parser.add_argument("--debug", action="store_true",
+                        help="処理の詳細（読み込み・検出の完了、失敗の詳細など）をログに表示する")
+    args = parser.parse_args()
+    
+    # 警告以上は常に、--debug 指定時は詳細もコンソールに表示
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format="%(levelname)s %(name)s: %(message)s")
+    
     print("画像ファイル名変更システムを起動しています...")
     
     # 依存関係チェック
     if not check_dependencies():
         sys.exit(1)
     
+    if args.startup_benchmark:
+        sys.exit(0 if run_startup_benchmark(args.startup_target) else 1)
+    
+    if args.decode_benchmark:
+        from utils.bounded_decode import DEFAULT_MEMORY_BUDGET, run_decode_benchmark
+        budget = args.memory_budget * 1024 * 1024 if args.memory_budget else DEFAULT_MEMORY_BUDGET
+        run_decode_benchmark(args.decode_benchmark, memory_budget=budget)
+        sys.exit(0)
+    
+    if args.master_benchmark:
+        from utils.excel_reader import run_master_benchmark
+        run_master_benchmark(args.master_benchmark)
+        sys.exit(0)
+    
+    if args.search_history is not None:
+        from utils.rename_history import print_history_search
+        print_history_search(args.search_history)
+        sys.exit(0)
+    
+    if args.transcode_heic:
+        from utils.heic_transcoder import TRANSCODE_QUALITY, run_transcode_batch
+        folder, output_folder = args.transcode_heic
+        failed = run_transcode_batch(folder, output_folder, TRANSCODE_QUALITY if args.quality is None else args.quality)
+        sys.exit(1 if failed else 0)
+    
+    profiler = None
+    if args.profile:
+        from utils.session_profiler import DEFAULT_PROFILE_DIR, SessionProfiler
+        profiler = SessionProfiler(args.profile_dir or DEFAULT_PROFILE_DIR, args.profile_mode)
+        profiler.start()
+    
     try:
         # メインアプリケーションを起動
         app = MainWindow()
@@ -97,7 +197,15 @@ def main():
             pass
         
         sys.exit(1)
+    
+    finally:
+        if profiler:
+            print(f"プロファイルを保存しました: {profiler.stop()}")
 
 
 if __name__ == "__main__":
+    # アプリとして配布した実行ファイルでも、プレビュー先読みのワーカープロセスを起動できるようにする
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+撮影時刻によるペア推定のテスト
+撮影間隔からのペアの区切り、奇数枚の区切りで外す画像、枚数が多い場合の処理時間を確認する
+"""
+import time
+import unittest
+
+from utils.capture_pairs import pair_by_capture_time
+
+
+def _pairs(times):
+    """(Pの撮影時刻, Mの撮影時刻) の一覧"""
+    proposals = pair_by_capture_time(times)
+    return sorted((times[index], times[proposal.partner])
+                  for index, proposal in proposals.items() if proposal.photo_type == "P")
+
+
+class PairByCaptureTimeTest(unittest.TestCase):
+    """pair_by_capture_timeの区切りとペア"""
+
+    def test_retake_in_short_run_keeps_first_pair(self):
+        # 30秒以内で続くまとまりでも、20秒の間隔で区切り、23/26をペアにして29を外す
+        self.assertEqual(_pairs([0, 3, 23, 26, 29, 49, 52]), [(0, 3), (23, 26), (49, 52)])
+
+    def test_wide_gap_splits_pairs(self):
+        # 位置で組むと (2, 10) のペアになる並び
+        self.assertEqual(_pairs([0, 2, 10, 12, 14, 24, 26]), [(0, 2), (10, 12), (24, 26)])
+
+    def test_skips_image_with_largest_pair_gap(self):
+        self.assertEqual(_pairs([0, 8, 10, 18, 20]), [(8, 10), (18, 20)])
+
+    def test_missing_time_and_max_gap_break_runs(self):
+        self.assertEqual(_pairs([0, 2, None, 10, 12, 100, 140]), [(0, 2), (10, 12)])
+
+    def test_evenly_spaced_run_pairs_by_position(self):
+        self.assertEqual(_pairs([0, 5, 10, 15]), [(0, 5), (10, 15)])
+
+    def test_large_folder_is_linear(self):
+        times = [index * 4.0 for index in range(8001)]
+        started = time.perf_counter()
+        proposals = pair_by_capture_time(times)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(len(proposals), 8000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+ファイル操作のテスト
+複数選択のリネームで、写真区分がペアの何枚目かで決まることを確認する
+"""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.file_handler import FileHandler
+
+
+def _renamed(number: int, photo_type: str) -> str:
+    return f"{number}_既存_1_kg_M001_K001_{photo_type}_無.jpg"
+
+
+class RenameSelectedFilesTest(unittest.TestCase):
+    """rename_selected_filesの写真区分の割り当て"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.folder = self._temp.name
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def _rename(self, existing, count: int, photo_type: str, manual_number: str = ""):
+        """既存のファイルとcount枚の未リネームのファイルを作成してまとめてリネームし、(番号, 写真区分) を返す"""
+        for name in existing:
+            Path(self.folder, name).touch()
+        sources = [os.path.join(self.folder, f"IMG_{i:04d}.jpg") for i in range(count)]
+        for source in sources:
+            Path(source).touch()
+        handler = FileHandler()
+        handler.image_folder = self.folder
+        handler.image_files = list(sources)
+        self.assertTrue(handler.rename_selected_files(list(range(count)), "部品", "2", "kg", "M001", "K001",
+                                                      photo_type, "無", manual_number))
+        return [handler.parse_renamed_file(path) for path in handler.image_files]
+
+    def test_first_file_completes_existing_pair(self):
+        # 5番のPが既にある場合: 5はM、6はP/M、7はP
+        result = self._rename([_renamed(5, "P")], 4, "P")
+        self.assertEqual(result, [(5, "M"), (6, "P"), (6, "M"), (7, "P")])
+
+    def test_partner_type_is_respected(self):
+        # 既存の相手がMなら、選択した区分に関係なくPにする
+        result = self._rename([_renamed(3, "M")], 3, "M", manual_number="3")
+        self.assertEqual(result, [(3, "P"), (4, "M"), (4, "P")])
+
+    def test_empty_folder_alternates_from_selected_type(self):
+        result = self._rename([], 4, "M")
+        self.assertEqual(result, [(1, "M"), (1, "P"), (2, "M"), (2, "P")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+メタデータ書き込みのテスト
+書き出し中にファイルがリネームされた場合に、古い名前のファイルを作り直さないことを確認する
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from utils import metadata_writer
+from utils.metadata_writer import embed_metadata
+from utils.preview_store import file_key
+
+
+ATTRIBUTES = {"number": "1", "part_name": "ボルト", "photo_type": "P"}
+
+
+class EmbedMetadataTest(unittest.TestCase):
+    """embed_metadataの置き換え"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.folder = self._temp.name
+        self.path = os.path.join(self.folder, "1_ボルト_2_kg_M001_K001_P_無.jpg")
+        Image.new("RGB", (32, 24), (200, 100, 50)).save(self.path, "JPEG")
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def test_returns_keys_before_and_after_rewrite(self):
+        before = file_key(self.path)
+        keys = embed_metadata(self.path, ATTRIBUTES)
+        self.assertEqual(keys, (before, file_key(self.path)))
+        self.assertNotEqual(keys[0], keys[1])
+        with open(self.path, "rb") as f:
+            self.assertIn("ボルト".encode("utf-8"), f.read())
+
+    def test_skips_file_renamed_while_writing(self):
+        renamed = os.path.join(self.folder, "2_ボルト_2_kg_M001_K001_P_無.jpg")
+        lock = metadata_writer.FolderLock
+
+        def rename_then_lock(folder):
+            # 一時ファイルを書き出した後、ロックを取得する前に他の操作でリネームされた場合
+            os.rename(self.path, renamed)
+            return lock(folder)
+
+        with mock.patch.object(metadata_writer, "FolderLock", side_effect=rename_then_lock):
+            self.assertIsNone(embed_metadata(self.path, ATTRIBUTES))
+        self.assertEqual(sorted(name for name in os.listdir(self.folder) if name.endswith(".jpg")),
+                         [os.path.basename(renamed)])
+        self.assertFalse([name for name in os.listdir(self.folder) if name.endswith(".tmp")])
+
+
+if __name__ == "__main__":
+    unittest.main()
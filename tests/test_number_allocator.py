@@ -0,0 +1,68 @@
+"""
+番号割り当てのテスト
+複数のプロセス（端末）が同じフォルダで同時にリネームしても、番号が重複・欠番にならないことを確認する
+"""
+import multiprocessing
+import os
+import tempfile
+import unittest
+from collections import defaultdict
+from pathlib import Path
+
+from utils.file_handler import FileHandler
+
+
+WORKERS = 4
+FILES_PER_WORKER = 10
+
+
+def _rename_all(folder: str, owner: str, start, failures):
+    """1つの端末として、自分の画像を1枚ずつ自動番号でリネーム（子プロセスで実行）"""
+    sources = []
+    for i in range(FILES_PER_WORKER):
+        source = os.path.join(folder, f"IMG_{owner}_{i:02d}.jpg")
+        Path(source).touch()
+        sources.append(source)
+    handler = FileHandler()
+    handler.image_folder = folder
+    handler.image_files = sources
+    handler.number_owner = owner
+    start.wait()
+    for index in range(FILES_PER_WORKER):
+        handler.current_index = index
+        if not handler.rename_current_file(owner, str(index), "kg", "M001", "K001", "P", "無"):
+            failures.put(f"{owner}: {index}")
+
+
+class ConcurrentAllocationTest(unittest.TestCase):
+    """複数のプロセスからの同時の番号割り当て"""
+
+    def test_processes_share_numbers_without_gaps(self):
+        with tempfile.TemporaryDirectory() as folder:
+            start = multiprocessing.Event()
+            failures = multiprocessing.Queue()
+            processes = [multiprocessing.Process(target=_rename_all, args=(folder, f"ws{n}", start, failures))
+                         for n in range(WORKERS)]
+            for process in processes:
+                process.start()
+            start.set()
+            for process in processes:
+                process.join(60)
+                self.assertEqual(process.exitcode, 0)
+            self.assertTrue(failures.empty())
+
+            owners_by_number = defaultdict(list)
+            for path in Path(folder).glob("*.jpg"):
+                number, owner = path.stem.split('_')[:2]
+                self.assertTrue(number.isdigit(), path.name)
+                owners_by_number[int(number)].append(owner)
+
+            # 1から欠番なく、各番号は同じ端末の2枚
+            self.assertEqual(sorted(owners_by_number), list(range(1, WORKERS * FILES_PER_WORKER // 2 + 1)))
+            for number, owners in owners_by_number.items():
+                self.assertEqual(len(owners), 2, number)
+                self.assertEqual(owners[0], owners[1], number)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+xlsx高速読み込みのテスト
+日付・共有文字列・インライン文字列を含むブックを作成し、openpyxlのread_only読み込みと値を比較する
+"""
+import datetime
+import os
+import re
+import tempfile
+import unittest
+import warnings
+import zipfile
+
+import openpyxl
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+from utils.xlsx_stream import XlsxStreamReader
+
+
+ROWS = 3000
+# 共有文字列（エスケープ・記号・日本語を含む）
+TEXTS = ["ボルト", "ナット_x005F_x000D_A", "改行_x000D_あり", "a & b <c>", "  前後の空白  ", "x005F_"]
+# 列: 共有文字列, 日時, 日付, 時刻, 経過時間, ユーザー定義の日付形式, 組み込みの日付形式(14),
+#     小数, 整数, 真偽値, 数式, 日付ではない形式（引用符内のd）, 色指定の形式, インライン文字列
+INLINE_COLUMN = "N"
+# 共有文字列ではふりがな付きのリッチテキストにする文字列
+RICH_TEXT = "ボルト"
+
+
+def _write_workbook(path: str, date1904: bool = False):
+    """比較用のブックを作成（N列は共有文字列をインライン文字列に書き換える）"""
+    workbook = openpyxl.Workbook()
+    if date1904:
+        workbook.epoch = CALENDAR_MAC_1904
+    sheet = workbook.active
+    sheet.append(["文字列", "日時", "日付", "時刻", "経過時間", "ユーザー定義", "組み込み", "小数", "整数",
+                  "真偽値", "数式", "引用符", "色", "インライン"])
+    start = datetime.datetime(2020, 1, 1, 8, 30)
+    for number in range(ROWS):
+        row = number + 2
+        sheet.append([
+            TEXTS[number % len(TEXTS)],
+            start + datetime.timedelta(days=number, minutes=number),
+            (start + datetime.timedelta(days=number)).date(),
+            datetime.time(number % 24, number % 60, number % 60),
+            datetime.timedelta(hours=number % 50, minutes=number % 60),
+            40000 + number + 0.25,
+            40000 + number,
+            number / 7,
+            number,
+            number % 2 == 0,
+            f"=H{row}*2",
+            number + 0.5,
+            -number,
+            f"インライン{number} & <{TEXTS[number % len(TEXTS)]}>",
+        ])
+        sheet.cell(row, 6).number_format = "yyyy/mm/dd hh:mm"
+        sheet.cell(row, 7).number_format = "mm-dd-yy"
+        sheet.cell(row, 12).number_format = '0.0" d"'
+        sheet.cell(row, 13).number_format = "[Red]0;[Blue]-0"
+    # 日付の範囲外のシリアル値
+    sheet.cell(ROWS + 2, 1).value = "範囲外"
+    sheet.cell(ROWS + 2, 7).value = 1e10
+    sheet.cell(ROWS + 2, 7).number_format = "mm-dd-yy"
+    workbook.save(path)
+    _convert_to_shared_strings(path, INLINE_COLUMN)
+
+
+def _convert_to_shared_strings(path: str, inline_column: str):
+    """
+    文字列のセルを共有文字列に書き換える（openpyxlはすべてインライン文字列で書き出すため）
+    inline_columnの列はインライン文字列のまま残し、「ボルト」はふりがな付きのリッチテキストにする
+    """
+    with zipfile.ZipFile(path) as source:
+        members = {name: source.read(name) for name in source.namelist()}
+    strings = []
+    indexes = {}
+
+    def shared(match):
+        ref, style, text = match.group(1), match.group(2), match.group(3)
+        if ref.rstrip("0123456789") == inline_column:
+            return match.group(0)
+        if text not in indexes:
+            indexes[text] = len(strings)
+            strings.append(text)
+        return f'<c r="{ref}"{style} t="s"><v>{indexes[text]}</v></c>'
+
+    sheet = members["xl/worksheets/sheet1.xml"].decode("utf-8")
+    sheet = re.sub(r'<c r="([A-Z]+\d+)"((?: s="\d+")?) t="inlineStr"><is><t[^>]*>([^<]*)</t></is></c>', shared, sheet)
+    members["xl/worksheets/sheet1.xml"] = sheet.encode("utf-8")
+
+    items = []
+    for text in strings:
+        if text == RICH_TEXT:
+            items.append('<si><r><rPr><b/></rPr><t>ボ</t></r><r><t>ルト</t></r>'
+                         '<rPh sb="0" eb="3"><t>ボルト</t></rPh></si>')
+        else:
+            items.append(f'<si><t xml:space="preserve">{text}</t></si>')
+    members["xl/sharedStrings.xml"] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        f'count="{len(strings)}" uniqueCount="{len(strings)}">{"".join(items)}</sst>'
+    ).encode("utf-8")
+    members["[Content_Types].xml"] = members["[Content_Types].xml"].replace(
+        b"</Types>",
+        b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-'
+        b'officedocument.spreadsheetml.sharedStrings+xml"/></Types>'
+    )
+    members["xl/_rels/workbook.xml.rels"] = members["xl/_rels/workbook.xml.rels"].replace(
+        b"</Relationships>",
+        b'<Relationship Id="rIdShared" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        b'relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+        for name, data in members.items():
+            target.writestr(name, data)
+
+
+def _openpyxl_rows(path: str):
+    """openpyxlのread_only読み込みの値"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # 範囲外の日付の警告
+            return [tuple(row) for row in workbook.active.iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+class XlsxStreamDifferentialTest(unittest.TestCase):
+    """高速読み込みとopenpyxlの値の比較"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def _assert_same_as_openpyxl(self, date1904: bool):
+        path = os.path.join(self.folder.name, "master.xlsx")
+        _write_workbook(path, date1904)
+        expected = _openpyxl_rows(path)
+        width = len(expected[0])
+        with zipfile.ZipFile(path) as archive:
+            sheet_xml = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertIn('t="inlineStr"', sheet_xml)
+        self.assertIn('t="s"', sheet_xml)
+
+        with XlsxStreamReader(path) as reader:
+            shared_strings = reader._load_shared_strings()
+            # 正規表現による高速走査（汎用パーサーへの切り替えなし）
+            fast = [tuple(row) + (None,) * (width - len(row)) for _, row in
+                    reader._iter_rows_fast(1, None, set(range(width)), shared_strings)]
+            generic = [row + (None,) * (width - len(row)) for _, row in
+                       reader._iter_rows_generic(1, None, None, shared_strings)]
+
+        self.assertEqual(len(expected), ROWS + 2)
+        for name, rows in (("高速走査", fast), ("汎用パーサー", generic)):
+            mismatches = [(number, got, want) for number, (got, want) in enumerate(zip(rows, expected), 1)
+                          if got != want or [type(v) for v in got] != [type(v) for v in want]]
+            self.assertEqual(len(rows), len(expected), name)
+            self.assertEqual(mismatches[:3], [], name)
+
+        self.assertIsInstance(expected[1][1], datetime.datetime)
+        self.assertIsInstance(expected[1][4], datetime.timedelta)
+        self.assertEqual(expected[-1][6], "#VALUE!")
+
+    def test_same_values_as_openpyxl(self):
+        self._assert_same_as_openpyxl(date1904=False)
+
+    def test_same_values_as_openpyxl_1904(self):
+        self._assert_same_as_openpyxl(date1904=True)
+
+    def test_selected_columns(self):
+        """指定列だけを読む場合も、指定列の値はopenpyxlと同じ"""
+        path = os.path.join(self.folder.name, "master.xlsx")
+        _write_workbook(path)
+        expected = _openpyxl_rows(path)
+        columns = (0, 1, 6, 13)
+        with XlsxStreamReader(path) as reader:
+            rows = list(reader.iter_rows(min_row=2, columns=columns))
+        got = [[row[i] for i in columns] for row in rows]
+        want = [[row[i] for i in columns] for row in expected[1:]]
+        self.assertEqual(len(got), len(want))
+        self.assertEqual([(a, b) for a, b in zip(got, want) if a != b][:3], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
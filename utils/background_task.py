@@ -0,0 +1,103 @@
+"""
+バックグラウンド処理モジュール
+ワーカースレッドで重い処理を実行し、進捗と結果をTkのafter()経由でメインスレッドに渡す
+"""
+import logging
+import queue
+import threading
+import tkinter as tk
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    """ワーカースレッドで処理を実行するクラス（Tkウィジェットの操作はすべてメインスレッドで行う）"""
+
+    # 結果・進捗を確認する間隔（ミリ秒）
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, widget: tk.Misc, target: Callable[[Callable[[Any], None]], Any],
+                 on_complete: Callable[[Any], None],
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 on_progress: Optional[Callable[[Any], None]] = None):
+        """
+        target: ワーカースレッドで実行する関数。進捗通知用の関数を引数に受け取る
+        on_complete / on_error / on_progress: メインスレッドで呼び出されるコールバック
+        """
+        self.widget = widget
+        self.target = target
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.on_progress = on_progress
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._cancelled = False
+
+    def start(self):
+        """ワーカースレッドを開始し、メインスレッドでの結果確認を予約"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def cancel(self):
+        """結果を破棄する（実行中の処理自体は最後まで実行される）"""
+        self._cancelled = True
+
+    def is_running(self) -> bool:
+        """ワーカースレッドが実行中かチェック"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        """ワーカースレッド本体"""
+        try:
+            result = self.target(self._report_progress)
+        except Exception as e:
+            self._queue.put(('error', e))
+        else:
+            self._queue.put(('done', result))
+
+    def _report_progress(self, value: Any):
+        """ワーカースレッドから進捗を通知"""
+        self._queue.put(('progress', value))
+
+    def _poll(self):
+        """キューを確認し、コールバックをメインスレッドで呼び出す"""
+        latest_progress = None
+        has_progress = False
+        finished = None
+
+        try:
+            while True:
+                kind, value = self._queue.get_nowait()
+                if kind == 'progress':
+                    # 進捗は最新の値だけを反映すれば十分
+                    latest_progress = value
+                    has_progress = True
+                else:
+                    finished = (kind, value)
+                    break
+        except queue.Empty:
+            pass
+
+        if self._cancelled:
+            return
+
+        if has_progress and self.on_progress:
+            self.on_progress(latest_progress)
+
+        if finished is None:
+            try:
+                self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+            except tk.TclError:
+                pass  # ウィンドウが破棄された
+            return
+
+        kind, value = finished
+        if kind == 'done':
+            self.on_complete(value)
+        elif self.on_error:
+            self.on_error(value)
+        else:
+            logger.warning(f"バックグラウンド処理でエラーが発生しました: {value}")
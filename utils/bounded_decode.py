@@ -0,0 +1,170 @@
+"""
+メモリ上限付きデコードモジュール
+大きな画像や透過画像を、全画素のコピーを何枚も作らずに表示用のRGB画像へ縮小する
+- JPEGは縮小デコード（draft）で必要なサイズ以上の最小の縮小率でデコードする
+- デコード後の画素数が上限（メモリ予算）を超える画像はデコードせずに拒否する
+- 透過の合成と縮小は帯状（数MBずつ）に行い、全画素の背景・アルファのコピーを作らない
+"""
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+# 1枚のデコードに使うメモリの上限（デコード直後の画素データのバイト数、48MPのRGB・RGBAで約190MB）
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# 合成・縮小を行う帯1つあたりの目安（バイト）
+STRIP_BYTES = 8 * 1024 * 1024
+
+# 最終サイズの何倍まで整数倍の縮小（reduce）で縮めるか（残りは指定のリサンプリングで縮小する）
+REDUCING_GAP = 2
+
+# 透過部分を埋める背景色
+BACKGROUND_COLOR = (255, 255, 255)
+
+# Pillowのメモリ上の1画素あたりのバイト数（これ以外のモードはRGB・LAを含め4バイト）
+_BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2}
+
+
+class ImageTooLargeError(Exception):
+    """デコードに必要なメモリが上限を超える場合のエラー（メッセージはそのままユーザーに表示する）"""
+
+
+def fit_size(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """アスペクト比を維持して最大サイズに収まるサイズ（元の方が小さい場合はそのまま）"""
+    width, height = size
+    ratio = min(max_size[0] / width, max_size[1] / height)
+    if ratio >= 1.0:
+        return size
+    return (max(1, int(width * ratio)), max(1, int(height * ratio)))
+
+
+def decoded_bytes(img: "Image.Image") -> int:
+    """画像をデコードした場合の画素データのバイト数（draft後のサイズ・モードで計算）"""
+    return img.width * img.height * _BYTES_PER_PIXEL.get(img.mode, 4)
+
+
+def has_alpha(img: "Image.Image") -> bool:
+    """透過情報を持つ画像かチェック"""
+    return img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in img.info
+
+
+def decode_rgb(img: "Image.Image", size: Tuple[int, int],
+               memory_budget: int = DEFAULT_MEMORY_BUDGET, resample=None) -> "Image.Image":
+    """
+    開いた画像を指定サイズのRGB画像にデコード（透過部分は白で埋める）
+    memory_budget: デコード直後の画素データの上限（超える場合はImageTooLargeError）
+    resample: 最後のリサイズの方式（Noneは LANCZOS）
+    """
+    from PIL import Image
+    result = decode_reduced(img, size, memory_budget)
+    if result.size != size:
+        result = result.resize(size, Image.Resampling.LANCZOS if resample is None else resample)
+    return result
+
+
+def decode_reduced(img: "Image.Image", size: Tuple[int, int],
+                   memory_budget: int = DEFAULT_MEMORY_BUDGET) -> "Image.Image":
+    """
+    開いた画像を、指定サイズのREDUCING_GAP倍程度まで縮小したRGB画像にデコード（最後のリサイズは呼び出し側で行う）
+    memory_budget: デコード直後の画素データの上限（超える場合はImageTooLargeError）
+    """
+    # JPEGは指定サイズ以上で最小の縮小率（1/2, 1/4, 1/8）でデコードされる（他の形式では何もしない）
+    img.draft('RGB', size)
+    needed = decoded_bytes(img)
+    if needed > memory_budget:
+        raise ImageTooLargeError(
+            f"画像が大きすぎるため表示できません ({img.width}x{img.height}, "
+            f"必要なメモリ {needed / 1024 / 1024:.0f}MB, 上限 {memory_budget / 1024 / 1024:.0f}MB)"
+        )
+    img.load()
+
+    # 最終サイズのREDUCING_GAP倍以上を保つ整数倍の縮小率
+    factor = max(1, int(min(img.width / size[0], img.height / size[1]) / REDUCING_GAP))
+    alpha = has_alpha(img)
+    if factor == 1 and not alpha:
+        return img if img.mode == 'RGB' else img.convert('RGB')
+    return _composite_and_reduce(img, factor, alpha)
+
+
+def _composite_and_reduce(img: "Image.Image", factor: int, alpha: bool) -> "Image.Image":
+    """
+    帯ごとに白背景への合成とfactor分の1への縮小を行い、1枚のRGB画像にまとめる
+    全画素分の作業用コピーは作らず、帯の分（STRIP_BYTES程度）だけを追加で使う
+    """
+    from PIL import Image
+    width, height = img.size
+    output = Image.new('RGB', (-(-width // factor), -(-height // factor)))
+    # 帯の行数はfactorの倍数（縮小後の行の境目を帯の境目と一致させる）
+    rows = max(factor, STRIP_BYTES // (width * 4) // factor * factor)
+    for top in range(0, height, rows):
+        strip = img.crop((0, top, width, min(top + rows, height)))
+        if alpha:
+            strip = strip.convert('RGBA')
+            background = Image.new('RGB', strip.size, BACKGROUND_COLOR)
+            # RGBAの画像をマスクに指定するとアルファが使われる（split()でのコピーは不要）
+            background.paste(strip, mask=strip)
+            strip = background
+        elif strip.mode != 'RGB':
+            strip = strip.convert('RGB')
+        if factor > 1:
+            strip = strip.reduce(factor)
+        output.paste(strip, (0, top // factor))
+    return output
+
+
+def _measure_one(image_path: str, max_size: Tuple[int, int], memory_budget: int) -> Dict[str, object]:
+    """別プロセスで1枚をデコードし、所要時間と最大使用メモリの増加量を計測"""
+    import resource
+    import sys
+    from PIL import Image
+    from utils.image_processor import ensure_heif_support
+    ensure_heif_support(image_path)
+    # ru_maxrssはLinuxではKB、macOSではバイト
+    unit = 1 if sys.platform == 'darwin' else 1024
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    started = time.perf_counter()
+    result: Dict[str, object] = {'path': image_path}
+    try:
+        with Image.open(image_path) as img:
+            result['size'] = img.size
+            result['mode'] = img.mode
+            decode_rgb(img, fit_size(img.size, max_size), memory_budget)
+    except ImageTooLargeError as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - started
+    result['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit - baseline
+    return result
+
+
+def run_decode_benchmark(folder: str, max_size: Tuple[int, int] = (800, 480),
+                         memory_budget: int = DEFAULT_MEMORY_BUDGET) -> List[Dict[str, object]]:
+    """
+    フォルダ内の画像を1枚ずつ新しいプロセスでデコードし、1枚ごとの最大使用メモリ（RSSの増加量）を表示
+    プロセスを分けるのは、最大使用メモリがプロセス単位でしか取得できないため
+    """
+    import multiprocessing
+    from utils.file_handler import FileHandler
+
+    extensions = FileHandler.SUPPORTED_EXTENSIONS
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if os.path.splitext(name)[1].lower() in extensions
+    )
+    results = []
+    # 1枚ごとにプロセスを作り直す（spawnで起動し、親プロセスのメモリを引き継がない）
+    with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+        for path in paths:
+            result = pool.apply(_measure_one, (path, max_size, memory_budget))
+            results.append(result)
+            name = os.path.basename(path)
+            if 'error' in result:
+                print(f"{name}: 拒否 ({result['error']})")
+            else:
+                width, height = result['size']
+                print(f"{name}: {width}x{height} {result['mode']}  {result['seconds'] * 1000:.0f}ms  "
+                      f"最大使用メモリ +{result['peak_rss'] / 1024 / 1024:.1f}MB")
+    return results
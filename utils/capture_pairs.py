@@ -0,0 +1,154 @@
+"""
+撮影時刻によるペア推定モジュール
+画像のヘッダーから撮影時刻（EXIFのDateTimeOriginal）を読み取り、数秒以内に続けて撮影された2枚を
+部品写真(P)と素材込み(M)のペアとみなして、番号と写真区分を事前に提案する
+画素データはデコードせず、ヘッダーだけを1回ずつ読む
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from utils.image_processor import ensure_heif_support
+
+logger = logging.getLogger(__name__)
+
+
+# ペアとみなす撮影間隔の上限（秒）
+PAIR_GAP_SECONDS = 30.0
+
+# 前後どちらかの撮影間隔のこの倍数以上空いた間隔を、ペアの区切りとみなす
+PAIR_SPLIT_RATIO = 2.0
+
+# 撮影間隔の比較に使う最小値（秒、EXIFの撮影時刻は秒単位の場合があるため）
+GAP_RESOLUTION = 1.0
+
+# ペアのうち先に撮影した画像の写真区分（後の画像は反対の区分）
+FIRST_PHOTO_TYPE = "P"
+
+# EXIFのタグ
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME = 0x0132
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_SUBSEC_TIME_ORIGINAL = 0x9291
+
+# 進捗を通知する間隔（画像の枚数）
+PROGRESS_INTERVAL = 200
+
+
+class PairProposal:
+    """1枚の画像に対する提案（ペアの相手と写真区分）"""
+
+    __slots__ = ('partner', 'photo_type', 'gap')
+
+    def __init__(self, partner: int, photo_type: str, gap: float):
+        self.partner = partner        # ペアの相手の画像のインデックス
+        self.photo_type = photo_type  # 提案する写真区分（P/M）
+        self.gap = gap                # 撮影間隔（秒）
+
+
+def read_capture_time(image_path: str) -> Optional[float]:
+    """撮影時刻（エポック秒、EXIFにない場合はNone）をヘッダーから読み取る"""
+    from PIL import Image
+    try:
+        ensure_heif_support(image_path)
+        with Image.open(image_path) as img:
+            exif = img.getexif()
+            exif_ifd = exif.get_ifd(_TAG_EXIF_IFD)
+            text = exif_ifd.get(_TAG_DATETIME_ORIGINAL) or exif.get(_TAG_DATETIME)
+            subsec = exif_ifd.get(_TAG_SUBSEC_TIME_ORIGINAL)
+        if not text:
+            return None
+        timestamp = datetime.strptime(str(text).strip('\x00 '), "%Y:%m:%d %H:%M:%S").timestamp()
+        if subsec and str(subsec).strip('\x00 ').isdigit():
+            digits = str(subsec).strip('\x00 ')
+            timestamp += int(digits) / 10 ** len(digits)
+        return timestamp
+    except Exception as e:
+        logger.debug(f"撮影時刻を読み取れませんでした: {os.path.basename(image_path)} ({e})")
+        return None
+
+
+def pair_by_capture_time(times: List[Optional[float]],
+                         max_gap: float = PAIR_GAP_SECONDS) -> Dict[int, PairProposal]:
+    """
+    フォルダ内の順に並んだ撮影時刻から、続けて撮影された2枚をペアにする（画像の枚数に比例した時間）
+    間隔がmax_gap以下で続く画像を1つのまとまりとし、前後の間隔より大きく空いた間隔でさらに区切って、
+    区切りの先頭から2枚ずつペアにする
+    区切りが奇数枚（撮り直しなど）の場合は、ペア内の撮影間隔の合計が最小になるよう1枚をペアから外す
+    戻り値: 画像のインデックス -> 提案（ペアにならなかった画像は含まない）
+    """
+    proposals: Dict[int, PairProposal] = {}
+    start = 0
+    for index in range(1, len(times) + 1):
+        if index < len(times) and _gap(times, index - 1, max_gap) is not None:
+            continue
+        gaps = [_gap(times, first, max_gap) for first in range(start, index - 1)]
+        cluster_start = start
+        for offset in range(len(gaps)):
+            if _is_split(gaps, offset):
+                _pair_cluster(times, cluster_start, start + offset + 1, max_gap, proposals)
+                cluster_start = start + offset + 1
+        _pair_cluster(times, cluster_start, index, max_gap, proposals)
+        start = index
+    return proposals
+
+
+def _gap(times: List[Optional[float]], index: int, max_gap: float) -> Optional[float]:
+    """index枚目と次の画像の撮影間隔（どちらかの時刻がない・順序が逆・max_gapを超える場合はNone）"""
+    if times[index] is None or times[index + 1] is None:
+        return None
+    value = times[index + 1] - times[index]
+    return value if 0 <= value <= max_gap else None
+
+
+def _is_split(gaps: List[float], offset: int) -> bool:
+    """まとまりのoffset番目の間隔が、前後どちらかの間隔（ペア内の間隔）より大きく空いているかチェック"""
+    neighbors = gaps[max(offset - 1, 0):offset] + gaps[offset + 1:offset + 2]
+    if not neighbors:
+        return False
+    return gaps[offset] >= PAIR_SPLIT_RATIO * max(min(neighbors), GAP_RESOLUTION)
+
+
+def _pair_cluster(times: List[Optional[float]], start: int, end: int, max_gap: float,
+                  proposals: Dict[int, PairProposal]):
+    """区切り（start〜end-1枚目）を2枚ずつペアにする"""
+    count = end - start
+    if count < 2:
+        return
+    second_type = "M" if FIRST_PHOTO_TYPE == "P" else "P"
+    skipped = None  # ペアから外す画像
+
+    if count % 2 == 1:
+        # 外す画像の候補は、前後の画像が2枚ずつに分かれる位置（区切りの中の偶数番目）
+        # 候補より前は先頭から、後は候補の次から2枚ずつ組むため、両側の間隔の合計を累積和で求める
+        # 合計が同じ場合は後の画像を外す（撮り直しは後から撮影するため）
+        before = 0.0
+        after = sum(_gap(times, first, max_gap) for first in range(start + 1, end - 1, 2))
+        best = None
+        for candidate in range(start, end, 2):
+            total = before + after
+            if best is None or total <= best:
+                best, skipped = total, candidate
+            if candidate + 2 < end:
+                before += _gap(times, candidate, max_gap)
+                after -= _gap(times, candidate + 1, max_gap)
+    first = start
+    while first + 1 < end:
+        if first == skipped:
+            first += 1
+            continue
+        gap = _gap(times, first, max_gap)
+        proposals[first] = PairProposal(first + 1, FIRST_PHOTO_TYPE, gap)
+        proposals[first + 1] = PairProposal(first, second_type, gap)
+        first += 2
+
+
+def index_capture_pairs(image_files: List[str], progress: Optional[Callable[[int], None]] = None,
+                        max_gap: float = PAIR_GAP_SECONDS) -> Dict[int, PairProposal]:
+    """フォルダ内の画像の撮影時刻を読み取り、ペアを提案（ワーカースレッドから呼び出す）"""
+    times: List[Optional[float]] = []
+    for number, image_path in enumerate(image_files, 1):
+        times.append(read_capture_time(image_path))
+        if progress and number % PROGRESS_INTERVAL == 0:
+            progress(number)
+    return pair_by_capture_time(times, max_gap)
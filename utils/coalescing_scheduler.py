@@ -0,0 +1,83 @@
+"""
+処理の間引きモジュール
+連続する変更通知をまとめ、コールバックごとに1フレームにつき最大1回だけ実行する
+"""
+import tkinter as tk
+from typing import Callable, Dict, FrozenSet, Optional, Set
+
+
+# まとめて実行するまでの待ち時間（ミリ秒、約1フレーム）
+FRAME_INTERVAL_MS = 16
+
+
+class CoalescingScheduler:
+    """
+    コールバックをキーにして実行予約をまとめるクラス
+    予約中に同じコールバックが要求された場合は新たに予約せず、変更された項目名だけを記録する
+    """
+
+    def __init__(self, widget: tk.Misc, delay_ms: int = FRAME_INTERVAL_MS):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        # コールバック -> 変更された項目名（Noneはすべての項目）
+        self._dirty: Dict[Callable, Optional[Set[str]]] = {}
+        self._after_id = None
+        # 間引きの効果を確認するためのカウンター
+        self.requested_count = 0
+        self.executed_count = 0
+
+    def schedule(self, callback: Callable[[Optional[FrozenSet[str]]], None], field: Optional[str] = None):
+        """
+        コールバックの実行を予約
+        実行時には予約以降に変更された項目名のfrozenset（項目名なしの要求が含まれる場合はNone）を渡す
+        """
+        self.requested_count += 1
+        if callback in self._dirty:
+            fields = self._dirty[callback]
+            if fields is not None:
+                if field is None:
+                    self._dirty[callback] = None
+                else:
+                    fields.add(field)
+        else:
+            self._dirty[callback] = None if field is None else {field}
+
+        if self._after_id is None:
+            try:
+                self._after_id = self.widget.after(self.delay_ms, self.flush)
+            except tk.TclError:
+                self._dirty.clear()  # ウィンドウが破棄された
+
+    def flush(self):
+        """予約中のコールバックをすべて実行"""
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+        pending = self._dirty
+        self._dirty = {}
+        for callback, fields in pending.items():
+            self.executed_count += 1
+            callback(frozenset(fields) if fields is not None else None)
+
+    def cancel(self):
+        """予約中のコールバックをすべて取り消す"""
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._dirty.clear()
+
+    @property
+    def avoided_count(self) -> int:
+        """まとめられて実行されなかった要求の数（実行待ちの予約は除く）"""
+        return self.requested_count - self.executed_count - len(self._dirty)
+
+    def summary(self) -> str:
+        """間引きの効果（表示用）"""
+        return f"要求{self.requested_count}回 / 実行{self.executed_count}回 / 省略{self.avoided_count}回"
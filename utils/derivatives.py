@@ -0,0 +1,66 @@
+"""
+派生画像作成モジュール
+リネームしたファイルから、部品カタログ用の縮小JPEG（長辺1600px）を出力フォルダに作成する（ワーカープロセスで実行）
+- JPEGは縮小デコード（draft）で必要なサイズ以上の最小の縮小率でデコードし、全画素のデコードを省く
+- EXIF（撮影日時・向き）とICCプロファイルは元の画像から引き継ぐ
+- 出力が元の画像より新しい場合は作成しない（同じファイルを何度投入しても結果は同じ）
+"""
+import os
+from typing import Optional
+from utils.bounded_decode import DEFAULT_MEMORY_BUDGET, decode_rgb, fit_size
+from utils.image_processor import ensure_heif_support
+
+
+# 派生画像の長辺の最大サイズ（px）とJPEGの画質
+DERIVATIVE_MAX_SIDE = 1600
+DERIVATIVE_QUALITY = 85
+
+
+def derivative_path(source_path: str, output_folder: str) -> str:
+    """派生画像の出力先（元のファイル名の拡張子を.jpgにしたもの）"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(output_folder, f"{stem}.jpg")
+
+
+def is_up_to_date(source_path: str, output_path: str) -> bool:
+    """出力が元の画像以降に作成されているかチェック"""
+    try:
+        return os.stat(output_path).st_mtime_ns >= os.stat(source_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def make_derivative(source_path: str, output_folder: str, max_side: int = DERIVATIVE_MAX_SIDE,
+                    quality: int = DERIVATIVE_QUALITY,
+                    memory_budget: int = DEFAULT_MEMORY_BUDGET) -> Optional[str]:
+    """
+    派生画像を作成（ワーカープロセスで呼び出す）
+    戻り値: 作成した派生画像のパス（作成済みで更新不要の場合はNone）
+    """
+    from PIL import Image
+    output_path = derivative_path(source_path, output_folder)
+    if is_up_to_date(source_path, output_path):
+        return None
+
+    ensure_heif_support(source_path)
+    with Image.open(source_path) as img:
+        exif = img.info.get('exif')
+        icc_profile = img.info.get('icc_profile')
+        derivative = decode_rgb(img, fit_size(img.size, (max_side, max_side)), memory_budget)
+
+    os.makedirs(output_folder, exist_ok=True)
+    # 書き込み途中のファイルが残らないよう、一時ファイルに保存してから置き換える
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    save_options = {'quality': quality, 'optimize': True}
+    if exif:
+        save_options['exif'] = exif
+    if icc_profile:
+        save_options['icc_profile'] = icc_profile
+    try:
+        derivative.save(temp_path, 'JPEG', **save_options)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return output_path
@@ -0,0 +1,184 @@
+"""
+重複画像検出モジュール
+フォルダ内の画像の知覚ハッシュ（dHash）を求め、ほぼ同じ画像（同じ部品を続けて撮影したものなど）をまとめる
+- 画像は縮小して読み込む（EXIFのサムネイルがあればそれを使い、なければJPEGの1/8縮小デコード）
+- ハッシュはNumPyで全画像分をまとめて計算し、近い画像はマルチインデックスハッシングで探す
+"""
+import logging
+import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from utils.image_processor import ensure_heif_support
+from utils.preview_store import DEFAULT_CPU_SHARE, init_low_priority_worker
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# ハッシュの一辺（HASH_SIZE x HASH_SIZE ビット = 64ビット）
+HASH_SIZE = 8
+
+# 重複とみなすハミング距離の上限（64ビット中。部品写真と素材込み写真を誤って重複としないよう小さめ）
+DUPLICATE_DISTANCE = 5
+
+# ワーカープロセスに一度に渡す画像の数
+CHUNK_SIZE = 64
+
+
+def _exif_thumbnail(img: "Image.Image") -> Optional[bytes]:
+    """JPEGのEXIFに埋め込まれたサムネイル（IFD1のJPEG）を取得（ない場合はNone）"""
+    exif = img.info.get('exif')
+    if not exif or not exif.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = exif[6:]
+    try:
+        order = '<' if tiff[:2] == b'II' else '>'
+        ifd0 = struct.unpack_from(f'{order}I', tiff, 4)[0]
+        entries = struct.unpack_from(f'{order}H', tiff, ifd0)[0]
+        ifd1 = struct.unpack_from(f'{order}I', tiff, ifd0 + 2 + entries * 12)[0]
+        if ifd1 == 0:
+            return None
+        offset = length = None
+        for number in range(struct.unpack_from(f'{order}H', tiff, ifd1)[0]):
+            tag, _, _, value = struct.unpack_from(f'{order}HHII', tiff, ifd1 + 2 + number * 12)
+            if tag == 0x0201:  # JPEGInterchangeFormat
+                offset = value
+            elif tag == 0x0202:  # JPEGInterchangeFormatLength
+                length = value
+    except struct.error:
+        return None
+    if not offset or not length or offset + length > len(tiff):
+        return None
+    return tiff[offset:offset + length]
+
+
+def reduce_for_hash(image_path: str) -> Optional[bytes]:
+    """画像を (HASH_SIZE + 1) x HASH_SIZE のグレースケールに縮小した画素（読み込めない場合はNone）"""
+    from PIL import Image
+    size = (HASH_SIZE + 1, HASH_SIZE)
+    try:
+        ensure_heif_support(image_path)
+        with Image.open(image_path) as img:
+            thumbnail = _exif_thumbnail(img) if img.format == 'JPEG' else None
+            if thumbnail is not None:
+                try:
+                    with Image.open(BytesIO(thumbnail)) as small:
+                        return small.convert('L').resize(size, Image.Resampling.BOX).tobytes()
+                except OSError:
+                    pass  # サムネイルが壊れている場合は本体を縮小して読み込む
+            # JPEGはグレースケールで1/8に縮小デコード（色変換も省略される）
+            img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+            return img.convert('L').resize(size, Image.Resampling.BOX).tobytes()
+    except Exception as e:
+        logger.warning(f"重複検出用の読み込みに失敗しました: {os.path.basename(image_path)} ({e})")
+        return None
+
+
+def _reduce_chunk(image_paths: List[str]) -> List[Optional[bytes]]:
+    """ワーカープロセスで複数の画像を縮小（プロセス間の受け渡しの回数を減らす）"""
+    return [reduce_for_hash(path) for path in image_paths]
+
+
+def dhash_batch(pixels: List[bytes]) -> List[int]:
+    """縮小した画素からdHash（横に隣り合う画素の明暗）をまとめて計算"""
+    import numpy as np
+    if not pixels:
+        return []
+    array = np.frombuffer(b''.join(pixels), dtype=np.uint8).reshape(len(pixels), HASH_SIZE, HASH_SIZE + 1)
+    bits = array[:, :, 1:] > array[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(pixels), -1), axis=1)
+    return [int(value) for value in packed.view('>u8').ravel()]
+
+
+def group_duplicates(hashes: List[Optional[int]], max_distance: int = DUPLICATE_DISTANCE) -> List[List[int]]:
+    """
+    距離が近い画像をまとめたグループ（2枚以上、インデックスの昇順）の一覧
+    マルチインデックスハッシング: ハッシュをmax_distance + 1個に分割すると、距離がmax_distance以下の2つは
+    少なくとも1つの部分が完全に一致する。部分が一致する組だけをNumPyでまとめて距離を計算する
+    """
+    import numpy as np
+    valid = [index for index, value in enumerate(hashes) if value is not None]
+    if len(valid) < 2:
+        return []
+    # 同じハッシュの画像は1つにまとめて比較する
+    unique, inverse = np.unique(np.array([hashes[index] for index in valid], dtype=np.uint64),
+                                return_inverse=True)
+
+    parts = max_distance + 1
+    part_bits = -(-64 // parts)
+    firsts, seconds = [], []
+    for part in range(parts):
+        keys = (unique >> np.uint64(part * part_bits)) & np.uint64((1 << part_bits) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            members = order[start:end]
+            first, second = np.triu_indices(len(members), 1)
+            firsts.append(members[first])
+            seconds.append(members[second])
+
+    parent = list(range(len(unique)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    if firsts:
+        first = np.concatenate(firsts)
+        second = np.concatenate(seconds)
+        # 部分が一致した組のハミング距離（8ビットごとのビット数の表で数える）
+        bit_counts = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+        xor = (unique[first] ^ unique[second]).view(np.uint8).reshape(-1, 8)
+        near = bit_counts[xor].sum(axis=1) <= max_distance
+        for a, b in zip(first[near].tolist(), second[near].tolist()):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[int, List[int]] = {}
+    for position, index in enumerate(valid):
+        groups.setdefault(find(int(inverse[position])), []).append(index)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def find_duplicates(image_files: List[str], progress: Optional[Callable[[Tuple[int, int]], None]] = None,
+                    cancel_event: Optional[threading.Event] = None, cpu_share: float = DEFAULT_CPU_SHARE,
+                    max_distance: int = DUPLICATE_DISTANCE) -> Dict[int, int]:
+    """
+    フォルダ内の重複画像を検出（ワーカースレッドから呼び出す）
+    戻り値: 重複画像のインデックス -> 同じグループで最初の画像のインデックス（最初の画像自体は含まない）
+    progress: 進捗（完了数, 総数）を受け取る関数
+    """
+    workers = max(1, int((os.cpu_count() or 1) * cpu_share))
+    chunks = [image_files[start:start + CHUNK_SIZE] for start in range(0, len(image_files), CHUNK_SIZE)]
+    pixels: List[Optional[bytes]] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_low_priority_worker) as executor:
+        futures = [executor.submit(_reduce_chunk, chunk) for chunk in chunks]
+        for future in futures:
+            if cancel_event is not None and cancel_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                return {}
+            pixels.extend(future.result())
+            if progress:
+                progress((len(pixels), len(image_files)))
+
+    valid = [index for index, data in enumerate(pixels) if data is not None]
+    hashes: List[Optional[int]] = [None] * len(image_files)
+    for index, value in zip(valid, dhash_batch([pixels[index] for index in valid])):
+        hashes[index] = value
+
+    duplicates: Dict[int, int] = {}
+    for members in group_duplicates(hashes, max_distance):
+        for index in members[1:]:
+            duplicates[index] = members[0]
+    return duplicates
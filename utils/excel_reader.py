@@ -1,32 +1,123 @@
 """
 Excel読み込みモジュール
-素材マスター.xlsxと加工方法マスター.xlsxからデータを読み込む
+素材マスター.xlsxと加工方法マスター.xlsx（またはCSV/TSV、両方のシートを含む1つのブック）からデータを読み込む
 """
-import openpyxl
+import logging
+import tkinter as tk
 from tkinter import filedialog, messagebox
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
 import os
+from utils.background_task import BackgroundTask
+from utils.master_loader import MASTER_FILETYPES, open_master_source, select_sheet_with_headers
+from utils.master_store import MasterDiff, MasterTable, RecordView, diff_tables
+from utils.perf_trace import STAGE_MASTER_LOAD, span, traced
+from utils.search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+
+# 進捗を通知する行間隔
+PROGRESS_INTERVAL = 2000
+
+# マスターファイルの変更を確認する間隔（ミリ秒）
+WATCH_INTERVAL_MS = 2000
+
+# 各マスターで必須の列名（この列がそろったシートを読み込む）
+MATERIAL_HEADERS = ("素材名", "素材ID", "素材区分")
+PROCESSING_HEADERS = ("加工方法名", "加工ID")
+
+
+class MasterFileError(Exception):
+    """マスターファイルの内容が不正な場合のエラー（メッセージはそのままユーザーに表示する）"""
+
+
+def _file_signature(file_path: str) -> Tuple[float, int]:
+    """変更検出用のファイルの状態（更新時刻, サイズ）を取得"""
+    stat = os.stat(file_path)
+    return (stat.st_mtime, stat.st_size)
+
+
+def build_material_search_indexes(table: MasterTable,
+                                  previous: Optional[Dict[str, SearchIndex]] = None,
+                                  unchanged_categories: Iterable[str] = ()) -> Dict[str, SearchIndex]:
+    """素材区分ごとの検索インデックスを構築（unchanged_categoriesはpreviousのものを再利用）"""
+    reuse = set(unchanged_categories) if previous else set()
+    indexes: Dict[str, SearchIndex] = {}
+    for record in table.records:
+        category = record.category
+        if category in reuse and category in previous:
+            indexes[category] = previous[category]
+            continue
+        search_index = indexes.get(category)
+        if search_index is None:
+            search_index = indexes[category] = SearchIndex()
+        search_index.add(record.name, (record.name, record.description, record.record_id))
+    for search_index in indexes.values():
+        search_index.prepare()
+    return indexes
+
+
+def build_processing_search_index(table: MasterTable) -> SearchIndex:
+    """加工方法の検索インデックスを構築"""
+    search_index = SearchIndex()
+    for record in table.records:
+        search_index.add(record.display_name, (record.name, record.description, record.record_id))
+    search_index.prepare()
+    return search_index
 
 
 class ExcelReader:
     """Excel読み込み処理を行うクラス"""
     
-    def __init__(self):
-        self.materials: Dict[str, str] = {}  # 表示名 -> 素材ID
-        self.processing_methods: Dict[str, str] = {}  # 表示名 -> 加工ID
-        self.materials_data: Dict[str, Dict[str, str]] = {}  # 素材IDの詳細データ
-        self.processing_methods_data: Dict[str, Dict[str, str]] = {}  # 加工IDの詳細データ
-        # 素材区分対応の新しい属性
-        self.material_categories: Dict[str, List[str]] = {}  # 素材区分 -> 素材名リスト
-        self.material_name_to_id: Dict[str, str] = {}  # 素材名 -> 素材ID
+    def __init__(self, use_fast_reader: bool = True):
+        # Trueの場合はopenpyxlを使わずにxlsxのXMLを直接ストリーム解析する
+        self.use_fast_reader = use_fast_reader
+        # マスターの各行はレコードとして1つだけ保持し、ID・名称・表示名・区分の索引から参照する
+        self.material_table = MasterTable()
+        self.processing_table = MasterTable()
+        # インクリメンタルサーチ用のインデックス（素材は区分ごと）
+        self.material_search_indexes: Dict[str, SearchIndex] = {}
+        self.processing_search_index = SearchIndex()
+        # 実行中のバックグラウンド読み込み（'materials' / 'processing_methods' -> BackgroundTask）
+        self._load_tasks: Dict[str, BackgroundTask] = {}
+        # 読み込み済みのファイル（'materials' / 'processing_methods' -> (パス, (更新時刻, サイズ), シート名)）
+        self._master_sources: Dict[str, Tuple[str, Tuple[float, int], str]] = {}
+        # 変更を検出したがまだ再読み込みしていないファイルの状態（書き込み途中の読み込みを避けるため）
+        self._pending_signatures: Dict[str, Tuple[float, int]] = {}
+        self._watch_widget: Optional[tk.Misc] = None
+        self._watch_callback: Optional[Callable[[str, MasterDiff], None]] = None
+        self._watch_after_id = None
     
-    def select_and_load_materials_file(self) -> bool:
-        """素材マスターファイルを選択し、読み込む"""
+    def select_materials_file(self) -> Optional[str]:
+        """素材マスターファイルを選択する（キャンセル時はNone）"""
         file_path = filedialog.askopenfilename(
             title="素材マスター.xlsxを選択してください",
+            filetypes=MASTER_FILETYPES,
+            initialdir=os.path.expanduser("~")
+        )
+        return file_path or None
+    
+    def select_processing_methods_file(self) -> Optional[str]:
+        """加工方法マスターファイルを選択する（キャンセル時はNone）"""
+        file_path = filedialog.askopenfilename(
+            title="加工方法マスター.xlsxを選択してください",
+            filetypes=MASTER_FILETYPES,
+            initialdir=os.path.expanduser("~")
+        )
+        return file_path or None
+    
+    def select_combined_workbook_file(self) -> Optional[str]:
+        """素材・加工方法の両方のシートを含むマスターファイルを選択する（キャンセル時はNone）"""
+        file_path = filedialog.askopenfilename(
+            title="素材・加工方法マスターを含むブックを選択してください",
             filetypes=[("Excel files", "*.xlsx")],
             initialdir=os.path.expanduser("~")
         )
+        return file_path or None
+    
+    def select_and_load_materials_file(self) -> bool:
+        """素材マスターファイルを選択し、読み込む"""
+        file_path = self.select_materials_file()
         
         if not file_path:
             return False
@@ -35,52 +126,70 @@ class ExcelReader:
     
     def select_and_load_processing_methods_file(self) -> bool:
         """加工方法マスターファイルを選択し、読み込む"""
-        file_path = filedialog.askopenfilename(
-            title="加工方法マスター.xlsxを選択してください",
-            filetypes=[("Excel files", "*.xlsx")],
-            initialdir=os.path.expanduser("~")
-        )
+        file_path = self.select_processing_methods_file()
         
         if not file_path:
             return False
         
         return self._load_processing_methods_file(file_path)
     
-    def _load_materials_file(self, file_path: str) -> bool:
-        """素材マスターファイルを読み込む"""
+    def _open_source(self, file_path: str):
+        """拡張子に応じたローダーでマスターファイルを開く"""
+        return open_master_source(file_path, self.use_fast_reader)
+    
+    def _select_sheet(self, source, header_names: Tuple[str, ...], sheet_name: Optional[str],
+                      error_message: str) -> Dict[str, int]:
+        """必須の列がそろったシートを選択し、列名 -> 列インデックス を返す"""
         try:
-            workbook = openpyxl.load_workbook(file_path, read_only=True)
-            sheet = workbook.active
-            
-            materials = {}  # display_name -> material_id のマッピング
-            self.materials_data = {}  # material_id -> {name, description} の詳細データ
+            columns = select_sheet_with_headers(source, header_names, sheet_name)
+        except KeyError as e:
+            raise MasterFileError(e.args[0])
+        if columns is None:
+            raise MasterFileError(error_message)
+        return columns
+    
+    @traced(STAGE_MASTER_LOAD)
+    def parse_materials_file(self, file_path: str,
+                             progress_callback: Optional[Callable[[int], None]] = None,
+                             sheet_name: Optional[str] = None) -> Dict[str, object]:
+        """
+        素材マスターファイルを解析して結果を返す
+        自身の状態は変更しないため、ワーカースレッドから呼び出せる
+        """
+        result = self._parse_materials_table(file_path, progress_callback, sheet_name)
+        result['material_search_indexes'] = build_material_search_indexes(result['material_table'])
+        return result
+    
+    def _parse_materials_table(self, file_path: str,
+                               progress_callback: Optional[Callable[[int], None]] = None,
+                               sheet_name: Optional[str] = None, source=None) -> Dict[str, object]:
+        """
+        素材マスターファイルを解析してテーブルを作成（検索インデックスは作成しない）
+        sheet_nameを省略した場合は「素材名」「素材ID」「素材区分」の列があるシートを探す
+        sourceを指定した場合は開いているファイルをそのまま使用する（閉じるのは呼び出し側）
+        """
+        signature = _file_signature(file_path)
+        owns_source = source is None
+        if owns_source:
+            source = self._open_source(file_path)
+        try:
+            material_table = MasterTable()
             
             # ヘッダー行（1行目）から列インデックスを取得
-            header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-            material_name_col = None
-            material_id_col = None
-            material_category_col = None
-            
-            # ヘッダー行から対象列を検索
-            for col_idx, header_value in enumerate(header_row):
-                if header_value:
-                    header_str = str(header_value).strip()
-                    if header_str == "素材名":
-                        material_name_col = col_idx
-                    elif header_str == "素材ID":
-                        material_id_col = col_idx
-                    elif header_str == "素材区分":
-                        material_category_col = col_idx
-            
-            if material_name_col is None or material_id_col is None or material_category_col is None:
-                messagebox.showerror("エラー", "素材マスターファイルに「素材名」「素材ID」または「素材区分」の列が見つかりません。")
-                return False
+            columns = self._select_sheet(
+                source, MATERIAL_HEADERS, sheet_name,
+                "素材マスターファイルに「素材名」「素材ID」または「素材区分」の列が見つかりません。"
+            )
+            material_name_col = columns["素材名"]
+            material_id_col = columns["素材ID"]
+            material_category_col = columns["素材区分"]
             
             # 2行目からデータを読み込み
-            self.material_categories = {}
-            self.material_name_to_id = {}
-            
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            columns = (material_name_col, material_name_col + 1, material_id_col, material_category_col)
+            for row_count, row in enumerate(source.iter_rows(min_row=2, columns=columns), 1):
+                if progress_callback and row_count % PROGRESS_INTERVAL == 0:
+                    progress_callback(row_count)
+                
                 if len(row) > max(material_name_col, material_id_col, material_category_col):
                     material_name = row[material_name_col]
                     material_id = row[material_id_col]
@@ -97,68 +206,62 @@ class ExcelReader:
                             material_description = str(row[material_name_col + 1]).strip()
                         
                         if material_name and material_id and material_category:
-                            # 素材区分ごとの素材名リストを構築
-                            if material_category not in self.material_categories:
-                                self.material_categories[material_category] = []
-                            self.material_categories[material_category].append(material_name)
-                            
-                            # 素材名からIDへのマッピング
-                            self.material_name_to_id[material_name] = material_id
-                            
-                            # ドロップダウン表示用の文字列を作成（互換性のため保持）
-                            if material_description:
-                                display_name = f"{material_name} - {material_description}"
-                            else:
-                                display_name = material_name
-                            
-                            materials[display_name] = material_id
-                            self.materials_data[material_id] = {
-                                'name': material_name,
-                                'description': material_description,
-                                'category': material_category
-                            }
-            
-            if not materials:
-                messagebox.showerror("エラー", "素材マスターファイルにデータが見つかりません。")
-                return False
+                            material_table.add(
+                                material_id, material_name, material_description, material_category
+                            )
             
-            self.materials = materials
-            messagebox.showinfo("完了", f"素材マスターを読み込みました。({len(materials)}件)")
-            return True
+            if not material_table:
+                raise MasterFileError("素材マスターファイルにデータが見つかりません。")
             
-        except Exception as e:
-            messagebox.showerror("エラー", f"素材マスターファイルの読み込みに失敗しました:\\n{str(e)}")
-            return False
+            return {
+                'material_table': material_table,
+                'source': (file_path, signature, source.sheet_name)
+            }
+        finally:
+            if owns_source:
+                source.close()
     
-    def _load_processing_methods_file(self, file_path: str) -> bool:
-        """加工方法マスターファイルを読み込む"""
+    @traced(STAGE_MASTER_LOAD)
+    def parse_processing_methods_file(self, file_path: str,
+                                      progress_callback: Optional[Callable[[int], None]] = None,
+                                      sheet_name: Optional[str] = None) -> Dict[str, object]:
+        """
+        加工方法マスターファイルを解析して結果を返す
+        自身の状態は変更しないため、ワーカースレッドから呼び出せる
+        """
+        result = self._parse_processing_methods_table(file_path, progress_callback, sheet_name)
+        result['processing_search_index'] = build_processing_search_index(result['processing_table'])
+        return result
+    
+    def _parse_processing_methods_table(self, file_path: str,
+                                        progress_callback: Optional[Callable[[int], None]] = None,
+                                        sheet_name: Optional[str] = None, source=None) -> Dict[str, object]:
+        """
+        加工方法マスターファイルを解析してテーブルを作成（検索インデックスは作成しない）
+        sheet_nameを省略した場合は「加工方法名」「加工ID」の列があるシートを探す
+        sourceを指定した場合は開いているファイルをそのまま使用する（閉じるのは呼び出し側）
+        """
+        signature = _file_signature(file_path)
+        owns_source = source is None
+        if owns_source:
+            source = self._open_source(file_path)
         try:
-            workbook = openpyxl.load_workbook(file_path, read_only=True)
-            sheet = workbook.active
-            
-            processing_methods = {}  # display_name -> processing_id のマッピング
-            self.processing_methods_data = {}  # processing_id -> {name, description} の詳細データ
+            processing_table = MasterTable()
             
             # ヘッダー行（1行目）から列インデックスを取得
-            header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-            method_name_col = None
-            method_id_col = None
-            
-            # ヘッダー行から対象列を検索
-            for col_idx, header_value in enumerate(header_row):
-                if header_value:
-                    header_str = str(header_value).strip()
-                    if header_str == "加工方法名":
-                        method_name_col = col_idx
-                    elif header_str == "加工ID":
-                        method_id_col = col_idx
-            
-            if method_name_col is None or method_id_col is None:
-                messagebox.showerror("エラー", "加工方法マスターファイルに「加工方法名」または「加工ID」の列が見つかりません。")
-                return False
+            columns = self._select_sheet(
+                source, PROCESSING_HEADERS, sheet_name,
+                "加工方法マスターファイルに「加工方法名」または「加工ID」の列が見つかりません。"
+            )
+            method_name_col = columns["加工方法名"]
+            method_id_col = columns["加工ID"]
             
             # 2行目からデータを読み込み
-            for row in sheet.iter_rows(min_row=2, values_only=True):
+            columns = (method_name_col, method_name_col + 1, method_id_col)
+            for row_count, row in enumerate(source.iter_rows(min_row=2, columns=columns), 1):
+                if progress_callback and row_count % PROGRESS_INTERVAL == 0:
+                    progress_callback(row_count)
+                
                 if len(row) > max(method_name_col, method_id_col):
                     method_name = row[method_name_col]
                     method_id = row[method_id_col]
@@ -173,66 +276,582 @@ class ExcelReader:
                             method_description = str(row[method_name_col + 1]).strip()
                         
                         if method_name and method_id:
-                            # ドロップダウン表示用の文字列を作成
-                            if method_description:
-                                display_name = f"{method_name} - {method_description}"
-                            else:
-                                display_name = method_name
-                            
-                            processing_methods[display_name] = method_id
-                            self.processing_methods_data[method_id] = {
-                                'name': method_name,
-                                'description': method_description
-                            }
-            
-            if not processing_methods:
-                messagebox.showerror("エラー", "加工方法マスターファイルにデータが見つかりません。")
-                return False
+                            processing_table.add(method_id, method_name, method_description)
             
-            self.processing_methods = processing_methods
-            messagebox.showinfo("完了", f"加工方法マスターを読み込みました。({len(processing_methods)}件)")
-            return True
+            if not processing_table:
+                raise MasterFileError("加工方法マスターファイルにデータが見つかりません。")
             
+            return {
+                'processing_table': processing_table,
+                'source': (file_path, signature, source.sheet_name)
+            }
+        finally:
+            if owns_source:
+                source.close()
+    
+    @traced(STAGE_MASTER_LOAD)
+    def parse_combined_workbook(self, file_path: str,
+                                progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Dict[str, object]]:
+        """
+        素材・加工方法の両方のシートを含むブックを1回開いて解析する
+        各マスターのシートはヘッダーの列名から判定する
+        """
+        source = self._open_source(file_path)
+        try:
+            materials = self._parse_materials_table(file_path, progress_callback, source=source)
+            material_rows = len(materials['material_table'].records)
+            processing_progress = None
+            if progress_callback:
+                processing_progress = lambda row_count: progress_callback(material_rows + row_count)
+            processing_methods = self._parse_processing_methods_table(
+                file_path, processing_progress, source=source
+            )
+        finally:
+            source.close()
+        
+        materials['material_search_indexes'] = build_material_search_indexes(materials['material_table'])
+        processing_methods['processing_search_index'] = build_processing_search_index(
+            processing_methods['processing_table']
+        )
+        return {'materials': materials, 'processing_methods': processing_methods}
+    
+    def apply_materials(self, result: Dict[str, object]):
+        """解析済みの素材マスターを反映（メインスレッドで呼び出し、全属性をまとめて差し替える）"""
+        self.material_search_indexes = result['material_search_indexes']
+        self.material_table = result['material_table']
+        self._master_sources['materials'] = result['source']
+        self._pending_signatures.pop('materials', None)
+    
+    def apply_processing_methods(self, result: Dict[str, object]):
+        """解析済みの加工方法マスターを反映（メインスレッドで呼び出し、全属性をまとめて差し替える）"""
+        self.processing_search_index = result['processing_search_index']
+        self.processing_table = result['processing_table']
+        self._master_sources['processing_methods'] = result['source']
+        self._pending_signatures.pop('processing_methods', None)
+    
+    def _load_materials_file(self, file_path: str) -> bool:
+        """素材マスターファイルを読み込む"""
+        try:
+            result = self.parse_materials_file(file_path)
+        except MasterFileError as e:
+            messagebox.showerror("エラー", str(e))
+            return False
+        except Exception as e:
+            messagebox.showerror("エラー", f"素材マスターファイルの読み込みに失敗しました:\\n{str(e)}")
+            return False
+        
+        self.apply_materials(result)
+        messagebox.showinfo("完了", f"素材マスターを読み込みました。({len(self.material_table)}件)")
+        return True
+    
+    def _load_processing_methods_file(self, file_path: str) -> bool:
+        """加工方法マスターファイルを読み込む"""
+        try:
+            result = self.parse_processing_methods_file(file_path)
+        except MasterFileError as e:
+            messagebox.showerror("エラー", str(e))
+            return False
         except Exception as e:
             messagebox.showerror("エラー", f"加工方法マスターファイルの読み込みに失敗しました:\\n{str(e)}")
             return False
+        
+        self.apply_processing_methods(result)
+        messagebox.showinfo("完了", f"加工方法マスターを読み込みました。({len(self.processing_table)}件)")
+        return True
+    
+    def load_materials_file_async(self, file_path: str, widget: tk.Misc,
+                                  on_complete: Callable[[bool], None],
+                                  on_progress: Optional[Callable[[int], None]] = None) -> BackgroundTask:
+        """
+        素材マスターファイルをワーカースレッドで読み込む
+        完了時はメインスレッドで結果を反映してからon_complete(成功したか)を呼び出す
+        """
+        def complete(result):
+            if self._load_tasks.get('materials') is not task:
+                return  # 後から開始された読み込みがあるため破棄
+            del self._load_tasks['materials']
+            self.apply_materials(result)
+            messagebox.showinfo("完了", f"素材マスターを読み込みました。({len(self.material_table)}件)")
+            on_complete(True)
+        
+        def error(exc):
+            if self._load_tasks.get('materials') is not task:
+                return
+            del self._load_tasks['materials']
+            if isinstance(exc, MasterFileError):
+                messagebox.showerror("エラー", str(exc))
+            else:
+                messagebox.showerror("エラー", f"素材マスターファイルの読み込みに失敗しました:\\n{str(exc)}")
+            on_complete(False)
+        
+        task = BackgroundTask(
+            widget,
+            lambda report: self.parse_materials_file(file_path, report),
+            complete,
+            on_error=error,
+            on_progress=on_progress
+        )
+        self._start_load_task(task, 'materials')
+        return task
+    
+    def load_processing_methods_file_async(self, file_path: str, widget: tk.Misc,
+                                           on_complete: Callable[[bool], None],
+                                           on_progress: Optional[Callable[[int], None]] = None) -> BackgroundTask:
+        """
+        加工方法マスターファイルをワーカースレッドで読み込む
+        完了時はメインスレッドで結果を反映してからon_complete(成功したか)を呼び出す
+        """
+        def complete(result):
+            if self._load_tasks.get('processing_methods') is not task:
+                return  # 後から開始された読み込みがあるため破棄
+            del self._load_tasks['processing_methods']
+            self.apply_processing_methods(result)
+            messagebox.showinfo("完了", f"加工方法マスターを読み込みました。({len(self.processing_table)}件)")
+            on_complete(True)
+        
+        def error(exc):
+            if self._load_tasks.get('processing_methods') is not task:
+                return
+            del self._load_tasks['processing_methods']
+            if isinstance(exc, MasterFileError):
+                messagebox.showerror("エラー", str(exc))
+            else:
+                messagebox.showerror("エラー", f"加工方法マスターファイルの読み込みに失敗しました:\\n{str(exc)}")
+            on_complete(False)
+        
+        task = BackgroundTask(
+            widget,
+            lambda report: self.parse_processing_methods_file(file_path, report),
+            complete,
+            on_error=error,
+            on_progress=on_progress
+        )
+        self._start_load_task(task, 'processing_methods')
+        return task
+    
+    def load_combined_workbook_async(self, file_path: str, widget: tk.Misc,
+                                     on_complete: Callable[[bool], None],
+                                     on_progress: Optional[Callable[[int], None]] = None) -> BackgroundTask:
+        """
+        素材・加工方法の両方のシートを含むブックをワーカースレッドで読み込む
+        完了時はメインスレッドで両方の結果を反映してからon_complete(成功したか)を呼び出す
+        """
+        kinds = ('materials', 'processing_methods')
+        
+        def owned_kinds() -> List[str]:
+            return [kind for kind in kinds if self._load_tasks.get(kind) is task]
+        
+        def complete(results):
+            owned = owned_kinds()
+            if not owned:
+                return  # 後から開始された読み込みがあるため破棄
+            for kind in owned:
+                del self._load_tasks[kind]
+            # 後から別のファイルの読み込みが開始された種類は反映しない
+            if 'materials' in owned:
+                self.apply_materials(results['materials'])
+            if 'processing_methods' in owned:
+                self.apply_processing_methods(results['processing_methods'])
+            messagebox.showinfo(
+                "完了",
+                f"素材マスター({len(self.material_table)}件)と"
+                f"加工方法マスター({len(self.processing_table)}件)を読み込みました。"
+            )
+            on_complete(True)
+        
+        def error(exc):
+            owned = owned_kinds()
+            if not owned:
+                return
+            for kind in owned:
+                del self._load_tasks[kind]
+            if isinstance(exc, MasterFileError):
+                messagebox.showerror("エラー", str(exc))
+            else:
+                messagebox.showerror("エラー", f"マスターファイルの読み込みに失敗しました:\\n{str(exc)}")
+            on_complete(False)
+        
+        task = BackgroundTask(
+            widget,
+            lambda report: self.parse_combined_workbook(file_path, report),
+            complete,
+            on_error=error,
+            on_progress=on_progress
+        )
+        self._start_load_task(task, *kinds)
+        return task
+    
+    def _start_load_task(self, task: BackgroundTask, *kinds: str):
+        """読み込みタスクを開始（同じ種類の実行中タスクは結果を破棄させる）"""
+        for kind in kinds:
+            previous = self._load_tasks.get(kind)
+            self._load_tasks[kind] = task
+            # 両方のマスターをまとめて読み込むタスクは、もう一方の種類の結果が残っていれば続行させる
+            if previous and previous not in self._load_tasks.values():
+                previous.cancel()
+        task.start()
+    
+    def is_loading(self, kind: Optional[str] = None) -> bool:
+        """バックグラウンド読み込み中かチェック（kind: 'materials' / 'processing_methods'）"""
+        if kind is None:
+            return bool(self._load_tasks)
+        return kind in self._load_tasks
+    
+    def start_watching(self, widget: tk.Misc, on_reloaded: Callable[[str, MasterDiff], None],
+                       interval_ms: int = WATCH_INTERVAL_MS):
+        """
+        読み込み済みマスターファイルの変更（更新時刻・サイズ）の監視を開始
+        変更があればバックグラウンドで再読み込みし、on_reloaded(種類, 差分)をメインスレッドで呼び出す
+        """
+        self.stop_watching()
+        self._watch_widget = widget
+        self._watch_callback = on_reloaded
+        self._watch_interval_ms = interval_ms
+        self._watch_after_id = widget.after(interval_ms, self._poll_master_files)
+    
+    def stop_watching(self):
+        """マスターファイルの監視を停止"""
+        if self._watch_widget is not None and self._watch_after_id is not None:
+            try:
+                self._watch_widget.after_cancel(self._watch_after_id)
+            except tk.TclError:
+                pass
+        self._watch_after_id = None
+        self._watch_widget = None
+    
+    def _poll_master_files(self):
+        """マスターファイルの状態を確認し、変更が落ち着いたものを再読み込み"""
+        for kind, (file_path, signature, sheet_name) in list(self._master_sources.items()):
+            if self.is_loading(kind):
+                continue
+            try:
+                current = _file_signature(file_path)
+            except OSError:
+                continue  # 保存中などで一時的に存在しない
+            if current == signature:
+                self._pending_signatures.pop(kind, None)
+            elif self._pending_signatures.get(kind) == current:
+                # 前回の確認から変化がない＝書き込みが完了したとみなす
+                self._pending_signatures.pop(kind, None)
+                self._start_reload(kind, file_path, sheet_name)
+            else:
+                self._pending_signatures[kind] = current
+        
+        if self._watch_widget is not None:
+            self._watch_after_id = self._watch_widget.after(self._watch_interval_ms, self._poll_master_files)
+    
+    def _start_reload(self, kind: str, file_path: str, sheet_name: str):
+        """変更されたマスターファイル（前回と同じシート）をバックグラウンドで再解析し、差分を求めて反映"""
+        if kind == 'materials':
+            old_table = self.material_table
+            old_indexes = self.material_search_indexes
+        else:
+            old_table = self.processing_table
+            old_index = self.processing_search_index
+        
+        def target(report):
+            with span(STAGE_MASTER_LOAD):
+                if kind == 'materials':
+                    result = self._parse_materials_table(file_path, report, sheet_name)
+                    diff = diff_tables(old_table, result['material_table'])
+                    # 差分のない区分の検索インデックスはそのまま再利用する
+                    result['material_search_indexes'] = build_material_search_indexes(
+                        result['material_table'], old_indexes, set(old_indexes) - diff.affected_categories
+                    )
+                else:
+                    result = self._parse_processing_methods_table(file_path, report, sheet_name)
+                    diff = diff_tables(old_table, result['processing_table'])
+                    result['processing_search_index'] = (
+                        old_index if diff.is_empty()
+                        else build_processing_search_index(result['processing_table'])
+                    )
+            return result, diff
+        
+        def complete(payload):
+            if self._load_tasks.get(kind) is not task:
+                return  # 手動の読み込みが開始されたため破棄
+            del self._load_tasks[kind]
+            result, diff = payload
+            if kind == 'materials':
+                self.apply_materials(result)
+            else:
+                self.apply_processing_methods(result)
+            logger.debug(f"{file_path} を再読み込みしました ({diff.summary()})")
+            if self._watch_callback and not diff.is_empty():
+                self._watch_callback(kind, diff)
+        
+        def error(exc):
+            if self._load_tasks.get(kind) is not task:
+                return
+            del self._load_tasks[kind]
+            # 読み込めない間は現在のデータを使い続け、ファイルが再度変更されたら再試行する
+            try:
+                self._master_sources[kind] = (file_path, _file_signature(file_path), sheet_name)
+            except OSError:
+                pass
+            logger.warning(f"{file_path} の再読み込みに失敗しました: {exc}")
+        
+        task = BackgroundTask(self._watch_widget, target, complete, on_error=error)
+        self._start_load_task(task, kind)
+    
+    @property
+    def materials(self) -> RecordView:
+        """表示名 -> 素材ID（互換性のための読み取り専用ビュー）"""
+        return RecordView(self.material_table.by_display_name, lambda record: record.record_id)
+    
+    @property
+    def materials_data(self) -> RecordView:
+        """素材ID -> 詳細データ（互換性のための読み取り専用ビュー）"""
+        return RecordView(self.material_table.by_id, lambda record: record.to_dict())
+    
+    @property
+    def material_categories(self) -> Dict[str, List[str]]:
+        """素材区分 -> 素材名リスト"""
+        return self.material_table.names_by_category
+    
+    @property
+    def material_name_to_id(self) -> RecordView:
+        """素材名 -> 素材ID（互換性のための読み取り専用ビュー）"""
+        return RecordView(self.material_table.by_name, lambda record: record.record_id)
+    
+    @property
+    def processing_methods(self) -> RecordView:
+        """表示名 -> 加工ID（互換性のための読み取り専用ビュー）"""
+        return RecordView(self.processing_table.by_display_name, lambda record: record.record_id)
+    
+    @property
+    def processing_methods_data(self) -> RecordView:
+        """加工ID -> 詳細データ（互換性のための読み取り専用ビュー）"""
+        return RecordView(self.processing_table.by_id, lambda record: record.to_dict(include_category=False))
     
     def get_materials_list(self) -> List[str]:
         """素材名のリストを取得"""
-        return list(self.materials.keys())
+        return list(self.material_table.by_display_name)
     
     def get_processing_methods_list(self) -> List[str]:
         """加工方法名のリストを取得"""
-        return list(self.processing_methods.keys())
+        return list(self.processing_table.by_display_name)
     
     def get_material_code(self, display_name: str) -> Optional[str]:
         """表示名から素材IDを取得"""
-        return self.materials.get(display_name)
+        return self.material_table.id_for_display_name(display_name)
     
     def get_processing_method_code(self, display_name: str) -> Optional[str]:
         """表示名から加工IDを取得"""
-        return self.processing_methods.get(display_name)
+        return self.processing_table.id_for_display_name(display_name)
     
     def get_material_details(self, material_id: str) -> Optional[Dict[str, str]]:
         """素材IDから詳細情報を取得"""
-        return self.materials_data.get(material_id)
+        record = self.material_table.by_id.get(material_id)
+        return record.to_dict() if record else None
     
     def get_processing_method_details(self, method_id: str) -> Optional[Dict[str, str]]:
         """加工IDから詳細情報を取得"""
-        return self.processing_methods_data.get(method_id)
+        record = self.processing_table.by_id.get(method_id)
+        return record.to_dict(include_category=False) if record else None
     
     def is_ready(self) -> bool:
         """両方のマスターファイルが読み込まれているかチェック"""
-        return bool(self.materials) and bool(self.processing_methods)
+        return bool(self.material_table) and bool(self.processing_table)
     
     def get_material_categories_list(self) -> List[str]:
         """素材区分のリストを取得"""
-        return list(self.material_categories.keys())
+        return list(self.material_table.names_by_category)
     
     def get_materials_by_category(self, category: str) -> List[str]:
         """指定された素材区分に属する素材名のリストを取得"""
-        return self.material_categories.get(category, [])
+        return self.material_table.names_by_category.get(category, [])
+    
+    def is_material_in_category(self, category: str, material_name: str) -> bool:
+        """素材名が指定された素材区分に属するかチェック"""
+        return material_name in self.material_table.names_by_category.get(category, ())
     
     def get_material_id_by_name(self, material_name: str) -> Optional[str]:
         """素材名から素材IDを取得"""
-        return self.material_name_to_id.get(material_name)
\ No newline at end of file
+        return self.material_table.id_for_name(material_name)
+    
+    def search_materials(self, category: str, query: str, limit: int = 50) -> List[str]:
+        """素材区分内で素材名・説明・素材IDに一致する素材名を検索"""
+        search_index = self.material_search_indexes.get(category)
+        if search_index is None:
+            return []
+        return search_index.search(query, limit)
+    
+    def search_processing_methods(self, query: str, limit: int = 50) -> List[str]:
+        """加工方法名・説明・加工IDに一致する加工方法（表示名）を検索"""
+        return self.processing_search_index.search(query, limit)
+
+
+def _write_shared_strings_copy(source_path: str, target_path: str):
+    """
+    openpyxlで書き出したブック（文字列はすべてインライン文字列）の文字列を、
+    Excelで保存した場合と同じ共有文字列に書き換えて保存（--master-benchmark用）
+    """
+    import re
+    import zipfile
+
+    with zipfile.ZipFile(source_path) as source:
+        members = {name: source.read(name) for name in source.namelist()}
+    strings: List[str] = []
+    indexes: Dict[str, int] = {}
+
+    def shared(match) -> str:
+        text = match.group(3)
+        if text not in indexes:
+            indexes[text] = len(strings)
+            strings.append(text)
+        return f'<c r="{match.group(1)}"{match.group(2)} t="s"><v>{indexes[text]}</v></c>'
+
+    cell_re = re.compile(r'<c r="([A-Z]+\d+)"((?: s="\d+")?) t="inlineStr"><is><t[^>]*>([^<]*)</t></is></c>')
+    for name in members:
+        if name.startswith("xl/worksheets/") and name.endswith(".xml"):
+            members[name] = cell_re.sub(shared, members[name].decode("utf-8")).encode("utf-8")
+    items = "".join(f'<si><t xml:space="preserve">{text}</t></si>' for text in strings)
+    members["xl/sharedStrings.xml"] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        f'count="{len(strings)}" uniqueCount="{len(strings)}">{items}</sst>'
+    ).encode("utf-8")
+    members["[Content_Types].xml"] = members["[Content_Types].xml"].replace(
+        b"</Types>",
+        b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-'
+        b'officedocument.spreadsheetml.sharedStrings+xml"/></Types>'
+    )
+    members["xl/_rels/workbook.xml.rels"] = members["xl/_rels/workbook.xml.rels"].replace(
+        b"</Relationships>",
+        b'<Relationship Id="rIdShared" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        b'relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+    )
+    with zipfile.ZipFile(target_path, "w", zipfile.ZIP_DEFLATED) as target:
+        for name, data in members.items():
+            target.writestr(name, data)
+
+
+def _time_sheet_read(file_path: str, use_fast_reader: bool) -> float:
+    """シートの読み込み（素材マスターの4列の値の取り出しまで、レコード表は作成しない）の時間（秒）"""
+    import time
+    started = time.perf_counter()
+    source = open_master_source(file_path, use_fast_reader)
+    try:
+        for _ in source.iter_rows(min_row=2, columns=(0, 1, 2, 3)):
+            pass
+    finally:
+        source.close()
+    return time.perf_counter() - started
+
+
+def _load_legacy_material_dicts(file_path: str) -> Dict[str, dict]:
+    """
+    以前の素材マスターの保持方法（4つの辞書）で読み込む（--master-benchmarkでレコード表と比較する）
+    戻り値: materials, materials_data, material_categories, material_name_to_id
+    """
+    materials: Dict[str, str] = {}  # 表示名 -> 素材ID
+    materials_data: Dict[str, Dict[str, str]] = {}  # 素材ID -> {name, description, category}
+    material_categories: Dict[str, List[str]] = {}  # 素材区分 -> 素材名リスト
+    material_name_to_id: Dict[str, str] = {}  # 素材名 -> 素材ID
+    source = open_master_source(file_path)
+    try:
+        for row in source.iter_rows(min_row=2, columns=(0, 1, 2, 3)):
+            material_name, material_description, material_id, material_category = (
+                str(value).strip() if value else "" for value in row[:4]
+            )
+            if not (material_name and material_id and material_category):
+                continue
+            material_categories.setdefault(material_category, []).append(material_name)
+            material_name_to_id[material_name] = material_id
+            display_name = f"{material_name} - {material_description}" if material_description else material_name
+            materials[display_name] = material_id
+            materials_data[material_id] = {
+                'name': material_name,
+                'description': material_description,
+                'category': material_category
+            }
+    finally:
+        source.close()
+    return {
+        'materials': materials,
+        'materials_data': materials_data,
+        'material_categories': material_categories,
+        'material_name_to_id': material_name_to_id,
+    }
+
+
+def run_master_benchmark(rows: int = 100000, folder: Optional[str] = None) -> Dict[str, float]:
+    """
+    合成した素材マスター（rows行のxlsx）で、読み込み時間・検索インデックスの作成時間・
+    レコード表の使用メモリ・素材名からIDの参照時間を計測して表示（--master-benchmark用）
+    使用メモリと参照時間は、同じブックを以前の4つの辞書で保持した場合と比較する
+    読み込みはopenpyxlが書き出すインライン文字列のブックと、Excelが保存する共有文字列のブックの両方で、
+    シートの読み込みだけの時間とレコード表の作成までの時間を分けて計測する
+    """
+    import random
+    import tempfile
+    import time
+    import tracemalloc
+    import openpyxl
+
+    categories = ["木材", "金属", "樹脂", "ガラス", "紙", "布"]
+    random.seed(1)
+    with tempfile.TemporaryDirectory(dir=folder) as work_folder:
+        inline_path = os.path.join(work_folder, "素材マスター_インライン文字列.xlsx")
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("素材")
+        sheet.append(["素材名", "説明", "素材ID", "素材区分"])
+        for number in range(rows):
+            sheet.append([f"素材{number}", f"説明{number % 500}", f"M{number:06d}", random.choice(categories)])
+        workbook.save(inline_path)
+        shared_path = os.path.join(work_folder, "素材マスター_共有文字列.xlsx")
+        _write_shared_strings_copy(inline_path, shared_path)
+        print(f"素材マスター {rows}行 (インライン文字列 {os.path.getsize(inline_path) / 1024 / 1024:.1f}MB, "
+              f"共有文字列 {os.path.getsize(shared_path) / 1024 / 1024:.1f}MB)")
+
+        results: Dict[str, float] = {}
+        for kind, file_path in (("共有文字列", shared_path), ("インライン文字列", inline_path)):
+            for stage in ("シートの読み込み", "レコード表の作成まで"):
+                for label, use_fast_reader in (("高速読み込み", True), ("openpyxl", False)):
+                    if stage == "シートの読み込み":
+                        elapsed = _time_sheet_read(file_path, use_fast_reader)
+                    else:
+                        started = time.perf_counter()
+                        table = ExcelReader(use_fast_reader=use_fast_reader)._parse_materials_table(
+                            file_path)['material_table']
+                        elapsed = time.perf_counter() - started
+                    results[f"{kind}/{stage}/{label}"] = elapsed
+                fast = results[f"{kind}/{stage}/高速読み込み"]
+                slow = results[f"{kind}/{stage}/openpyxl"]
+                print(f"{stage}（{kind}）: 高速読み込み {fast * 1000:.0f}ms / openpyxl {slow * 1000:.0f}ms"
+                      f"（{slow / fast:.1f}倍）")
+
+        table = ExcelReader()._parse_materials_table(shared_path)['material_table']
+        started = time.perf_counter()
+        build_material_search_indexes(table)
+        results['search_index'] = time.perf_counter() - started
+        print(f"検索インデックスの作成: {results['search_index'] * 1000:.0f}ms")
+
+        # 読み込み後に残るメモリ（レコード表と索引、以前の4つの辞書）
+        tracemalloc.start()
+        table = ExcelReader()._parse_materials_table(shared_path)['material_table']
+        results['memory'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        tracemalloc.start()
+        legacy = _load_legacy_material_dicts(shared_path)
+        results['legacy_memory'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"使用メモリ: レコード表 {results['memory'] / 1024 / 1024:.1f}MB "
+              f"({results['memory'] / len(table):.0f}バイト/行) / "
+              f"以前の4つの辞書 {results['legacy_memory'] / 1024 / 1024:.1f}MB "
+              f"({results['legacy_memory'] / len(legacy['materials']):.0f}バイト/行)")
+
+        names = [f"素材{random.randrange(rows)}" for _ in range(200000)]
+        started = time.perf_counter()
+        for name in names:
+            table.id_for_name(name)
+        results['lookup'] = (time.perf_counter() - started) / len(names)
+        name_to_id = legacy['material_name_to_id']
+        started = time.perf_counter()
+        for name in names:
+            name_to_id.get(name)
+        results['legacy_lookup'] = (time.perf_counter() - started) / len(names)
+        print(f"素材名からIDの参照: レコード表 {results['lookup'] * 1e9:.0f}ns/回 / "
+              f"以前の4つの辞書 {results['legacy_lookup'] * 1e9:.0f}ns/回")
+    return results
@@ -1,13 +1,20 @@
 """
 ファイル操作モジュール
 フォルダ選択、画像ファイル検出、ファイル名変更処理を行う
+番号の決定とリネームは、複数の端末で同じフォルダを扱えるようフォルダのロックを保持したまま行う
 """
+import logging
 import os
 import re
 from pathlib import Path
 from tkinter import filedialog, messagebox
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import shutil
+from utils.number_allocator import (FolderLock, NumberLockTimeout, allocate_numbers, default_owner,
+                                    load_open_numbers, save_open_numbers)
+from utils.perf_trace import STAGE_NUMBER, STAGE_RENAME, STAGE_SCAN, span, traced
+
+logger = logging.getLogger(__name__)
 
 
 class FileHandler:
@@ -35,6 +42,8 @@ class FileHandler:
         self.image_folder: Optional[str] = None
         self.image_files: List[str] = []
         self.current_index: int = 0
+        # 番号を割り当てる端末の識別子（同じフォルダを複数の端末で扱う場合に、未完成のペアの番号を区別する）
+        self.number_owner: str = default_owner()
     
     def select_folder(self) -> bool:
         """画像フォルダを選択し、画像ファイルを検出する"""
@@ -58,25 +67,24 @@ class FileHandler:
             image_files = []
             folder_path = Path(self.image_folder)
             
-            # フォルダ内のすべてのファイルをチェック
-            for file_path in folder_path.iterdir():
-                if file_path.is_file():
-                    extension = file_path.suffix.lower()
-                    if extension in self.SUPPORTED_EXTENSIONS:
-                        image_files.append(str(file_path))
+            with span(STAGE_SCAN):
+                # フォルダ内のすべてのファイルをチェック
+                for file_path in folder_path.iterdir():
+                    if file_path.is_file():
+                        extension = file_path.suffix.lower()
+                        if extension in self.SUPPORTED_EXTENSIONS:
+                            image_files.append(str(file_path))
+                
+                # 自然順序ソート（数字を数値として認識）
+                image_files.sort(key=self._natural_sort_key)
             
             if not image_files:
                 messagebox.showwarning("警告", "選択したフォルダに対応する画像ファイルが見つかりません。\\n"
                                                "対応形式: jpg, png, heic")
                 return False
             
-            # 自然順序ソート（数字を数値として認識）
-            image_files.sort(key=self._natural_sort_key)
-            print(f"デバッグ: 画像ファイルを自然順序でソート完了 ({len(image_files)}ファイル)")
-            for i, file in enumerate(image_files[:5]):  # 最初の5ファイルを表示
-                print(f"  {i+1}: {Path(file).name}")
-            if len(image_files) > 5:
-                print(f"  ... (他{len(image_files)-5}ファイル)")
+            logger.debug(f"画像ファイルを自然順序でソート完了 ({len(image_files)}ファイル, "
+                         f"先頭: {', '.join(Path(file).name for file in image_files[:5])})")
             self.image_files = image_files
             self.current_index = 0
             
@@ -119,6 +127,26 @@ class FileHandler:
             return True
         return False
     
+    def go_to_image(self, index: int) -> bool:
+        """指定したインデックスの画像に移動"""
+        if 0 <= index < len(self.image_files) and index != self.current_index:
+            self.current_index = index
+            return True
+        return False
+    
+    def is_renamed_file(self, file_path: str) -> bool:
+        """リネーム済みのファイル名（番号_部品名_重量_単位_素材ID_加工ID_写真区分_特記事項）かチェック"""
+        parts = Path(file_path).stem.split('_')
+        return len(parts) >= 8 and parts[0].isdigit()
+    
+    def parse_renamed_file(self, file_path: str) -> Optional[Tuple[int, str]]:
+        """リネーム済みのファイル名から (番号, 写真区分) を取得（リネーム済みでない場合はNone）"""
+        if not self.is_renamed_file(file_path):
+            return None
+        parts = Path(file_path).stem.split('_')
+        # 部品名に「_」が含まれる場合があるため、写真区分は後ろから数える
+        return int(parts[0]), parts[-2]
+    
     def sanitize_filename(self, filename: str) -> str:
         """ファイル名から禁止文字を除去"""
         # 禁止文字を除去
@@ -155,11 +183,8 @@ class FileHandler:
         
         return filename
     
-    def get_next_number(self) -> int:
-        """フォルダ内の既存ファイルから次のペア番号を取得（1, 1, 2, 2, 3, 3...）"""
-        if not self.image_folder:
-            return 1
-        
+    def _count_existing_numbers(self) -> Dict[int, int]:
+        """フォルダ内のリネーム済みファイルの番号ごとのファイル数を取得"""
         folder_path = Path(self.image_folder)
         number_counts = {}  # 番号ごとのファイル数をカウント
         
@@ -178,22 +203,46 @@ class FileHandler:
                     number = int(parts[0])
                     number_counts[number] = number_counts.get(number, 0) + 1
         
-        # ペア番号ロジック：1, 1, 2, 2, 3, 3...
-        if not number_counts:
-            return 1  # 最初のファイル
-        
-        max_number = max(number_counts.keys())
+        return number_counts
+    
+    @traced(STAGE_NUMBER)
+    def get_next_number(self) -> int:
+        """フォルダ内の既存ファイルから次のペア番号を取得（1, 1, 2, 2, 3, 3...、表示用でロックは取得しない）"""
+        if not self.image_folder:
+            return 1
         
-        # 最大番号のファイル数をチェック
-        if number_counts[max_number] < 2:
-            # 最大番号がまだ2個未満の場合、同じ番号を返す
-            print(f"デバッグ: 番号 {max_number} は {number_counts[max_number]} 個存在、同じ番号 {max_number} を返す")
-            return max_number
-        else:
-            # 最大番号が2個ある場合、次の番号を返す
-            next_number = max_number + 1
-            print(f"デバッグ: 番号 {max_number} は2個存在、次の番号 {next_number} を返す")
-            return next_number
+        return self._allocate_numbers(1)[0][0]
+    
+    @traced(STAGE_NUMBER)
+    def get_pair_number(self, partner_index: int) -> int:
+        """
+        撮影時刻でペアと推定した画像の番号を取得
+        相手の画像がリネーム済みならその番号、未リネームなら既存のどの番号とも組まない新しい番号
+        """
+        if 0 <= partner_index < len(self.image_files):
+            parsed = self.parse_renamed_file(self.image_files[partner_index])
+            if parsed is not None:
+                return parsed[0]
+        if not self.image_folder:
+            return 1
+        return self._allocate_numbers(1, new_pair=True)[0][0]
+    
+    def _allocate_numbers(self, count: int, start_number: Optional[int] = None,
+                          new_pair: bool = False) -> Tuple[List[int], Dict[int, str]]:
+        """
+        フォルダ内のファイルと台帳から、count枚のファイルに付けるペア番号を決定
+        戻り値: (番号の一覧, リネーム後の台帳の未完成の番号)
+        """
+        number_counts = self._count_existing_numbers()
+        open_numbers = load_open_numbers(self.image_folder)
+        return allocate_numbers(number_counts, open_numbers, self.number_owner, count, start_number, new_pair)
+    
+    def _save_open_numbers(self, open_numbers: Dict[int, str]):
+        """台帳を保存（保存できなくてもリネーム自体は成功しているため、ログのみ出力）"""
+        try:
+            save_open_numbers(self.image_folder, open_numbers)
+        except OSError as e:
+            logger.warning(f"番号の台帳を保存できませんでした: {e}")
     
     def check_file_exists(self, new_filename: str, extension: str) -> bool:
         """指定されたファイル名が既に存在するかチェック"""
@@ -205,46 +254,148 @@ class FileHandler:
     
     def rename_current_file(self, part_name: str, weight: str, unit: str,
                           material_code: str, processing_code: str,
-                          photo_type_code: str, has_notes: str, manual_number: str = "") -> bool:
-        """現在のファイルをリネーム"""
+                          photo_type_code: str, has_notes: str, manual_number: str = "",
+                          new_pair: bool = False) -> bool:
+        """
+        現在のファイルをリネーム
+        番号はフォルダのロックを取得してから決め直す（他の端末が同じ番号を使った直後でも重複しない）
+        new_pair: 自動番号の場合に、未完成の番号を使わず新しい番号にする（撮影時刻でペアと推定した画像の1枚目）
+        """
         current_path = self.get_current_image_path()
         if not current_path:
             return False
         
-        try:
-            current_file = Path(current_path)
-            extension = current_file.suffix
-            
-            # 新しいファイル名を生成（手動番号を渡す）
-            new_filename = self.generate_new_filename(
-                part_name, weight, unit, material_code, processing_code, photo_type_code, has_notes, manual_number
+        start_number = int(manual_number) if manual_number and manual_number.isdigit() else None
+        return self._rename_with_numbers(
+            [self.current_index], start_number, new_pair,
+            lambda position, number: self.generate_new_filename(
+                part_name, weight, unit, material_code, processing_code, photo_type_code, has_notes, str(number)
             )
-            
-            # 重複チェック（連番があるため基本的に重複しないが念のため）
-            if self.check_file_exists(new_filename, extension):
-                current_filename = current_file.stem + extension
-                new_full_filename = new_filename + extension
-                
-                # 現在のファイルと同じ名前でなければ警告
-                if current_filename != new_full_filename:
-                    messagebox.showwarning("警告", 
-                                         f"同名のファイルが既に存在します。\\n"
-                                         f"ファイル名: {new_full_filename}\\n"
-                                         f"予期しない重複です。")
-                    return False
-            
-            # リネーム実行
-            new_path = current_file.parent / f"{new_filename}{extension}"
-            current_file.rename(new_path)
-            
-            # リストを更新
-            self.image_files[self.current_index] = str(new_path)
-            
-            return True
-            
-        except Exception as e:
+        )
+    
+    def rename_selected_files(self, indices: List[int], part_name: str, weight: str, unit: str,
+                              material_code: str, processing_code: str,
+                              photo_type_code: str, has_notes: str, manual_number: str = "") -> bool:
+        """
+        選択した複数のファイルに同じ内容を適用してまとめてリネーム
+        番号はペア番号の規則で順に割り当て、写真区分はその番号の1枚目なら選択した区分、
+        2枚目（既存のファイルや選択内の前のファイルと組む場合）は相手と反対の区分にする
+        """
+        indices = sorted(indices)
+        if not indices:
+            return False
+        
+        start_number = int(manual_number) if manual_number and manual_number.isdigit() else None
+        other_photo_type = {'P': 'M', 'M': 'P'}.get(photo_type_code, photo_type_code)
+        selected = {Path(self.image_files[index]) for index in indices}
+        taken: Optional[Dict[int, List[str]]] = None
+        
+        def make_filename(position: int, number: int) -> str:
+            nonlocal taken
+            if taken is None:
+                # ロックの取得後に、選択外のリネーム済みファイルの写真区分を調べる
+                taken = self._photo_types_by_number(exclude=selected)
+            partners = taken.setdefault(number, [])
+            if partners:
+                photo_type = {'P': 'M', 'M': 'P'}.get(partners[0], other_photo_type)
+            else:
+                photo_type = photo_type_code
+            partners.append(photo_type)
+            return self.generate_new_filename(part_name, weight, unit, material_code, processing_code,
+                                              photo_type, has_notes, str(number))
+        
+        return self._rename_with_numbers(indices, start_number, False, make_filename)
+    
+    def _photo_types_by_number(self, exclude: Set[Path]) -> Dict[int, List[str]]:
+        """フォルダ内のリネーム済みファイル（excludeを除く）の番号ごとの写真区分を取得"""
+        photo_types: Dict[int, List[str]] = {}
+        for file_path in Path(self.image_folder).iterdir():
+            if file_path in exclude or not file_path.is_file():
+                continue
+            parsed = self.parse_renamed_file(str(file_path))
+            if parsed is not None:
+                photo_types.setdefault(parsed[0], []).append(parsed[1])
+        return photo_types
+    
+    def _rename_with_numbers(self, indices: List[int], start_number: Optional[int], new_pair: bool,
+                             make_filename: Callable[[int, int], str]) -> bool:
+        """
+        フォルダのロックを保持したまま、番号の決定・重複の確認・リネーム・台帳の更新を行う
+        make_filename: (選択内の位置, 番号) から新しいファイル名（拡張子なし）を作る関数
+        メッセージはロックを解放してから表示する（ダイアログの表示中に他の端末を待たせない）
+        """
+        if not self.image_folder:
+            return False
+        try:
+            with FolderLock(self.image_folder):
+                numbers, open_numbers = self._allocate_numbers(len(indices), start_number, new_pair)
+                renames = [(index, make_filename(position, number))
+                           for position, (index, number) in enumerate(zip(indices, numbers))]
+                failure = self._apply_renames(renames)
+                if failure is None:
+                    self._save_open_numbers(open_numbers)
+        except NumberLockTimeout as e:
+            messagebox.showwarning("警告", str(e))
+            return False
+        except OSError as e:
             messagebox.showerror("エラー", f"ファイルのリネームに失敗しました:\\n{str(e)}")
             return False
+        return self._report_rename_failure(failure)
+    
+    def _apply_renames(self, renames: List[Tuple[int, str]]) -> Optional[Tuple[str, str]]:
+        """
+        複数のファイルを (インデックス, 新しいファイル名（拡張子なし）) の組でまとめてリネーム（メッセージは表示しない）
+        事前にすべての重複を確認し、途中で失敗した場合はリネーム済みのファイルを元に戻す
+        フォルダのロックを保持したまま呼び出すこと（_rename_with_numbersから使用）
+        戻り値: 成功した場合はNone、失敗した場合は (警告/エラーの種類, メッセージ)
+        """
+        planned = []
+        targets = set()
+        for index, new_filename in renames:
+            current_file = Path(self.image_files[index])
+            new_path = current_file.parent / f"{new_filename}{current_file.suffix}"
+            if new_path == current_file:
+                continue
+            if new_path in targets or new_path.exists():
+                return ("warning",
+                        f"同名のファイルが既に存在します。\\n"
+                        f"ファイル名: {new_path.name}\\n"
+                        f"どのファイルもリネームしていません。")
+            targets.add(new_path)
+            planned.append((index, current_file, new_path))
+        
+        done = []
+        try:
+            for index, current_file, new_path in planned:
+                with span(STAGE_RENAME):
+                    current_file.rename(new_path)
+                done.append((current_file, new_path))
+        except OSError as e:
+            # リネーム済みのファイルを元の名前に戻す
+            for current_file, new_path in reversed(done):
+                try:
+                    new_path.rename(current_file)
+                except OSError as restore_error:
+                    logger.warning(f"元の名前に戻せませんでした: {new_path.name} ({restore_error})")
+            return ("error", f"ファイルのリネームに失敗しました（変更は元に戻しました）:\\n{str(e)}")
+        
+        # リストを更新
+        for index, _, new_path in planned:
+            self.image_files[index] = str(new_path)
+        if len(planned) > 1:
+            logger.debug(f"{len(planned)}件のファイルをまとめてリネームしました")
+        return None
+    
+    def _report_rename_failure(self, failure: Optional[Tuple[str, str]]) -> bool:
+        """リネームの失敗をメッセージで表示（成功した場合はTrue）"""
+        if failure is None:
+            return True
+        kind, message = failure
+        if kind == "warning":
+            messagebox.showwarning("警告", message)
+        else:
+            messagebox.showerror("エラー", message)
+        return False
     
     def is_ready(self) -> bool:
         """画像ファイルが読み込まれているかチェック"""
@@ -0,0 +1,104 @@
+"""
+HEIC変換モジュール
+リネームしたHEIC/HEIFファイルを、HEICを読めないシステム向けに同じ画素数のJPEGに変換する（ワーカープロセスで実行）
+- EXIF（撮影日時など）とICCプロファイルは元の画像から引き継ぐ
+- 出力が元の画像より新しい場合は変換しない（途中で終了しても、もう一度実行すれば残りだけを変換する）
+- --transcode-heic 指定時は、フォルダ内のHEICをすべてのCPUでまとめて変換する
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, List, Optional
+from utils.bounded_decode import DEFAULT_MEMORY_BUDGET, decode_rgb
+from utils.derivatives import derivative_path, is_up_to_date
+from utils.image_processor import ensure_heif_support
+
+
+# 変換の対象の拡張子
+HEIC_EXTENSIONS = {'.heic', '.heif'}
+
+# JPEGの画質の既定値
+TRANSCODE_QUALITY = 92
+
+
+def is_heic(path: str) -> bool:
+    """変換の対象（HEIC/HEIF）のファイルかチェック"""
+    return Path(path).suffix.lower() in HEIC_EXTENSIONS
+
+
+def pending_transcodes(paths: Iterable[str], output_folder: str) -> List[str]:
+    """HEICのうち、変換後のJPEGがない・元の画像より古いもの"""
+    return [path for path in paths
+            if is_heic(path) and not is_up_to_date(path, derivative_path(path, output_folder))]
+
+
+def transcode_heic(source_path: str, output_folder: str, quality: int = TRANSCODE_QUALITY,
+                   memory_budget: int = DEFAULT_MEMORY_BUDGET) -> Optional[str]:
+    """
+    HEICをJPEGに変換（ワーカープロセスで呼び出す）
+    戻り値: 作成したJPEGのパス（変換済みで更新不要の場合はNone）
+    """
+    from PIL import Image
+    output_path = derivative_path(source_path, output_folder)
+    if is_up_to_date(source_path, output_path):
+        return None
+
+    ensure_heif_support(source_path)
+    with Image.open(source_path) as img:
+        exif = img.info.get('exif')
+        icc_profile = img.info.get('icc_profile')
+        converted = decode_rgb(img, img.size, memory_budget)
+
+    os.makedirs(output_folder, exist_ok=True)
+    # 書き込み途中のファイルが残らないよう、一時ファイルに保存してから置き換える
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    save_options = {'quality': quality, 'subsampling': 0 if quality >= 90 else 2}
+    if exif:
+        save_options['exif'] = exif
+    if icc_profile:
+        save_options['icc_profile'] = icc_profile
+    try:
+        converted.save(temp_path, 'JPEG', **save_options)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return output_path
+
+
+def run_transcode_batch(folder: str, output_folder: str, quality: int = TRANSCODE_QUALITY,
+                        workers: Optional[int] = None) -> int:
+    """
+    フォルダ内のHEICをまとめてJPEGに変換し、進捗と処理速度を表示（--transcode-heic用）
+    戻り値: 失敗した件数
+    """
+    paths = sorted(str(path) for path in Path(folder).iterdir() if path.is_file())
+    pending = pending_transcodes(paths, output_folder)
+    skipped = sum(1 for path in paths if is_heic(path)) - len(pending)
+    print(f"変換対象 {len(pending)}件（変換済み {skipped}件は省略）")
+    if not pending:
+        return 0
+
+    started = time.perf_counter()
+    source_bytes = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(transcode_heic, path, output_folder, quality): path for path in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                future.result()
+                source_bytes += os.path.getsize(path)
+            except Exception as e:
+                failed += 1
+                print(f"変換に失敗しました: {path} ({e})")
+            elapsed = time.perf_counter() - started
+            print(f"\r{done}/{len(pending)}  {done / elapsed:.1f}件/秒  "
+                  f"{source_bytes / 1024 / 1024 / elapsed:.1f}MB/秒", end="", flush=True)
+    print()
+    elapsed = time.perf_counter() - started
+    print(f"{len(pending) - failed}件を変換しました（失敗 {failed}件、{elapsed:.1f}秒、"
+          f"{len(pending) / elapsed:.1f}件/秒）")
+    return failed
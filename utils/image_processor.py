@@ -1,82 +1,102 @@
 """
 画像処理モジュール
 HEIC対応を含む画像表示機能を提供
+起動を速くするため、Pillowは最初の画像表示時、pillow_heifは最初のHEIC読み込み時にインポートする
 """
-from PIL import Image, ImageTk
-import pillow_heif
-from typing import Optional, Tuple
-import tkinter as tk
+import logging
+import os
+from typing import TYPE_CHECKING, Optional
+from utils.bounded_decode import DEFAULT_MEMORY_BUDGET, ImageTooLargeError, decode_reduced, fit_size
+from utils.perf_trace import STAGE_DECODE, STAGE_PHOTOIMAGE, STAGE_RESIZE, span
+from utils.tk_blit import PhotoBlitter
+
+if TYPE_CHECKING:
+    from PIL import ImageTk
+    from utils.preview_store import PreviewStore
+
+logger = logging.getLogger(__name__)
+
+
+# pillow_heifが必要な拡張子
+HEIF_EXTENSIONS = {'.heic', '.heif'}
+
+_heif_opener_registered = False
+
+
+def ensure_heif_support(image_path: str):
+    """HEIC/HEIFファイルの場合、初回のみHEIF/HEIC形式のサポートを有効化"""
+    global _heif_opener_registered
+    if _heif_opener_registered:
+        return
+    if os.path.splitext(image_path)[1].lower() not in HEIF_EXTENSIONS:
+        return
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+    _heif_opener_registered = True
 
 
 class ImageProcessor:
     """画像処理を行うクラス"""
     
     def __init__(self):
-        # HEIF/HEIC形式のサポートを有効化
-        pillow_heif.register_heif_opener()
         self.max_width = 800
         self.max_height = 600
+        # PhotoImageへの変換（最も速い方式を初回に測定して選ぶ）
+        self.blitter = PhotoBlitter()
+        # 先読み済みのプレビュー（設定されている場合は、ストアにある画像のデコードとリサイズを省略する）
+        self.preview_store: Optional["PreviewStore"] = None
+        # 1枚のデコードに使うメモリの上限（超える画像は表示しない）
+        self.memory_budget = DEFAULT_MEMORY_BUDGET
+        # 直前の読み込みに失敗した理由（ユーザーに表示するもの）
+        self.last_error: Optional[str] = None
     
-    def load_and_resize_image(self, image_path: str) -> Optional[ImageTk.PhotoImage]:
+    def load_and_resize_image(self, image_path: str) -> Optional["ImageTk.PhotoImage"]:
         """
         画像を読み込み、指定サイズに縮小してTkinter用の画像オブジェクトを返す
         アスペクト比は維持される
         """
+        from PIL import Image
+        self.last_error = None
         try:
+            if self.preview_store is not None:
+                preview = self.preview_store.get(image_path, (self.max_width, self.max_height))
+                if preview is not None:
+                    with span(STAGE_PHOTOIMAGE):
+                        return self.blitter.to_photo(preview)
+            
+            ensure_heif_support(image_path)
             # 画像を開く
             with Image.open(image_path) as img:
-                # RGBA形式の場合はRGBに変換（透明度を白で埋める）
-                if img.mode in ('RGBA', 'LA'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'RGBA':
-                        background.paste(img, mask=img.split()[-1])
-                    else:
-                        background.paste(img)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
+                size = fit_size(img.size, (self.max_width, self.max_height))
+                with span(STAGE_DECODE):
+                    # 縮小デコード・透過の合成（白で埋める）・整数倍の縮小をメモリの上限内で行う
+                    reduced_img = decode_reduced(img, size, self.memory_budget)
                 
-                # リサイズ処理
-                resized_img = self._resize_with_aspect_ratio(img)
+                # リサイズ処理（高品質なリサンプリング使用）
+                with span(STAGE_RESIZE):
+                    resized_img = reduced_img
+                    if resized_img.size != size:
+                        resized_img = resized_img.resize(size, Image.Resampling.LANCZOS)
                 
-                # Tkinter用のPhotoImageに変換
-                return ImageTk.PhotoImage(resized_img)
+                # Tkinter用のPhotoImageに変換（同じサイズの場合は前回のPhotoImageを上書きすることがある）
+                with span(STAGE_PHOTOIMAGE):
+                    return self.blitter.to_photo(resized_img)
                 
+        except ImageTooLargeError as e:
+            logger.warning(f"画像の読み込みを中止しました: {image_path} ({e})")
+            self.last_error = str(e)
+            return None
         except Exception as e:
-            print(f"画像の読み込みに失敗しました: {image_path}")
-            print(f"エラー: {str(e)}")
+            logger.warning(f"画像の読み込みに失敗しました: {image_path} ({e})")
             return None
     
-    def _resize_with_aspect_ratio(self, image: Image.Image) -> Image.Image:
-        """
-        アスペクト比を維持しながら画像をリサイズ
-        """
-        original_width, original_height = image.size
-        
-        # アスペクト比を計算
-        width_ratio = self.max_width / original_width
-        height_ratio = self.max_height / original_height
-        
-        # 小さい方の比率を使用（画像が枠に収まるように）
-        ratio = min(width_ratio, height_ratio)
-        
-        # リサイズが必要かチェック
-        if ratio >= 1.0:
-            # 元画像の方が小さい場合はそのまま返す
-            return image
-        
-        # 新しいサイズを計算
-        new_width = int(original_width * ratio)
-        new_height = int(original_height * ratio)
-        
-        # リサイズ実行（高品質なリサンプリング使用）
-        return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    
     def get_image_info(self, image_path: str) -> Optional[dict]:
         """
         画像の基本情報を取得
         """
+        from PIL import Image
         try:
+            ensure_heif_support(image_path)
             with Image.open(image_path) as img:
                 return {
                     'width': img.width,
@@ -86,20 +106,19 @@ class ImageProcessor:
                     'size_mb': self._get_file_size_mb(image_path)
                 }
         except Exception as e:
-            print(f"画像情報の取得に失敗しました: {image_path}")
-            print(f"エラー: {str(e)}")
+            logger.warning(f"画像情報の取得に失敗しました: {image_path} ({e})")
             return None
     
     def _get_file_size_mb(self, file_path: str) -> float:
         """ファイルサイズをMBで取得"""
-        import os
         size_bytes = os.path.getsize(file_path)
         return round(size_bytes / (1024 * 1024), 2)
     
-    def create_placeholder_image(self, width: int = 400, height: int = 300) -> ImageTk.PhotoImage:
+    def create_placeholder_image(self, width: int = 400, height: int = 300) -> "ImageTk.PhotoImage":
         """
         画像が読み込めない場合のプレースホルダー画像を作成
         """
+        from PIL import Image, ImageTk
         try:
             # グレーの背景に「No Image」テキストを描画
             img = Image.new('RGB', (width, height), color='lightgray')
@@ -0,0 +1,195 @@
+"""
+マスターファイル読み込みモジュール
+xlsx（高速読み込み／openpyxl）とCSV/TSVを同じ形（ヘッダー行＋値のタプル）で読むためのローダーと、
+すべての形式で共通のヘッダー列検索を提供
+"""
+import codecs
+import csv
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.xlsx_stream import XlsxStreamReader
+
+logger = logging.getLogger(__name__)
+
+
+# CSV/TSVとして読み込む拡張子
+CSV_EXTENSIONS = {'.csv', '.tsv', '.txt'}
+
+# ファイル選択ダイアログで使用するファイル種別
+MASTER_FILETYPES = [
+    ("マスターファイル", "*.xlsx *.csv *.tsv *.txt"),
+    ("Excel files", "*.xlsx"),
+    ("CSV/TSV files", "*.csv *.tsv *.txt"),
+]
+
+# エンコーディング判定に使用する先頭のバイト数
+_ENCODING_SAMPLE_SIZE = 64 * 1024
+
+
+def map_header_columns(header_row: Sequence, header_names: Iterable[str]) -> Dict[str, int]:
+    """ヘッダー行から 列名 -> 列インデックス を検索（見つからない列名は含まれない）"""
+    wanted = set(header_names)
+    columns: Dict[str, int] = {}
+    for col_idx, header_value in enumerate(header_row):
+        if header_value:
+            header_str = str(header_value).strip()
+            if header_str in wanted:
+                columns[header_str] = col_idx
+    return columns
+
+
+def select_sheet_with_headers(source, header_names: Sequence[str],
+                              sheet_name: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """
+    必要な列がそろったシートを選択し、列名 -> 列インデックス を返す
+    sheet_nameを指定した場合はそのシートのみ、指定しない場合は現在のシートを優先して全シートを探す
+    """
+    if sheet_name is not None:
+        source.select_sheet(sheet_name)
+        candidates = [sheet_name]
+    else:
+        current = source.sheet_name
+        candidates = [current] + [name for name in source.sheet_names() if name != current]
+
+    for name in candidates:
+        source.select_sheet(name)
+        columns = map_header_columns(source.header_row(), header_names)
+        if len(columns) == len(header_names):
+            return columns
+    return None
+
+
+def detect_encoding(file_path: str) -> str:
+    """CSVのエンコーディングを判定（BOM付きUTF-8/UTF-16、UTF-8、それ以外はShift_JIS(cp932)）"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(_ENCODING_SAMPLE_SIZE)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+
+    try:
+        # 末尾で文字が途中になっている可能性があるため、インクリメンタルデコーダで確認する
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp932'
+
+
+class CsvSource:
+    """CSV/TSVファイルを逐次読み込むクラス（シートは1つだけとして扱う）"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.encoding = detect_encoding(file_path)
+        self.sheet_name = os.path.splitext(os.path.basename(file_path))[0]
+        self.delimiter = self._detect_delimiter()
+        self._file = None
+
+    def _detect_delimiter(self) -> str:
+        """区切り文字を判定（.tsvはタブ、.csvはカンマ、それ以外は1行目で判定）"""
+        extension = os.path.splitext(self.file_path)[1].lower()
+        if extension == '.tsv':
+            return '\t'
+        if extension == '.csv':
+            return ','
+        with open(self.file_path, encoding=self.encoding, newline='') as f:
+            first_line = f.readline()
+        return '\t' if first_line.count('\t') > first_line.count(',') else ','
+
+    def sheet_names(self) -> List[str]:
+        """シート名のリストを取得"""
+        return [self.sheet_name]
+
+    def select_sheet(self, sheet_name: str):
+        """シートを選択（CSVのシートは1つのみ）"""
+        if sheet_name != self.sheet_name:
+            raise KeyError(f"シート「{sheet_name}」が見つかりません")
+
+    def header_row(self) -> Tuple:
+        """1行目の値をタプルで取得"""
+        for row in self.iter_rows(min_row=1, max_row=1):
+            return row
+        return ()
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None,
+                  columns: Optional[Iterable[int]] = None) -> Iterator[Tuple]:
+        """行の値をタプルで順に返す（空欄はNone、columnsは無視し全列を返す）"""
+        self.close()
+        self._file = open(self.file_path, encoding=self.encoding, newline='')
+        try:
+            reader = csv.reader(self._file, delimiter=self.delimiter)
+            for row_number, row in enumerate(reader, 1):
+                if row_number < min_row:
+                    continue
+                if max_row is not None and row_number > max_row:
+                    return
+                yield tuple(value if value != '' else None for value in row)
+        finally:
+            self.close()
+
+    def close(self):
+        """ファイルを閉じる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class OpenpyxlSource:
+    """openpyxlでxlsxを読むためのアダプター（XlsxStreamReaderと同じ形で読む）"""
+
+    def __init__(self, file_path: str):
+        import openpyxl
+        self.workbook = openpyxl.load_workbook(file_path, read_only=True)
+        self.sheet = self.workbook.active
+        self.sheet_name = self.sheet.title
+
+    def sheet_names(self) -> List[str]:
+        """シート名のリストを取得"""
+        return list(self.workbook.sheetnames)
+
+    def select_sheet(self, sheet_name: str):
+        """読み込むシートを切り替える"""
+        if sheet_name not in self.workbook.sheetnames:
+            raise KeyError(f"シート「{sheet_name}」が見つかりません")
+        self.sheet = self.workbook[sheet_name]
+        self.sheet_name = sheet_name
+
+    def header_row(self) -> Tuple:
+        """1行目の値をタプルで取得"""
+        return next(self.sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None,
+                  columns: Optional[Iterable[int]] = None) -> Iterator[Tuple]:
+        """行の値をタプルで順に返す（columnsは無視し、全列を返す）"""
+        return self.sheet.iter_rows(min_row=min_row, max_row=max_row, values_only=True)
+
+    def close(self):
+        """ワークブックを閉じる"""
+        self.workbook.close()
+
+
+def open_master_source(file_path: str, use_fast_reader: bool = True):
+    """
+    拡張子に応じたローダーでマスターファイルを開く
+    xlsxは高速読み込みを優先し、開けない場合はopenpyxlを使用する
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return CsvSource(file_path)
+
+    if use_fast_reader:
+        try:
+            return XlsxStreamReader(file_path)
+        except Exception as e:
+            logger.debug(f"高速読み込みを使用できないためopenpyxlで読み込みます: {e}")
+    return OpenpyxlSource(file_path)
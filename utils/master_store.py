@@ -0,0 +1,145 @@
+"""
+マスターデータ格納モジュール
+素材・加工方法マスターの各行を__slots__付きのレコードで1つだけ保持し、
+ID・名称・表示名・区分の索引から参照する
+"""
+import sys
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+
+class MasterRecord:
+    """マスターの1行分のデータ"""
+
+    __slots__ = ('record_id', 'name', 'description', 'category', 'display_name')
+
+    def __init__(self, record_id: str, name: str, description: str, category: str):
+        self.record_id = record_id
+        self.name = name
+        self.description = description
+        self.category = category
+        # ドロップダウン表示用の文字列
+        self.display_name = f"{name} - {description}" if description else name
+
+    def to_dict(self, include_category: bool = True) -> Dict[str, str]:
+        """従来の詳細データ形式（辞書）に変換"""
+        details = {'name': self.name, 'description': self.description}
+        if include_category:
+            details['category'] = self.category
+        return details
+
+    def same_values(self, other: "MasterRecord") -> bool:
+        """内容が同じレコードかチェック"""
+        return (self.record_id == other.record_id and self.name == other.name and
+                self.description == other.description and self.category == other.category)
+
+
+class MasterTable:
+    """マスターレコードの表と索引（同じキーが重複した場合は後の行が優先）"""
+
+    def __init__(self):
+        self.records: List[MasterRecord] = []
+        self.by_id: Dict[str, MasterRecord] = {}
+        self.by_name: Dict[str, MasterRecord] = {}
+        self.by_display_name: Dict[str, MasterRecord] = {}
+        self.names_by_category: Dict[str, List[str]] = {}  # 区分 -> 名称リスト（行の順序）
+
+    def __len__(self) -> int:
+        return len(self.by_display_name)
+
+    def __bool__(self) -> bool:
+        return bool(self.by_display_name)
+
+    def add(self, record_id: str, name: str, description: str = "", category: str = "") -> MasterRecord:
+        """レコードを追加（繰り返し現れる区分・説明・IDの文字列は共有する）"""
+        record = MasterRecord(
+            sys.intern(record_id), name, sys.intern(description), sys.intern(category)
+        )
+        self.records.append(record)
+        self.by_id[record.record_id] = record
+        self.by_name[name] = record
+        self.by_display_name[record.display_name] = record
+        if category:
+            names = self.names_by_category.get(record.category)
+            if names is None:
+                self.names_by_category[record.category] = [name]
+            else:
+                names.append(name)
+        return record
+
+    def id_for_display_name(self, display_name: str) -> Optional[str]:
+        """表示名からIDを取得"""
+        record = self.by_display_name.get(display_name)
+        return record.record_id if record else None
+
+    def id_for_name(self, name: str) -> Optional[str]:
+        """名称からIDを取得"""
+        record = self.by_name.get(name)
+        return record.record_id if record else None
+
+
+class RecordView(Mapping):
+    """索引を従来の辞書形式で参照するための読み取り専用ビュー"""
+
+    def __init__(self, index: Dict[str, MasterRecord], convert: Callable[[MasterRecord], object]):
+        self._index = index
+        self._convert = convert
+
+    def __getitem__(self, key):
+        return self._convert(self._index[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f"RecordView({len(self._index)}件)"
+
+
+class MasterDiff:
+    """2つのマスターテーブル間の行単位（ID単位）の差分"""
+
+    __slots__ = ('added', 'removed', 'changed', 'affected_categories', 'display_names_changed')
+
+    def __init__(self, added: List[str], removed: List[str], changed: List[str],
+                 affected_categories: Set[str], display_names_changed: bool):
+        self.added = added  # 追加されたID
+        self.removed = removed  # 削除されたID
+        self.changed = changed  # 内容が変わったID
+        self.affected_categories = affected_categories  # 名称リストや検索対象が変わった区分
+        self.display_names_changed = display_names_changed  # 表示名リスト（順序を含む）が変わったか
+
+    def is_empty(self) -> bool:
+        """差分がないかチェック"""
+        return not (self.added or self.removed or self.changed or
+                    self.affected_categories or self.display_names_changed)
+
+    def summary(self) -> str:
+        """差分の概要（表示用）"""
+        return f"追加{len(self.added)}件 / 削除{len(self.removed)}件 / 変更{len(self.changed)}件"
+
+
+def diff_tables(old: MasterTable, new: MasterTable) -> MasterDiff:
+    """IDをキーにして追加・削除・変更された行と、内容が変わった区分を求める"""
+    added = [record_id for record_id in new.by_id if record_id not in old.by_id]
+    removed = [record_id for record_id in old.by_id if record_id not in new.by_id]
+    changed = [
+        record_id for record_id, record in new.by_id.items()
+        if record_id in old.by_id and not record.same_values(old.by_id[record_id])
+    ]
+
+    # 区分ごとの名称リスト（順序を含む）が変わった区分と、差分のあるレコードが属する区分
+    affected_categories = {
+        category for category in set(old.names_by_category) | set(new.names_by_category)
+        if old.names_by_category.get(category) != new.names_by_category.get(category)
+    }
+    for record_id in added + changed:
+        affected_categories.add(new.by_id[record_id].category)
+    for record_id in removed + changed:
+        affected_categories.add(old.by_id[record_id].category)
+    affected_categories.discard("")
+
+    display_names_changed = list(old.by_display_name) != list(new.by_display_name)
+    return MasterDiff(added, removed, changed, affected_categories, display_names_changed)
@@ -0,0 +1,507 @@
+"""
+メタデータ書き込みモジュール
+ファイル名に含めた部品の情報（番号・部品名・重量・素材・加工方法など）をXMPとして画像ファイルに埋め込む
+画像データは再エンコードせず、メタデータの部分だけを書き換えて圧縮済みのデータはそのままコピーする
+- JPEG: XMPのAPP1セグメントを差し替える（SOS以降はそのままコピー）
+- PNG: XMPのiTXtチャンクを差し替える（IDATはそのままコピー）
+- HEIC/HEIF: metaボックスにXMPのアイテム（mime / application/rdf+xml）を追加し、データは末尾のmdatに置く
+  （metaの大きさが変わる分、ilocのファイル内の位置を補正する）
+"""
+import os
+import shutil
+import struct
+import zlib
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from utils.number_allocator import FolderLock
+from utils.preview_store import FileKey, stat_key
+
+
+# 埋め込む項目（XMPのプロパティ名, 属性のキー）
+XMP_PROPERTIES = (
+    ("Number", "number"),
+    ("PartName", "part_name"),
+    ("Weight", "weight"),
+    ("Unit", "unit"),
+    ("MaterialID", "material_id"),
+    ("MaterialName", "material"),
+    ("ProcessingID", "processing_id"),
+    ("ProcessingName", "processing"),
+    ("PhotoType", "photo_type"),
+    ("Notes", "notes"),
+)
+
+# 部品の情報のXMPの名前空間
+XMP_NAMESPACE = "urn:picture-rename:parts:1.0/"
+XMP_PREFIX = "pr"
+
+# ファイルをコピーする単位（バイト）
+COPY_CHUNK_BYTES = 1024 * 1024
+
+_JPEG_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+_JPEG_EXTENDED_XMP_HEADER = b"http://ns.adobe.com/xmp/extension/\x00"
+_JPEG_MAX_SEGMENT = 0xFFFF - 2
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_XMP_KEYWORD = b"XML:com.adobe.xmp"
+_HEIF_XMP_CONTENT_TYPE = b"application/rdf+xml"
+
+
+class MetadataError(Exception):
+    """メタデータを書き込めない画像（形式が不正・未対応）のエラー"""
+
+
+def build_xmp(attributes: Dict[str, str]) -> bytes:
+    """部品の情報からXMPのパケットを作成（部品名はdc:titleにも設定する）"""
+    properties = "".join(
+        f"   <{XMP_PREFIX}:{name}>{escape(str(attributes[key]))}</{XMP_PREFIX}:{name}>\n"
+        for name, key in XMP_PROPERTIES if attributes.get(key)
+    )
+    title = ""
+    if attributes.get("part_name"):
+        title = ("   <dc:title><rdf:Alt><rdf:li xml:lang=\"x-default\">"
+                 f"{escape(attributes['part_name'])}</rdf:li></rdf:Alt></dc:title>\n")
+    packet = (
+        "<?xpacket begin=\"﻿\" id=\"W5M0MpCehiHzreSzNTczkc9d\"?>\n"
+        "<x:xmpmeta xmlns:x=\"adobe:ns:meta/\">\n"
+        " <rdf:RDF xmlns:rdf=\"http://www.w3.org/1999/02/22-rdf-syntax-ns#\">\n"
+        "  <rdf:Description rdf:about=\"\"\n"
+        "    xmlns:dc=\"http://purl.org/dc/elements/1.1/\"\n"
+        f"    xmlns:{XMP_PREFIX}=\"{XMP_NAMESPACE}\">\n"
+        f"{title}{properties}"
+        "  </rdf:Description>\n"
+        " </rdf:RDF>\n"
+        "</x:xmpmeta>\n"
+        "<?xpacket end=\"w\"?>"
+    )
+    return packet.encode("utf-8")
+
+
+def embed_metadata(image_path: str, attributes: Dict[str, str]) -> Optional[Tuple[FileKey, FileKey]]:
+    """
+    画像ファイルに部品の情報をXMPとして埋め込む（ワーカープロセスから呼び出す）
+    一時ファイルに書き出してから、フォルダのロックを保持したまま置き換え、更新日時は元のファイルの値を保つ
+    書き出し中にファイルがリネーム・変更された場合は置き換えない（古い名前のファイルを作り直さない）
+    戻り値: (書き換え前, 書き換え後) のファイルの識別子（置き換えなかった場合はNone）
+    """
+    xmp = build_xmp(attributes)
+    folder, name = os.path.split(image_path)
+    temp_path = os.path.join(folder, f".{name}.{os.getpid()}.tmp")
+    stat = os.stat(image_path)
+    try:
+        with open(image_path, "rb") as src, open(temp_path, "wb") as dst:
+            head = src.read(12)
+            src.seek(0)
+            if head[:2] == b"\xff\xd8":
+                _rewrite_jpeg(src, dst, xmp)
+            elif head[:8] == _PNG_SIGNATURE:
+                _rewrite_png(src, dst, xmp)
+            elif head[4:8] == b"ftyp":
+                _rewrite_heif(src, dst, xmp, stat.st_size)
+            else:
+                raise MetadataError(f"メタデータの書き込みに対応していない形式です: {name}")
+        shutil.copymode(image_path, temp_path)
+        with FolderLock(folder):
+            try:
+                unchanged = stat_key(os.stat(image_path)) == stat_key(stat)
+            except FileNotFoundError:
+                unchanged = False
+            if not unchanged:
+                os.remove(temp_path)
+                return None
+            os.replace(temp_path, image_path)
+            os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            return stat_key(stat), stat_key(os.stat(image_path))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, length: Optional[int] = None):
+    """ファイルの一部（lengthがNoneの場合は末尾まで）をそのままコピー"""
+    src.seek(start)
+    if length is None:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+        return
+    while length > 0:
+        chunk = src.read(min(length, COPY_CHUNK_BYTES))
+        if not chunk:
+            raise MetadataError("ファイルが途中で終わっています")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+# ---- JPEG ----
+
+def _rewrite_jpeg(src: BinaryIO, dst: BinaryIO, xmp: bytes):
+    """JPEGのXMPのAPP1セグメントを差し替え、SOS以降はそのままコピー"""
+    payload = _JPEG_XMP_HEADER + xmp
+    if len(payload) > _JPEG_MAX_SEGMENT:
+        raise MetadataError("XMPが大きすぎます")
+    src.read(2)  # SOI
+    segments: List[bytes] = []
+    while True:
+        marker = src.read(2)
+        while len(marker) == 2 and marker[1] == 0xFF:  # 埋め草の0xFF
+            marker = marker[1:] + src.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise MetadataError("JPEGのセグメントが不正です")
+        code = marker[1]
+        if code in (0xDA, 0xD9):  # SOS・EOI以降は画像データ
+            body_start = src.tell() - 2
+            break
+        if 0xD0 <= code <= 0xD7 or code == 0x01:
+            segments.append(marker)
+            continue
+        length_bytes = src.read(2)
+        if len(length_bytes) < 2:
+            raise MetadataError("JPEGのセグメントが不正です")
+        data = src.read(struct.unpack(">H", length_bytes)[0] - 2)
+        if code == 0xE1 and (data.startswith(_JPEG_XMP_HEADER) or data.startswith(_JPEG_EXTENDED_XMP_HEADER)):
+            continue  # 既存のXMPは差し替える
+        segments.append(marker + length_bytes + data)
+
+    # JFIF(APP0)・EXIF(APP1)は先頭に置く必要があるため、その後ろに挿入する
+    position = 0
+    while position < len(segments) and segments[position][1] in (0xE0, 0xE1):
+        position += 1
+    segments.insert(position, b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload)
+    dst.write(b"\xff\xd8")
+    for segment in segments:
+        dst.write(segment)
+    _copy_range(src, dst, body_start)
+
+
+# ---- PNG ----
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """PNGのチャンクを作成"""
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+def _rewrite_png(src: BinaryIO, dst: BinaryIO, xmp: bytes):
+    """PNGのXMPのiTXtチャンクを差し替え（IHDRの直後に置く）、それ以外のチャンクはそのままコピー"""
+    # iTXt: キーワード, NUL, 圧縮なし(0), 圧縮方式(0), 言語タグ(空), NUL, 翻訳キーワード(空), NUL, テキスト
+    itxt = _png_chunk(b"iTXt", _PNG_XMP_KEYWORD + b"\x00\x00\x00\x00\x00" + xmp)
+    dst.write(_PNG_SIGNATURE)
+    position = len(_PNG_SIGNATURE)
+    src.seek(position)
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            raise MetadataError("PNGのチャンクが不正です")
+        length, chunk_type = struct.unpack(">I4s", header)
+        chunk_size = length + 12
+        is_xmp = False
+        if chunk_type == b"iTXt":
+            is_xmp = src.read(len(_PNG_XMP_KEYWORD) + 1) == _PNG_XMP_KEYWORD + b"\x00"
+        if not is_xmp:
+            _copy_range(src, dst, position, chunk_size)
+        if chunk_type == b"IHDR":
+            dst.write(itxt)
+        position += chunk_size
+        src.seek(position)
+        if chunk_type == b"IEND":
+            return
+
+
+# ---- HEIC/HEIF（ISOBMFF） ----
+
+def _read_uint(data: bytes, position: int, size: int) -> int:
+    """size（0, 4, 8）バイトの符号なし整数を読み取る"""
+    if size == 0:
+        return 0
+    return int.from_bytes(data[position:position + size], "big")
+
+
+def _write_uint(value: int, size: int) -> bytes:
+    """size（0, 4, 8）バイトの符号なし整数を書き出す"""
+    if size == 0:
+        return b""
+    if value >= 1 << (size * 8):
+        raise MetadataError("ファイル内の位置が大きすぎます")
+    return value.to_bytes(size, "big")
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    """ボックスを作成"""
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    """data[start:end] に含まれるボックスを (種類, ボックスの開始位置, 中身の開始位置, 終了位置) で列挙"""
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, position)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, position + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            raise MetadataError("HEIFのボックスが不正です")
+        yield box_type, position, position + header, position + size
+        position += size
+
+
+def _top_level_boxes(src: BinaryIO, file_size: int) -> List[Tuple[bytes, int, int]]:
+    """ファイルの最上位のボックスを (種類, 開始位置, 大きさ) で列挙（中身は読み込まない）"""
+    boxes = []
+    position = 0
+    while position + 8 <= file_size:
+        src.seek(position)
+        header = src.read(16)
+        size, box_type = struct.unpack_from(">I4s", header)
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+        elif size == 0:
+            size = file_size - position
+        if size < 8 or position + size > file_size:
+            raise MetadataError("HEIFのボックスが不正です")
+        boxes.append((box_type, position, size))
+        position += size
+    return boxes
+
+
+class _ItemLocation:
+    """ilocの1アイテム分の位置情報"""
+
+    __slots__ = ('item_id', 'method', 'data_reference', 'base_offset', 'extents')
+
+    def __init__(self, item_id: int, method: int, data_reference: int, base_offset: int,
+                 extents: List[List[int]]):
+        self.item_id = item_id
+        self.method = method  # 0: ファイル内の位置, 1: idat内の位置, 2: 他のアイテム
+        self.data_reference = data_reference
+        self.base_offset = base_offset
+        self.extents = extents  # [インデックス, 位置, 長さ]
+
+
+def _parse_iloc(payload: bytes) -> Tuple[int, List[int], List[_ItemLocation]]:
+    """ilocを解析（戻り値: バージョン, [位置・長さ・基準位置・インデックスのバイト数], アイテム）"""
+    version = payload[0]
+    offset_size, length_size = payload[4] >> 4, payload[4] & 0x0F
+    base_offset_size, index_size = payload[5] >> 4, payload[5] & 0x0F
+    if version == 0:
+        index_size = 0
+    position = 6
+    if version < 2:
+        count = struct.unpack_from(">H", payload, position)[0]
+        position += 2
+    else:
+        count = struct.unpack_from(">I", payload, position)[0]
+        position += 4
+    items = []
+    for _ in range(count):
+        if version < 2:
+            item_id = struct.unpack_from(">H", payload, position)[0]
+            position += 2
+        else:
+            item_id = struct.unpack_from(">I", payload, position)[0]
+            position += 4
+        method = 0
+        if version in (1, 2):
+            method = struct.unpack_from(">H", payload, position)[0] & 0x0F
+            position += 2
+        data_reference = struct.unpack_from(">H", payload, position)[0]
+        position += 2
+        base_offset = _read_uint(payload, position, base_offset_size)
+        position += base_offset_size
+        extent_count = struct.unpack_from(">H", payload, position)[0]
+        position += 2
+        extents = []
+        for _ in range(extent_count):
+            index = _read_uint(payload, position, index_size)
+            position += index_size
+            offset = _read_uint(payload, position, offset_size)
+            position += offset_size
+            length = _read_uint(payload, position, length_size)
+            position += length_size
+            extents.append([index, offset, length])
+        items.append(_ItemLocation(item_id, method, data_reference, base_offset, extents))
+    return version, [offset_size, length_size, base_offset_size, index_size], items
+
+
+def _build_iloc(version: int, sizes: List[int], items: List[_ItemLocation]) -> bytes:
+    """ilocを作成"""
+    offset_size, length_size, base_offset_size, index_size = sizes
+    payload = bytearray(bytes([version, 0, 0, 0, (offset_size << 4) | length_size,
+                               (base_offset_size << 4) | (index_size if version else 0)]))
+    payload += struct.pack(">H" if version < 2 else ">I", len(items))
+    for item in items:
+        payload += struct.pack(">H" if version < 2 else ">I", item.item_id)
+        if version in (1, 2):
+            payload += struct.pack(">H", item.method)
+        payload += struct.pack(">H", item.data_reference)
+        payload += _write_uint(item.base_offset, base_offset_size)
+        payload += struct.pack(">H", len(item.extents))
+        for index, offset, length in item.extents:
+            if version:
+                payload += _write_uint(index, index_size)
+            payload += _write_uint(offset, offset_size)
+            payload += _write_uint(length, length_size)
+    return _box(b"iloc", bytes(payload))
+
+
+def _parse_infe(data: bytes, start: int) -> Tuple[int, bool]:
+    """infe（アイテムの情報）から (アイテムID, XMPのアイテムか) を取得"""
+    version = data[start]
+    position = start + 4
+    if version >= 2:
+        if version == 2:
+            item_id = struct.unpack_from(">H", data, position)[0]
+            position += 2
+        else:
+            item_id = struct.unpack_from(">I", data, position)[0]
+            position += 4
+        item_type = data[position + 2:position + 6]
+        if item_type != b"mime":
+            return item_id, False
+        position += 6
+    else:
+        item_id = struct.unpack_from(">H", data, position)[0]
+        position += 4
+    name_end = data.index(b"\x00", position)
+    content_type = data[name_end + 1:data.index(b"\x00", name_end + 1)]
+    return item_id, content_type == _HEIF_XMP_CONTENT_TYPE
+
+
+def _parse_iref(data: bytes, start: int, end: int) -> List[Tuple[bytes, int, List[int]]]:
+    """iref（アイテム間の参照）を (種類, 参照元のID, [参照先のID]) の一覧で取得"""
+    version = data[start]
+    id_format, id_size = (">H", 2) if version == 0 else (">I", 4)
+    references = []
+    for ref_type, _, position, ref_end in _iter_boxes(data, start + 4, end):
+        from_id = struct.unpack_from(id_format, data, position)[0]
+        count = struct.unpack_from(">H", data, position + id_size)[0]
+        position += id_size + 2
+        to_ids = [struct.unpack_from(id_format, data, position + number * id_size)[0] for number in range(count)]
+        references.append((ref_type, from_id, to_ids))
+    return references
+
+
+def _build_iref(references: List[Tuple[bytes, int, List[int]]]) -> bytes:
+    """irefを作成（IDが16ビットに収まらない場合はバージョン1）"""
+    largest = max([from_id for _, from_id, _ in references] +
+                  [to_id for _, _, to_ids in references for to_id in to_ids] + [0])
+    version, id_format = (0, ">H") if largest <= 0xFFFF else (1, ">I")
+    payload = bytes([version, 0, 0, 0])
+    for ref_type, from_id, to_ids in references:
+        body = struct.pack(id_format, from_id) + struct.pack(">H", len(to_ids))
+        body += b"".join(struct.pack(id_format, to_id) for to_id in to_ids)
+        payload += _box(ref_type, body)
+    return _box(b"iref", payload)
+
+
+def _rewrite_heif(src: BinaryIO, dst: BinaryIO, xmp: bytes, file_size: int):
+    """HEIFのmetaにXMPのアイテムを追加（既存のXMPは置き換え）し、データは末尾のmdatに置く"""
+    boxes = _top_level_boxes(src, file_size)
+    meta_boxes = [box for box in boxes if box[0] == b"meta"]
+    if len(meta_boxes) != 1:
+        raise MetadataError("HEIFのmetaボックスが見つかりません")
+    _, meta_start, meta_size = meta_boxes[0]
+    meta_end = meta_start + meta_size
+    src.seek(meta_start)
+    meta = src.read(meta_size)
+
+    children = list(_iter_boxes(meta, 12 if struct.unpack_from(">I", meta)[0] != 1 else 20, len(meta)))
+    found = {box_type: (start, payload_start, end) for box_type, start, payload_start, end in children}
+    if b"pitm" not in found or b"iinf" not in found or b"iloc" not in found:
+        raise MetadataError("HEIFのアイテムの情報が見つかりません")
+
+    pitm_start = found[b"pitm"][1]
+    primary_id = struct.unpack_from(">H" if meta[pitm_start] == 0 else ">I", meta, pitm_start + 4)[0]
+
+    # 既存のアイテム（XMPのアイテムは削除する）
+    iinf_start, iinf_payload, iinf_end = found[b"iinf"]
+    iinf_version = meta[iinf_payload]
+    entries = []
+    old_xmp_ids = set()
+    all_ids = []
+    for box_type, start, payload_start, end in _iter_boxes(meta, iinf_payload + (6 if iinf_version == 0 else 8), iinf_end):
+        item_id, is_xmp = _parse_infe(meta, payload_start)
+        all_ids.append(item_id)
+        if is_xmp:
+            old_xmp_ids.add(item_id)
+        else:
+            entries.append(meta[start:end])
+    new_id = max(all_ids + [primary_id]) + 1
+
+    version, sizes, locations = _parse_iloc(meta[found[b"iloc"][1]:found[b"iloc"][2]])
+    # 以前に追加したXMPのデータが末尾のmdatだけに入っている場合は、そのmdatを削除する
+    last_type, last_start, last_size = boxes[-1]
+    drop_last = False
+    for location in locations:
+        if location.item_id in old_xmp_ids and location.method == 0 and len(location.extents) == 1:
+            offset = location.base_offset + location.extents[0][1]
+            drop_last = (last_type == b"mdat" and last_start > meta_end and
+                         offset == last_start + 8 and location.extents[0][2] == last_size - 8)
+    locations = [location for location in locations if location.item_id not in old_xmp_ids]
+    kept_boxes = boxes[:-1] if drop_last else boxes
+
+    # 新しいアイテムの位置は仮の値で作成し、metaの大きさが決まってから設定する
+    sizes[0] = max(sizes[0], 4)
+    sizes[1] = max(sizes[1], 4)
+    if version == 0 and new_id > 0xFFFF:
+        raise MetadataError("HEIFのアイテムが多すぎます")
+    xmp_location = _ItemLocation(new_id, 0, 0, 0, [[0, 0, len(xmp)]])
+    locations.append(xmp_location)
+
+    infe_version = 2 if new_id <= 0xFFFF else 3
+    infe = bytes([infe_version, 0, 0, 0]) + struct.pack(">H" if infe_version == 2 else ">I", new_id)
+    infe += b"\x00\x00mime" + b"XMP\x00" + _HEIF_XMP_CONTENT_TYPE + b"\x00"
+    entries.append(_box(b"infe", infe))
+    iinf_version = iinf_version if len(entries) <= 0xFFFF else 1
+    iinf = _box(b"iinf", bytes([iinf_version, 0, 0, 0]) +
+                struct.pack(">H" if iinf_version == 0 else ">I", len(entries)) + b"".join(entries))
+
+    references = []
+    if b"iref" in found:
+        iref_start, iref_payload, iref_end = found[b"iref"]
+        for ref_type, from_id, to_ids in _parse_iref(meta, iref_payload, iref_end):
+            if from_id in old_xmp_ids:
+                continue
+            to_ids = [to_id for to_id in to_ids if to_id not in old_xmp_ids]
+            if to_ids:
+                references.append((ref_type, from_id, to_ids))
+    references.append((b"cdsc", new_id, [primary_id]))
+
+    def build_meta() -> bytes:
+        """metaを作成（iinf・iloc・irefを差し替え、ほかのボックスはそのまま）"""
+        parts = []
+        for box_type, start, _, end in children:
+            if box_type == b"iinf":
+                parts.append(iinf)
+            elif box_type == b"iloc":
+                parts.append(_build_iloc(version, sizes, locations))
+            elif box_type == b"iref":
+                parts.append(_build_iref(references))
+            else:
+                parts.append(meta[start:end])
+        if b"iref" not in found:
+            parts.append(_build_iref(references))
+        return _box(b"meta", meta[8:12] + b"".join(parts))
+
+    # metaより後ろのデータの位置は、metaの大きさが変わった分ずらす
+    delta = len(build_meta()) - meta_size
+    for location in locations:
+        if location is xmp_location or location.method != 0 or location.data_reference != 0:
+            continue
+        if location.base_offset >= meta_end:
+            location.base_offset += delta
+        elif location.base_offset == 0:
+            for extent in location.extents:
+                if extent[1] >= meta_end:
+                    extent[1] += delta
+    kept_size = sum(size for _, _, size in kept_boxes)
+    xmp_location.extents[0][1] = kept_size + delta + 8
+    new_meta = build_meta()
+
+    for box_type, start, size in kept_boxes:
+        if box_type == b"meta":
+            dst.write(new_meta)
+        else:
+            _copy_range(src, dst, start, size)
+    dst.write(_box(b"mdat", xmp))
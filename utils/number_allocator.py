@@ -0,0 +1,154 @@
+"""
+番号割り当てモジュール
+複数の端末（プロセス）が同じフォルダをリネームしても同じ番号を取り合わないよう、
+フォルダ内のロックファイルで排他制御し、番号の決定からリネームまでをロックを保持したまま行う
+- ペアの片方だけリネームされた番号（未完成の番号）は、どの端末が割り当てたかをフォルダ内の台帳に記録する
+- 未完成の番号は割り当てた端末だけが使う（他の端末の写真とペアにならない）
+"""
+import getpass
+import json
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+# フォルダ内のロックファイルと台帳のファイル名
+LOCK_FILE_NAME = ".picture_rename.lock"
+LEDGER_FILE_NAME = ".picture_rename_numbers.json"
+
+# ロックを待つ時間の上限（秒）と、取得を再試行する間隔（秒）
+LOCK_TIMEOUT = 10.0
+LOCK_RETRY_INTERVAL = 0.02
+
+
+class NumberLockTimeout(Exception):
+    """ロックを時間内に取得できなかった場合のエラー（他の端末がリネーム中）"""
+
+
+def default_owner() -> str:
+    """番号を割り当てる端末の識別子（ホスト名/ユーザー名。アプリを再起動しても同じ値）"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "unknown"
+    return f"{socket.gethostname()}/{user}"
+
+
+class FolderLock:
+    """フォルダ内のロックファイルによるプロセス間の排他ロック（with文で使用）"""
+
+    def __init__(self, folder: str, timeout: float = LOCK_TIMEOUT):
+        self.path = os.path.join(folder, LOCK_FILE_NAME)
+        self.timeout = timeout
+        self._file = None
+
+    def __enter__(self) -> "FolderLock":
+        self._file = open(self.path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._lock()
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    raise NumberLockTimeout(
+                        f"他の端末がリネーム中のため、番号を割り当てられませんでした（{self.timeout:.0f}秒待機）"
+                    )
+                time.sleep(LOCK_RETRY_INTERVAL)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._unlock()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _lock(self):
+        """ロックを取得（取得できない場合はOSError）"""
+        if os.name == 'nt':
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            # lockf（POSIXのレコードロック）はNFS・SMBの共有フォルダでも他のマシンとの間で有効
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(self):
+        """ロックを解放"""
+        if os.name == 'nt':
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+
+
+def load_open_numbers(folder: str) -> Dict[int, str]:
+    """台帳から未完成の番号 -> 割り当てた端末 を読み込み（台帳がない・壊れている場合は空）"""
+    try:
+        with open(os.path.join(folder, LEDGER_FILE_NAME), "r", encoding="utf-8") as f:
+            ledger = json.load(f)
+        return {int(number): str(owner) for number, owner in ledger.get("open", {}).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_open_numbers(folder: str, open_numbers: Dict[int, str]):
+    """台帳に未完成の番号を保存（書き込み途中で中断しても壊れないよう、一時ファイルから置き換える）"""
+    path = os.path.join(folder, LEDGER_FILE_NAME)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    ledger = {"open": {str(number): owner for number, owner in sorted(open_numbers.items())}}
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def allocate_numbers(number_counts: Dict[int, int], open_numbers: Dict[int, str], owner: str, count: int,
+                     start_number: Optional[int] = None,
+                     new_pair: bool = False) -> Tuple[List[int], Dict[int, str]]:
+    """
+    count枚のファイルに付けるペア番号（1, 1, 2, 2, 3, 3...）を決定
+    number_counts: フォルダ内の番号ごとのファイル数
+    open_numbers: 台帳の未完成の番号 -> 割り当てた端末
+    start_number: 最初のファイルに使う番号（手動番号）
+    new_pair: 未完成の番号を使わず、新しい番号から始める（撮影時刻でペアと推定した画像の1枚目）
+    戻り値: (番号の一覧, リネーム後の台帳の未完成の番号)
+    """
+    counts = dict(number_counts)
+    # 2枚そろった・ファイルがなくなった番号は台帳から除く
+    opened = {number: held_by for number, held_by in open_numbers.items() if counts.get(number, 0) == 1}
+
+    if start_number is not None:
+        current = start_number
+    else:
+        own = [number for number, held_by in opened.items() if held_by == owner]
+        top = max(counts) if counts else 0
+        if own and not new_pair:
+            # 自分の端末で1枚だけリネームした番号の2枚目
+            current = max(own)
+        elif not new_pair and top and counts[top] < 2 and top not in opened:
+            # 台帳にない未完成の番号（台帳の導入前・1台だけで作業したフォルダ）は従来どおり続けて使う
+            current = top
+        else:
+            current = top + 1
+
+    numbers = []
+    for _ in range(count):
+        # 2個そろった番号は次の番号に進む（自動の場合は他の端末の番号と重ならないよう最大の番号の次）
+        if numbers and counts.get(current, 0) >= 2:
+            current = current + 1 if start_number is not None else max(counts) + 1
+        numbers.append(current)
+        counts[current] = counts.get(current, 0) + 1
+
+    for number in set(numbers):
+        if counts[number] == 1:
+            opened[number] = owner
+        else:
+            opened.pop(number, None)
+    return numbers, opened
@@ -0,0 +1,181 @@
+"""
+出力処理モジュール
+リネームが確定したファイルに対する出力処理（派生画像の作成など）を、プロセスプールで順に実行するキュー
+- 投入は待ち行列への追加だけで、画面操作（画像の移動）を待たせない
+- 完了の確認と進捗（残り件数）の通知はafter()でメインスレッドから行う
+- ワーカーが異常終了した場合はプールを作り直し、実行中だった処理を1回だけやり直す
+"""
+import logging
+import os
+import time
+import tkinter as tk
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.preview_store import DEFAULT_CPU_SHARE, init_low_priority_worker
+
+logger = logging.getLogger(__name__)
+
+
+# 異常終了したワーカーで実行中だった処理をやり直す回数
+MAX_RETRIES = 1
+
+
+class OutputStage:
+    """出力処理のキュー（処理はプロセスプールで実行し、結果の反映はメインスレッドで行う）"""
+
+    # 完了を確認する間隔（ミリ秒）
+    POLL_INTERVAL_MS = 100
+
+    def __init__(self, widget: tk.Misc, name: str, task: Callable[..., object],
+                 on_progress: Optional[Callable[["OutputStage"], None]] = None,
+                 cpu_share: float = DEFAULT_CPU_SHARE,
+                 on_result: Optional[Callable[[object], None]] = None):
+        """
+        name: ログ・進捗の表示に使う名前
+        task: ワーカープロセスで実行する関数（モジュールの最上位に定義し、引数は投入時に渡す）
+        on_progress: 残り件数などが変わった時に呼び出すコールバック（メインスレッドで呼び出される）
+        on_result: 完了した処理の戻り値を受け取るコールバック（メインスレッドで呼び出される）
+        """
+        self.widget = widget
+        self.name = name
+        self.task = task
+        self.on_progress = on_progress
+        self.on_result = on_result
+        self.workers = max(1, int((os.cpu_count() or 1) * cpu_share))
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: List[Tuple[tuple, int]] = []  # 未投入の (引数, やり直した回数)
+        self._running: Dict[Future, Tuple[tuple, int]] = {}
+        self._after_id = None
+        self._draining = False  # 終了時に完了を待っている（after()での確認は行わない）
+        self.done_count = 0
+        self.failed_count = 0
+        self._busy_since = 0.0
+        self._busy_seconds = 0.0  # 処理中（キューが空でない）だった時間の合計
+
+    def backlog(self) -> int:
+        """未完了の件数（実行中を含む）"""
+        return len(self._queue) + len(self._running)
+
+    def throughput(self) -> float:
+        """処理中だった時間あたりの完了件数（件/秒）"""
+        seconds = self._busy_seconds + (time.perf_counter() - self._busy_since if self.backlog() else 0.0)
+        return self.done_count / seconds if seconds > 0 else 0.0
+
+    def submit(self, *args):
+        """処理を待ち行列に追加（ワーカープロセスへの投入は次の確認時に行う）"""
+        if not self.backlog():
+            self._busy_since = time.perf_counter()
+        self._queue.append((args, 0))
+        if self._after_id is None:
+            self._schedule_poll()
+        self._notify()
+
+    def drain(self):
+        """未完了の処理がすべて終わるまで待つ（アプリの終了時に使用。画面操作中には呼び出さない）"""
+        self._draining = True
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass  # ウィンドウが破棄された後でも完了を待つ
+            self._after_id = None
+        while self.backlog():
+            self._fill()
+            time.sleep(self.POLL_INTERVAL_MS / 1000)
+            self._poll()
+        self._draining = False
+        self.stop()
+
+    def stop(self):
+        """未完了の処理を破棄してプールを終了"""
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        if self._executor is not None:
+            self._shutdown_executor()
+        if self.backlog():
+            logger.warning(f"{self.name}の未完了の{self.backlog()}件を破棄しました")
+        self._queue = []
+        self._running = {}
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """ワーカープロセスのプールを作成"""
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_low_priority_worker)
+
+    def _shutdown_executor(self):
+        """未開始の処理を取り消してプールを終了（Python 3.8ではshutdownのcancel_futuresが使えない）"""
+        for future in self._running:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def _fill(self):
+        """実行中の数がワーカー数の2倍になるまで投入"""
+        if self._queue and self._executor is None:
+            self._executor = self._create_executor()
+        while self._queue and len(self._running) < self.workers * 2:
+            args, retries = self._queue.pop(0)
+            self._running[self._executor.submit(self.task, *args)] = (args, retries)
+
+    def _schedule_poll(self):
+        """完了の確認を予約"""
+        try:
+            self._after_id = self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+        except tk.TclError:
+            self.stop()  # ウィンドウが破棄された
+
+    def _poll(self):
+        """完了した処理を集計し、ワーカーが異常終了した場合はプールを作り直す"""
+        self._after_id = None
+        pool_broken = False
+        changed = False
+        for future in [future for future in self._running if future.done()]:
+            args, retries = self._running.pop(future)
+            changed = True
+            try:
+                result = future.result()
+                self.done_count += 1
+            except BrokenProcessPool:
+                pool_broken = True
+                if retries < MAX_RETRIES:
+                    self._queue.insert(0, (args, retries + 1))
+                else:
+                    logger.warning(f"{self.name}中にワーカープロセスが異常終了しました: {args[0]}")
+                    self.failed_count += 1
+            except Exception as e:
+                logger.warning(f"{self.name}に失敗しました: {args[0]} ({e})")
+                self.failed_count += 1
+            else:
+                if self.on_result:
+                    self.on_result(result)
+
+        if pool_broken:
+            self._queue[:0] = [(args, retries) for args, retries in self._running.values()]
+            self._shutdown_executor()
+            self._running = {}
+            logger.warning(f"{self.name}のワーカープロセスが異常終了したため、プールを再起動します")
+
+        self._fill()
+        if changed:
+            self._notify()
+
+        if self.backlog():
+            if not self._draining:
+                self._schedule_poll()
+        else:
+            self._busy_seconds += time.perf_counter() - self._busy_since
+            logger.debug(f"{self.name}完了 (累計{self.done_count}件, 失敗{self.failed_count}件, "
+                         f"{self.throughput():.1f}件/秒, ワーカー{self.workers})")
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _notify(self):
+        """進捗のコールバックを呼び出す"""
+        if self.on_progress and not self._draining:
+            self.on_progress(self)
@@ -0,0 +1,228 @@
+"""
+処理時間計測モジュール
+スキャン・デコード・リサイズ・PhotoImage変換・リネーム・マスター読み込み・入力検証などの処理時間を
+段階ごとにリングバッファへ記録し、p50/p95と1分あたりの処理枚数を集計する
+計測が無効の間は、計測用の処理はほぼ何もしない
+"""
+import functools
+import json
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+# 計測する段階
+STAGE_SCAN = "scan"
+STAGE_DECODE = "decode"
+STAGE_RESIZE = "resize"
+STAGE_PHOTOIMAGE = "photoimage"
+STAGE_NUMBER = "number"
+STAGE_RENAME = "rename"
+STAGE_MASTER_LOAD = "master_load"
+STAGE_VALIDATION = "validation"
+# ユーザー操作単位の段階
+STAGE_FIRST_IMAGE = "first_image"
+STAGE_APPLY_AND_NEXT = "apply_and_next"
+
+# 表示用の段階名（表示順）
+STAGE_LABELS = {
+    STAGE_SCAN: "フォルダスキャン",
+    STAGE_DECODE: "画像デコード",
+    STAGE_RESIZE: "リサイズ",
+    STAGE_PHOTOIMAGE: "PhotoImage変換",
+    STAGE_NUMBER: "連番の算出",
+    STAGE_RENAME: "リネーム",
+    STAGE_MASTER_LOAD: "マスター読み込み",
+    STAGE_VALIDATION: "入力検証",
+    STAGE_FIRST_IMAGE: "最初の画像表示",
+    STAGE_APPLY_AND_NEXT: "適用して次へ",
+}
+
+# ユーザーが待つ操作（プロファイルの要約で遅い順に表示する）
+USER_ACTION_STAGES = (STAGE_SCAN, STAGE_FIRST_IMAGE, STAGE_APPLY_AND_NEXT, STAGE_MASTER_LOAD)
+
+# 段階ごとに保持する直近の計測数
+RING_SIZE = 512
+
+# 1分あたりの処理枚数を求める期間（秒）
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+class _NullSpan:
+    """計測無効時に使用する何もしないコンテキストマネージャー"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """1回分の処理時間を計測するコンテキストマネージャー"""
+
+    __slots__ = ('tracer', 'stage', 'started')
+
+    def __init__(self, tracer: "Tracer", stage: str):
+        self.tracer = tracer
+        self.stage = stage
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.stage, time.perf_counter() - self.started, self.started)
+        return False
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """ソート済みの値からパーセンタイル（nearest-rank法）を取得"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Tracer:
+    """段階ごとの処理時間をリングバッファに記録するクラス（ワーカースレッドからも記録できる）"""
+
+    def __init__(self, ring_size: int = RING_SIZE):
+        self.enabled = False
+        self.ring_size = ring_size
+        self._started_at = time.perf_counter()
+        self._started_wall = time.time()
+        # 段階 -> (セッション開始からの秒数, 処理時間(秒)) の直近ring_size件
+        self._samples: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._counts: Dict[str, int] = {}
+        # 処理（リネーム）した画像の時刻
+        self._processed: Deque[float] = deque(maxlen=ring_size)
+        self._processed_count = 0
+        # 表示名 -> 現在の値を返す関数（処理時間以外の集計。パネルとJSONに表示する）
+        self._counters: Dict[str, Callable[[], str]] = {}
+
+    def span(self, stage: str):
+        """with文で処理時間を計測する（無効時は何もしないオブジェクトを返す）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def record(self, stage: str, duration: float, started: Optional[float] = None):
+        """処理時間（秒）を記録"""
+        if not self.enabled:
+            return
+        if started is None:
+            started = time.perf_counter() - duration
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples.setdefault(stage, deque(maxlen=self.ring_size))
+        samples.append((started - self._started_at, duration))
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def mark_image_processed(self):
+        """画像を1枚処理したことを記録（1分あたりの処理枚数の集計用）"""
+        if not self.enabled:
+            return
+        self._processed.append(time.perf_counter())
+        self._processed_count += 1
+
+    def register_counter(self, label: str, read: Callable[[], str]):
+        """処理時間以外の集計（間引きで省略した回数など）を登録（値は表示の時点で読み取る）"""
+        self._counters[label] = read
+
+    def counter_values(self) -> Dict[str, str]:
+        """登録された集計の現在の値"""
+        return {label: read() for label, read in list(self._counters.items())}
+
+    def reset(self):
+        """記録をすべて破棄して新しいセッションを開始"""
+        self._started_at = time.perf_counter()
+        self._started_wall = time.time()
+        self._samples = {}
+        self._counts = {}
+        self._processed = deque(maxlen=self.ring_size)
+        self._processed_count = 0
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """段階ごとの件数とp50/p95/最大（ミリ秒、直近ring_size件）を取得"""
+        stats = {}
+        for stage, samples in list(self._samples.items()):
+            durations = sorted(duration for _, duration in list(samples))
+            stats[stage] = {
+                'count': self._counts.get(stage, 0),
+                'p50_ms': _percentile(durations, 50) * 1000,
+                'p95_ms': _percentile(durations, 95) * 1000,
+                'max_ms': durations[-1] * 1000 if durations else 0.0,
+            }
+        return stats
+
+    def slowest_samples(self, stages, limit: int = 10) -> List[Tuple[str, float, float]]:
+        """指定した段階の記録から遅い順に (段階, 開始からの秒数, 処理時間(ミリ秒)) を取得"""
+        samples = [
+            (stage, offset, duration * 1000)
+            for stage in stages
+            for offset, duration in list(self._samples.get(stage, ()))
+        ]
+        samples.sort(key=lambda sample: sample[2], reverse=True)
+        return samples[:limit]
+
+    def images_per_minute(self) -> float:
+        """直近1分間（開始から1分未満の場合はその間）の1分あたりの処理枚数"""
+        now = time.perf_counter()
+        window = min(THROUGHPUT_WINDOW_SECONDS, now - self._started_at)
+        if window <= 0:
+            return 0.0
+        recent = sum(1 for processed_at in list(self._processed) if now - processed_at <= window)
+        return recent * 60.0 / window
+
+    def to_dict(self) -> Dict[str, object]:
+        """セッションの記録を辞書に変換（JSON出力用）"""
+        return {
+            'session_started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started_wall)),
+            'duration_seconds': round(time.perf_counter() - self._started_at, 3),
+            'images_processed': self._processed_count,
+            'images_per_minute': round(self.images_per_minute(), 2),
+            'stages': {
+                stage: {key: round(value, 3) for key, value in values.items()}
+                for stage, values in self.stage_stats().items()
+            },
+            'samples': {
+                stage: [[round(offset, 4), round(duration * 1000, 3)] for offset, duration in list(samples)]
+                for stage, samples in list(self._samples.items())
+            },
+            'counters': self.counter_values(),
+        }
+
+    def export_json(self, file_path: str):
+        """セッションの記録をJSONファイルに保存（samplesは [開始からの秒数, 処理時間(ミリ秒)]）"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+# アプリケーション全体で共有する計測オブジェクト
+tracer = Tracer()
+
+
+def span(stage: str):
+    """共有の計測オブジェクトで処理時間を計測する（with span(STAGE_...): の形で使用）"""
+    return tracer.span(stage)
+
+
+def traced(stage: str) -> Callable:
+    """関数全体の処理時間を計測するデコレーター"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with _Span(tracer, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
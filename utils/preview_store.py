@@ -0,0 +1,303 @@
+"""
+プレビュー先読みモジュール
+フォルダ選択後に、フォルダ内の画像のプレビュー（表示サイズに縮小した画像）を複数のプロセスで作成し、
+上限付きのプレビューストアに保持する。画像表示時はストアにあればデコードとリサイズを省略する
+プレビューを作成したワーカーで、縮小済みの画素から画質（ピンぼけ・露出）も判定する
+"""
+import logging
+import os
+import time
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from utils.bounded_decode import DEFAULT_MEMORY_BUDGET, decode_rgb, fit_size
+from utils.image_processor import ensure_heif_support
+from utils.quality_check import QualityResult, analyze_preview
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# プレビューストアの上限（バイト、800x480のRGBで1枚約1.1MB）
+DEFAULT_STORE_BYTES = 256 * 1024 * 1024
+
+# 先読みに使うCPUの割合（残りは画面操作用に空けておく）
+DEFAULT_CPU_SHARE = 0.5
+
+# ワーカープロセスの優先度を下げる量（nice値）
+WORKER_NICE = 10
+
+# ファイルの識別子（名前を変更しても同じ値になるよう、パスではなくinodeと更新日時・サイズを使う）
+FileKey = Tuple[int, int, int, int]
+
+
+def file_key(image_path: str) -> FileKey:
+    """画像ファイルの識別子を取得"""
+    return stat_key(os.stat(image_path))
+
+
+def stat_key(stat: os.stat_result) -> FileKey:
+    """os.statの結果からファイルの識別子を作成"""
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def init_low_priority_worker():
+    """ワーカープロセスの初期化（優先度を下げて画面操作を妨げない）"""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(WORKER_NICE)
+        except OSError:
+            pass
+
+
+def render_preview(image_path: str, max_size: Tuple[int, int],
+                   memory_budget: int = DEFAULT_MEMORY_BUDGET
+                   ) -> Tuple[FileKey, Tuple[int, int], bytes, QualityResult]:
+    """
+    ワーカープロセスで画像をプレビューサイズのRGBに縮小（ImageProcessorの表示と同じ縮小方法）
+    戻り値: (ファイルの識別子, 画像サイズ, RGBのバイト列, 画質の判定結果)
+    """
+    from PIL import Image
+    key = file_key(image_path)
+    ensure_heif_support(image_path)
+    with Image.open(image_path) as img:
+        preview = decode_rgb(img, fit_size(img.size, max_size), memory_budget)
+        return key, preview.size, preview.tobytes(), analyze_preview(preview)
+
+
+class PreviewStore:
+    """作成済みのプレビューを保持するクラス（合計サイズが上限を超えると古いものから破棄）"""
+
+    def __init__(self, max_bytes: int = DEFAULT_STORE_BYTES):
+        self.max_bytes = max_bytes
+        # (ファイルの識別子, 最大表示サイズ) -> (画像サイズ, RGBのバイト列)
+        self._entries: "OrderedDict[Tuple[FileKey, Tuple[int, int]], Tuple[Tuple[int, int], bytes]]" = OrderedDict()
+        self._total_bytes = 0
+        # ファイルの識別子 -> 画質の判定結果（小さいためプレビューを破棄しても残す）
+        self._quality: Dict[FileKey, QualityResult] = {}
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def put(self, key: FileKey, max_size: Tuple[int, int], size: Tuple[int, int], data: bytes,
+            quality: Optional[QualityResult] = None):
+        """プレビュー（と画質の判定結果）を追加"""
+        if quality is not None:
+            self._quality[key] = quality
+        entry_key = (key, max_size)
+        old = self._entries.pop(entry_key, None)
+        if old is not None:
+            self._total_bytes -= len(old[1])
+        self._entries[entry_key] = (size, data)
+        self._total_bytes += len(data)
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._total_bytes -= len(evicted)
+
+    def contains(self, key: FileKey, max_size: Tuple[int, int]) -> bool:
+        """プレビューが作成済みかチェック"""
+        return (key, max_size) in self._entries
+
+    def get(self, image_path: str, max_size: Tuple[int, int]) -> Optional["Image.Image"]:
+        """画像のプレビューを取得（未作成・ファイルが変更された場合はNone）"""
+        from PIL import Image
+        try:
+            entry_key = (file_key(image_path), max_size)
+        except OSError:
+            return None
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            self.miss_count += 1
+            return None
+        self._entries.move_to_end(entry_key)
+        self.hit_count += 1
+        size, data = entry
+        return Image.frombytes('RGB', size, data)
+
+    def get_quality(self, image_path: str) -> Optional[QualityResult]:
+        """画像の画質の判定結果を取得（未判定・ファイルが変更された場合はNone）"""
+        try:
+            return self._quality.get(file_key(image_path))
+        except OSError:
+            return None
+
+    def rekey(self, old_key: FileKey, new_key: FileKey):
+        """画素を変えずに書き換えたファイル（メタデータの埋め込みなど）のプレビューと画質の判定結果を引き継ぐ"""
+        for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == old_key]:
+            self._entries[(new_key, entry_key[1])] = self._entries.pop(entry_key)
+        if old_key in self._quality:
+            self._quality[new_key] = self._quality.pop(old_key)
+
+    def clear(self):
+        """すべてのプレビューと画質の判定結果を破棄"""
+        self._entries.clear()
+        self._quality.clear()
+        self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FolderWarmer:
+    """フォルダ内の画像のプレビューをプロセスプールで先読みするクラス（結果の反映はメインスレッドで行う）"""
+
+    # 完了を確認する間隔（ミリ秒）
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, widget: tk.Misc, store: PreviewStore,
+                 on_progress: Optional[Callable[[int, int], None]] = None,
+                 cpu_share: float = DEFAULT_CPU_SHARE, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        """
+        on_progress: 進捗（完了数, 総数）を受け取るコールバック（メインスレッドで呼び出される）
+        memory_budget: ワーカー1つが1枚のデコードに使うメモリの上限
+        """
+        self.widget = widget
+        self.store = store
+        self.on_progress = on_progress
+        self.workers = max(1, int((os.cpu_count() or 1) * cpu_share))
+        self.memory_budget = memory_budget
+
+        self.max_size: Tuple[int, int] = (0, 0)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: List[str] = []  # 未投入の画像（先頭から投入する）
+        self._running: Dict[Future, str] = {}
+        # ワーカーの異常終了時に実行中だった画像（原因を特定するため1つずつ作成し直す）
+        self._suspects: List[str] = []
+        self._isolating = False
+        self._total = 0
+        self._done = 0
+        self._failed = 0
+        self._started = 0.0
+        self._after_id = None
+
+    def is_running(self) -> bool:
+        """先読み中かチェック"""
+        return self._executor is not None
+
+    def start(self, image_files: List[str], max_size: Tuple[int, int], current_index: int = 0):
+        """先読みを開始（実行中の先読みは中止する）"""
+        self.stop()
+        self.max_size = max_size
+        self._queue = list(image_files)
+        self._suspects = []
+        self._isolating = False
+        self._total = len(self._queue)
+        self._done = 0
+        self._failed = 0
+        self._started = time.perf_counter()
+        self.set_current(current_index, image_files)
+        self._executor = self._create_executor()
+        self._fill()
+        self._schedule_poll()
+
+    def set_current(self, current_index: int, image_files: List[str]):
+        """現在の画像に近い順に先読みするよう並べ替え"""
+        if not self._queue:
+            return
+        position = {path: index for index, path in enumerate(image_files)}
+        # 同じ距離の場合は後ろ（次に表示する画像）を優先
+        self._queue.sort(key=lambda path: (abs(position.get(path, 0) - current_index),
+                                           position.get(path, 0) < current_index))
+
+    def stop(self):
+        """先読みを中止（作成中のプレビューは破棄する）"""
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        if self._executor is not None:
+            self._shutdown_executor()
+        self._running = {}
+        self._queue = []
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """ワーカープロセスのプールを作成"""
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_low_priority_worker)
+
+    def _shutdown_executor(self):
+        """未開始の作成を取り消してプールを終了（Python 3.8ではshutdownのcancel_futuresが使えない）"""
+        for future in self._running:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        self._executor = None
+    
+    def _fill(self):
+        """実行中の数がワーカー数の2倍になるまで画像を投入（残りは優先順位を変えられるよう手元に残す）"""
+        if self._suspects:
+            # 異常終了の原因の画像を特定するため、疑わしい画像は1つずつ作成する
+            while self._suspects and not self._running:
+                self._isolating = True
+                self._submit(self._suspects.pop(0))
+            return
+        self._isolating = False
+        while self._queue and len(self._running) < self.workers * 2:
+            self._submit(self._queue.pop(0))
+    
+    def _submit(self, image_path: str):
+        """画像をワーカープロセスに投入（作成済みの場合は投入しない）"""
+        try:
+            if self.store.contains(file_key(image_path), self.max_size):
+                self._done += 1
+                return
+        except OSError:
+            self._failed += 1
+            return
+        future = self._executor.submit(render_preview, image_path, self.max_size, self.memory_budget)
+        self._running[future] = image_path
+
+    def _schedule_poll(self):
+        """完了の確認を予約"""
+        try:
+            self._after_id = self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+        except tk.TclError:
+            self.stop()  # ウィンドウが破棄された
+
+    def _poll(self):
+        """完了したプレビューをストアに格納し、ワーカーが異常終了した場合はプールを作り直す"""
+        self._after_id = None
+        pool_broken = False
+        for future in [future for future in self._running if future.done()]:
+            image_path = self._running.pop(future)
+            try:
+                key, size, data, quality = future.result()
+            except BrokenProcessPool:
+                pool_broken = True
+                if self._isolating:
+                    # 1つだけ作成していた画像で異常終了した＝この画像が原因
+                    logger.warning(f"プレビューの作成中にワーカープロセスが異常終了しました: {os.path.basename(image_path)}")
+                    self._failed += 1
+                else:
+                    self._suspects.append(image_path)
+                continue
+            except Exception as e:
+                logger.warning(f"プレビューの作成に失敗しました: {os.path.basename(image_path)} ({e})")
+                self._failed += 1
+                continue
+            self.store.put(key, self.max_size, size, data, quality)
+            self._done += 1
+
+        if pool_broken:
+            # 実行中だった画像は、異常終了の原因かどうか分からないため1つずつ作成し直す
+            self._suspects.extend(self._running.values())
+            self._shutdown_executor()
+            self._running = {}
+            logger.warning("プレビュー作成のワーカープロセスが異常終了したため、プールを再起動します")
+            self._executor = self._create_executor()
+
+        self._fill()
+        if self.on_progress:
+            self.on_progress(self._done + self._failed, self._total)
+
+        if self._running or self._queue or self._suspects:
+            self._schedule_poll()
+        else:
+            elapsed = time.perf_counter() - self._started
+            logger.debug(f"プレビューの先読み完了 ({self._done}件, 失敗{self._failed}件, "
+                         f"{elapsed:.1f}秒, ワーカー{self.workers})")
+            self._executor.shutdown(wait=False)
+            self._executor = None
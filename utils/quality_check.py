@@ -0,0 +1,67 @@
+"""
+画質チェックモジュール
+プレビュー（表示サイズに縮小した画像）から、ピンぼけ（ラプラシアンの分散）と露出（白飛び・黒つぶれ）を判定する
+プレビューの先読みと同じワーカープロセスで、縮小済みの画素に対してNumPyでまとめて計算する
+"""
+from typing import TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+# 鮮明度（最も鮮明な領域のラプラシアンの分散）がこれ未満ならピンぼけの可能性あり（800x480のプレビューでの値）
+SHARPNESS_THRESHOLD = 100.0
+
+# 白飛び・黒つぶれとみなす画素の割合（白い背景で撮影した写真が常に該当しないよう大きめ）
+CLIPPING_THRESHOLD = 0.15
+
+# 白飛び・黒つぶれとみなす明るさ（0〜255）
+HIGHLIGHT_LEVEL = 250
+SHADOW_LEVEL = 5
+
+# 平均の明るさ（0〜255）がこれ未満なら露出不足
+DARK_MEAN = 45.0
+
+# 鮮明度を求める領域の分割数（縦横）。部品の周りの無地の背景で鮮明度が下がらないよう、最も鮮明な領域の値を使う
+GRID = 4
+
+# 判定結果（鮮明度, 白飛びの割合, 黒つぶれの割合, 平均の明るさ）
+QualityResult = Tuple[float, float, float, float]
+
+
+def analyze_preview(preview: "Image.Image") -> QualityResult:
+    """プレビューの鮮明度・白飛びと黒つぶれの割合・平均の明るさを計算"""
+    import numpy as np
+    gray = np.asarray(preview.convert('L'), dtype=np.float32)
+    height, width = gray.shape
+
+    # 4近傍のラプラシアン（端の1画素は除く）
+    laplacian = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+                 - 4 * gray[1:-1, 1:-1])
+    # 領域ごとの分散（割り切れない端の画素は除く）
+    cell_height, cell_width = (height - 2) // GRID, (width - 2) // GRID
+    if cell_height > 0 and cell_width > 0:
+        cells = laplacian[:cell_height * GRID, :cell_width * GRID].reshape(GRID, cell_height, GRID, cell_width)
+        sharpness = float(cells.var(axis=(1, 3)).max())
+    else:
+        sharpness = float(laplacian.var()) if laplacian.size else 0.0
+
+    pixels = gray.size
+    highlights = float(np.count_nonzero(gray >= HIGHLIGHT_LEVEL)) / pixels
+    shadows = float(np.count_nonzero(gray <= SHADOW_LEVEL)) / pixels
+    return (sharpness, highlights, shadows, float(gray.mean()))
+
+
+def quality_warnings(result: QualityResult) -> List[str]:
+    """判定結果から表示する注意の一覧（問題がない場合は空）"""
+    sharpness, highlights, shadows, mean = result
+    warnings = []
+    if sharpness < SHARPNESS_THRESHOLD:
+        warnings.append(f"ピンぼけの可能性（鮮明度 {sharpness:.0f}）")
+    if highlights >= CLIPPING_THRESHOLD:
+        warnings.append(f"白飛び {highlights * 100:.0f}%")
+    if shadows >= CLIPPING_THRESHOLD:
+        warnings.append(f"黒つぶれ {shadows * 100:.0f}%")
+    if mean < DARK_MEAN:
+        warnings.append(f"露出不足（平均の明るさ {mean:.0f}）")
+    return warnings
@@ -0,0 +1,265 @@
+"""
+リネーム履歴モジュール
+確定したリネーム（部品名・重量・単位・素材ID・加工ID・写真区分・パス）をローカルのSQLiteに記録し、
+部品名・重量の入力候補（使用回数と最近の使用で順位付け）と、過去の作業の全文検索（FTS5）を提供する
+- 入力候補は値ごとに集計した表を正規化済みの文字列の索引で前方一致検索する（履歴の行数によらず一定の時間）
+- 使用回数と最近の使用は、使用ごとに半減期で重み付けした合計（対数で保持）の1つの値で順位付けする
+"""
+import logging
+import math
+import os
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Tuple
+from utils.search_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+# 履歴のデータベース
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".picture_rename", "history.sqlite3")
+
+# 入力候補の最大件数
+SUGGESTION_LIMIT = 10
+
+# 最近の使用を重視する度合い（この日数前の使用は、今日の使用の半分の重みになる）
+RECENCY_HALF_LIFE_DAYS = 30.0
+_DECAY_PER_SECOND = math.log(2) / (RECENCY_HALF_LIFE_DAYS * 24 * 60 * 60)
+
+# 入力候補の種類
+FIELD_PART_NAME = "part_name"
+FIELD_WEIGHT = "weight"
+
+# 前方一致の範囲の上限に付ける文字
+_PREFIX_END = "\U0010ffff"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS renames (
+    id INTEGER PRIMARY KEY,
+    renamed_at REAL NOT NULL,
+    path TEXT NOT NULL,
+    part_name TEXT NOT NULL,
+    weight TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    material_id TEXT NOT NULL,
+    processing_id TEXT NOT NULL,
+    photo_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renames_renamed_at ON renames (renamed_at);
+CREATE TABLE IF NOT EXISTS suggestions (
+    field TEXT NOT NULL,
+    context TEXT NOT NULL,
+    value TEXT NOT NULL,
+    search_key TEXT NOT NULL,
+    uses INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (field, context, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS suggestions_prefix ON suggestions (field, context, search_key);
+CREATE INDEX IF NOT EXISTS suggestions_score ON suggestions (field, context, score);
+"""
+
+# 全文検索の索引の分割方式（SQLite 3.34以降。部分一致で日本語の部品名も検索できる）
+# unicode61などの単語単位の分割では日本語の部分一致を検索できないため、trigramが使えない場合は索引を作らない
+_FTS_TOKENIZER = "trigram"
+
+
+class HistoryEntry:
+    """リネーム履歴の1行"""
+
+    __slots__ = ('renamed_at', 'path', 'part_name', 'weight', 'unit', 'material_id', 'processing_id',
+                 'photo_type')
+
+    def __init__(self, renamed_at: float, path: str, part_name: str, weight: str, unit: str,
+                 material_id: str, processing_id: str, photo_type: str):
+        self.renamed_at = renamed_at
+        self.path = path
+        self.part_name = part_name
+        self.weight = weight
+        self.unit = unit
+        self.material_id = material_id
+        self.processing_id = processing_id
+        self.photo_type = photo_type
+
+    def summary(self) -> str:
+        """表示用の1行"""
+        renamed_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.renamed_at))
+        return (f"{renamed_at}  {self.part_name}  {self.weight}{self.unit}  {self.material_id}  "
+                f"{self.processing_id}  {self.photo_type}  {self.path}")
+
+
+def _frecency(score: Optional[float], used_at: float) -> float:
+    """使用回数と最近の使用を合わせた順位の値（使用ごとの重み 2^(使用日時/半減期) の合計の対数）に1回分を加える"""
+    weight = used_at * _DECAY_PER_SECOND
+    if score is None:
+        return weight
+    high, low = max(score, weight), min(score, weight)
+    return high + math.log1p(math.exp(low - high))
+
+
+class RenameHistory:
+    """リネーム履歴のデータベース（最初に使用した時点で開く。メインスレッドから使用する）"""
+
+    def __init__(self, db_path: str = DEFAULT_HISTORY_PATH):
+        self.db_path = db_path
+        self._connection: Optional[sqlite3.Connection] = None
+        self.fts_enabled = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """データベースを開く（初回は表と索引を作成）"""
+        if self._connection is not None:
+            return self._connection
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        # WALでは確定のたびにディスクへの書き込み完了を待たない（電源断時も直前の数件が失われるだけ）
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        self.fts_enabled = self._create_fts(connection)
+        connection.commit()
+        self._connection = connection
+        return connection
+
+    def _create_fts(self, connection: sqlite3.Connection) -> bool:
+        """全文検索の索引を作成（FTS5のtrigramが使えない環境では作成せず、検索は部分一致の走査で行う）"""
+        row = connection.execute("SELECT sql FROM sqlite_master WHERE name = 'renames_fts'").fetchone()
+        if row:
+            if f"tokenize='{_FTS_TOKENIZER}'" in row[0]:
+                return True
+            # trigram以外で作成した索引（以前のバージョン）は、日本語を検索できないため削除する
+            connection.execute("DROP TABLE renames_fts")
+        try:
+            connection.execute(
+                "CREATE VIRTUAL TABLE renames_fts USING fts5("
+                "part_name, weight, material_id, processing_id, path, "
+                f"content='renames', content_rowid='id', tokenize='{_FTS_TOKENIZER}')"
+            )
+            # 索引の導入前に記録された履歴も検索できるようにする
+            connection.execute("INSERT INTO renames_fts (renames_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"全文検索の索引（{_FTS_TOKENIZER}）を作成できませんでした: {e}")
+        return False
+
+    def close(self):
+        """データベースを閉じる"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def record(self, renamed: Iterable[Tuple[str, str]], part_name: str, weight: str, unit: str,
+               material_id: str, processing_id: str, renamed_at: Optional[float] = None):
+        """
+        確定したリネームを記録（1回のトランザクションでまとめて記録する）
+        renamed: (リネーム後のパス, 写真区分) の一覧
+        """
+        renamed_at = time.time() if renamed_at is None else renamed_at
+        connection = self._connect()
+        with connection:
+            for path, photo_type in renamed:
+                cursor = connection.execute(
+                    "INSERT INTO renames (renamed_at, path, part_name, weight, unit, material_id, processing_id, "
+                    "photo_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (renamed_at, path, part_name, weight, unit, material_id, processing_id, photo_type)
+                )
+                if self.fts_enabled:
+                    connection.execute(
+                        "INSERT INTO renames_fts (rowid, part_name, weight, material_id, processing_id, path) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (cursor.lastrowid, part_name, weight, material_id, processing_id, path)
+                    )
+                # 重量は部品名ごとの候補と、部品名によらない候補の両方に記録する
+                self._use(connection, FIELD_PART_NAME, "", part_name, renamed_at)
+                self._use(connection, FIELD_WEIGHT, normalize_text(part_name), weight, renamed_at)
+                self._use(connection, FIELD_WEIGHT, "", weight, renamed_at)
+
+    def _use(self, connection: sqlite3.Connection, field: str, context: str, value: str, used_at: float):
+        """入力候補の使用回数と順位の値を更新"""
+        if not value:
+            return
+        row = connection.execute(
+            "SELECT uses, score FROM suggestions WHERE field = ? AND context = ? AND value = ?",
+            (field, context, value)
+        ).fetchone()
+        uses, score = row if row else (0, None)
+        connection.execute(
+            "INSERT OR REPLACE INTO suggestions (field, context, value, search_key, uses, last_used, score) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (field, context, value, normalize_text(value), uses + 1, used_at, _frecency(score, used_at))
+        )
+
+    def _suggest(self, field: str, context: str, prefix: str, limit: int) -> List[str]:
+        """入力候補を前方一致で検索（順位の値の高い順）"""
+        key = normalize_text(prefix)
+        connection = self._connect()
+        if key:
+            rows = connection.execute(
+                "SELECT value FROM suggestions WHERE field = ? AND context = ? "
+                "AND search_key >= ? AND search_key < ? ORDER BY score DESC LIMIT ?",
+                (field, context, key, key + _PREFIX_END, limit)
+            )
+        else:
+            rows = connection.execute(
+                "SELECT value FROM suggestions WHERE field = ? AND context = ? ORDER BY score DESC LIMIT ?",
+                (field, context, limit)
+            )
+        return [value for value, in rows]
+
+    def suggest_part_names(self, prefix: str, limit: int = SUGGESTION_LIMIT) -> List[str]:
+        """部品名の入力候補"""
+        if not prefix.strip():
+            return []
+        return self._suggest(FIELD_PART_NAME, "", prefix, limit)
+
+    def suggest_weights(self, part_name: str, prefix: str, limit: int = SUGGESTION_LIMIT) -> List[str]:
+        """重量の入力候補（その部品名で使った重量を先に、残りは部品名によらない候補）"""
+        suggestions = self._suggest(FIELD_WEIGHT, normalize_text(part_name), prefix, limit) if part_name else []
+        if len(suggestions) < limit and prefix.strip():
+            suggestions += [value for value in self._suggest(FIELD_WEIGHT, "", prefix, limit)
+                            if value not in suggestions][:limit - len(suggestions)]
+        return suggestions
+
+    def search(self, query: str, limit: int = 100) -> List[HistoryEntry]:
+        """過去のリネームを部品名・重量・素材ID・加工ID・パスで検索（新しい順）"""
+        connection = self._connect()
+        columns = ("renamed_at, path, part_name, weight, unit, material_id, processing_id, photo_type")
+        query = query.strip()
+        if not query:
+            rows = connection.execute(
+                f"SELECT {columns} FROM renames ORDER BY id DESC LIMIT ?", (limit,)
+            )
+        elif self.fts_enabled and len(query) >= 3:
+            # 語句として検索する（"は2つ重ねてエスケープ）。trigramは3文字以上で索引を使える
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = connection.execute(
+                f"SELECT {columns} FROM renames WHERE id IN "
+                "(SELECT rowid FROM renames_fts WHERE renames_fts MATCH ? ORDER BY rowid DESC LIMIT ?) "
+                "ORDER BY id DESC",
+                (phrase, limit)
+            )
+        else:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = connection.execute(
+                f"SELECT {columns} FROM renames WHERE part_name LIKE ? ESCAPE '\\' OR weight LIKE ? ESCAPE '\\' "
+                "OR material_id LIKE ? ESCAPE '\\' OR processing_id LIKE ? ESCAPE '\\' "
+                "OR path LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT ?",
+                (pattern, pattern, pattern, pattern, pattern, limit)
+            )
+        return [HistoryEntry(*row) for row in rows]
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM renames").fetchone()[0]
+
+
+def print_history_search(query: str, db_path: str = DEFAULT_HISTORY_PATH, limit: int = 100):
+    """過去のリネームを検索して表示（--search-history用）"""
+    history = RenameHistory(db_path)
+    started = time.perf_counter()
+    entries = history.search(query, limit)
+    elapsed = time.perf_counter() - started
+    for entry in entries:
+        print(entry.summary())
+    print(f"{len(entries)}件（{elapsed * 1000:.1f}ms、履歴 {len(history)}件）")
+    history.close()
@@ -0,0 +1,116 @@
+"""
+検索インデックスモジュール
+マスターデータの名称・説明・IDに対する前方一致／部分一致検索（インクリメンタルサーチ用）を提供
+"""
+import bisect
+import unicodedata
+from typing import Iterable, List, Tuple
+
+
+# カタカナ -> ひらがな の変換テーブル（ァ..ヶ -> ぁ..ゖ）
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+# フィールド・エントリを連結するときの区切り文字（検索語にまたがって一致しないようにする）
+_FIELD_SEPARATOR = "\x00"
+
+
+def normalize_text(text: str) -> str:
+    """
+    検索用に文字列を正規化
+    全角/半角（NFKC）・カタカナ/ひらがな・大文字/小文字の違いを吸収する
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return text.translate(_KATAKANA_TO_HIRAGANA).casefold().strip()
+
+
+class SearchIndex:
+    """前方一致（ソート済み配列の二分探索）と部分一致（連結文字列の走査）による検索インデックス"""
+
+    def __init__(self):
+        self._values: List[str] = []  # エントリ番号 -> 表示値
+        self._sorted_fields: List[Tuple[str, int]] = []  # (正規化済みフィールド, エントリ番号) の昇順
+        self._parts: List[str] = []  # 連結前の正規化済み検索対象文字列
+        self._text = ""  # 全エントリの検索対象文字列を区切り文字で連結したもの
+        self._offsets: List[int] = []  # エントリ番号 -> self._text 内の開始位置
+        self._prepared = True
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value: str, fields: Iterable[str]):
+        """エントリを追加（value: 検索結果として返す値、fields: 検索対象の文字列）"""
+        entry = len(self._values)
+        normalized = [normalize_text(field) for field in fields if field]
+
+        self._values.append(value)
+        self._parts.append(_FIELD_SEPARATOR.join(normalized))
+        for field in normalized:
+            self._sorted_fields.append((field, entry))
+        self._prepared = False
+
+    def prepare(self):
+        """検索用の配列を構築（読み込み処理側で呼び出しておくと初回検索が遅くならない）"""
+        if self._prepared:
+            return
+        self._sorted_fields.sort()
+        offsets = []
+        position = 0
+        for part in self._parts:
+            offsets.append(position)
+            position += len(part) + 1
+        self._offsets = offsets
+        self._text = _FIELD_SEPARATOR.join(self._parts)
+        self._prepared = True
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """
+        検索語に一致する値を最大limit件返す
+        順位: フィールドの完全一致 > 前方一致（辞書順） > 部分一致（登録順）
+        """
+        query = normalize_text(query)
+        if not query:
+            return self._values[:limit]
+
+        self.prepare()
+        exact: List[int] = []
+        prefix: List[int] = []
+        seen = set()
+
+        # 前方一致（完全一致を含む）は二分探索で範囲を取り出す
+        position = bisect.bisect_left(self._sorted_fields, (query, -1))
+        scan_limit = limit * 4
+        while position < len(self._sorted_fields) and scan_limit > 0:
+            field, entry = self._sorted_fields[position]
+            if not field.startswith(query):
+                break
+            if entry not in seen:
+                seen.add(entry)
+                (exact if field == query else prefix).append(entry)
+            position += 1
+            scan_limit -= 1
+
+        results = exact + prefix
+        if len(results) < limit:
+            results.extend(self._substring_matches(query, limit - len(results), seen))
+
+        return [self._values[entry] for entry in results[:limit]]
+
+    def _substring_matches(self, query: str, limit: int, exclude: set) -> List[int]:
+        """連結文字列をstr.findで走査し、部分一致するエントリを登録順に取り出す"""
+        matches = []
+        text = self._text
+        offsets = self._offsets
+        position = text.find(query)
+        while position >= 0:
+            entry = bisect.bisect_right(offsets, position) - 1
+            if entry not in exclude:
+                exclude.add(entry)
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+            # 同じエントリ内の2件目以降の一致は飛ばして次のエントリから探す
+            next_entry = entry + 1
+            if next_entry >= len(offsets):
+                break
+            position = text.find(query, offsets[next_entry])
+        return matches
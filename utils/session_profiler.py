@@ -0,0 +1,173 @@
+"""
+セッションプロファイルモジュール
+アプリケーションの起動から終了までをcProfile（またはサンプリング）で記録し、
+終了時に呼び出しグラフの統計と、ユーザー操作の遅い順の要約をファイルに出力する
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from utils.perf_trace import STAGE_LABELS, USER_ACTION_STAGES, tracer
+
+
+# プロファイルの保存先
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".picture_rename", "profiles")
+
+# プロファイルの方式
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLING = "sampling"
+
+# サンプリング方式でスタックを取得する間隔（秒）
+SAMPLING_INTERVAL = 0.005
+
+# 要約に表示する関数の数
+SUMMARY_FUNCTION_LIMIT = 40
+
+
+class _StackSampler:
+    """メインスレッドのスタックを一定間隔で取得し、同じスタックの出現回数を数えるクラス"""
+
+    def __init__(self, interval: float = SAMPLING_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.sample_count = 0
+        self._main_thread_id = threading.main_thread().ident
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """サンプリングスレッドを開始"""
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """サンプリングを停止"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        """サンプリングスレッド本体"""
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self._main_thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.sample_count += 1
+
+    def write_collapsed(self, file_path: str):
+        """スタックを「関数;関数;... 回数」の形式（フレームグラフ用）で保存"""
+        with open(file_path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def function_summary(self, limit: int, elapsed: float) -> List[str]:
+        """
+        関数ごとの処理時間（自身のみと、呼び出し先を含む時間）を多い順に取得
+        サンプルの間隔は処理が重いと延びるため、時間は記録時間全体に対するサンプル数の割合から求める
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            names = stack.split(";")
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+
+        seconds_per_sample = elapsed / self.sample_count if self.sample_count else 0.0
+        lines = [f"{'呼び出し先を含む':>16}{'自身':>8}  関数"]
+        for name, count in total.most_common(limit):
+            lines.append(f"{count * seconds_per_sample:>15.2f}s{own[name] * seconds_per_sample:>7.2f}s  {name}")
+        return lines
+
+
+class SessionProfiler:
+    """1回の起動から終了までのプロファイルを記録するクラス"""
+
+    def __init__(self, output_dir: str = DEFAULT_PROFILE_DIR, mode: str = MODE_CPROFILE):
+        self.output_dir = output_dir
+        self.mode = mode
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._started = 0.0
+
+    def start(self):
+        """記録を開始（処理時間の計測も有効にする）"""
+        tracer.reset()
+        tracer.enabled = True
+        self._started = time.perf_counter()
+        if self.mode == MODE_SAMPLING:
+            self._sampler = _StackSampler()
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> str:
+        """記録を終了してファイルに出力し、要約ファイルのパスを返す"""
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        elapsed = time.perf_counter() - self._started
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base_path = os.path.join(self.output_dir, time.strftime("profile_%Y%m%d_%H%M%S"))
+
+        lines = [
+            f"記録時間: {elapsed:.1f}秒 / 方式: {self.mode}",
+            f"Python {sys.version.split()[0]} / {sys.platform}",
+            "",
+        ]
+        lines.extend(self._action_summary())
+        lines.append("")
+
+        if self._profile is not None:
+            # 呼び出しグラフ（呼び出し元・呼び出し先を含む）はpstatsで読み込める形式で保存
+            self._profile.dump_stats(base_path + ".prof")
+            lines.append(f"呼び出しグラフ: {base_path}.prof（python -m pstats で表示できます）")
+            lines.append("※ cProfileはメインスレッドのみを記録します（マスター読み込みの解析処理は含まれません）")
+            lines.append("")
+            stream = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=stream)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(SUMMARY_FUNCTION_LIMIT)
+            lines.append(stream.getvalue())
+        else:
+            self._sampler.write_collapsed(base_path + ".stacks.txt")
+            lines.append(f"スタック（フレームグラフ形式）: {base_path}.stacks.txt")
+            lines.append(f"サンプル数: {self._sampler.sample_count}（目標{self._sampler.interval * 1000:.0f}ms間隔）")
+            lines.append("")
+            lines.extend(self._sampler.function_summary(SUMMARY_FUNCTION_LIMIT, elapsed))
+
+        tracer.export_json(base_path + ".trace.json")
+        summary_path = base_path + ".summary.txt"
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
+        return summary_path
+
+    def _action_summary(self) -> List[str]:
+        """ユーザー操作の処理時間の集計と、遅かった操作の一覧"""
+        stats = tracer.stage_stats()
+        lines = ["■ ユーザー操作の処理時間", f"{'操作':<12}{'回数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'最大(ms)':>10}"]
+        for stage in USER_ACTION_STAGES:
+            values = stats.get(stage)
+            if values:
+                lines.append(
+                    f"{STAGE_LABELS[stage]:<12}{values['count']:>6}{values['p50_ms']:>10.1f}"
+                    f"{values['p95_ms']:>10.1f}{values['max_ms']:>10.1f}"
+                )
+        lines.append("")
+        lines.append("■ 遅かった操作（遅い順）")
+        for stage, offset, duration_ms in tracer.slowest_samples(USER_ACTION_STAGES):
+            lines.append(f"{duration_ms:>10.1f}ms  {STAGE_LABELS[stage]}（開始から{offset:.1f}秒）")
+        return lines
@@ -0,0 +1,140 @@
+"""
+メインスレッド停止検出モジュール
+Tkのイベントループにafter()で定期的にハートビートを送り、監視スレッドで遅延を確認する
+一定時間以上応答がない場合はメインスレッドのスタックと実行中の操作をログに記録する
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import tkinter as tk
+from contextlib import contextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ハートビートの間隔（ミリ秒）
+HEARTBEAT_INTERVAL_MS = 100
+
+# 停止とみなす遅延（ミリ秒）
+STALL_THRESHOLD_MS = 500
+
+# 停止ログの保存先
+DEFAULT_LOG_PATH = os.path.join(os.path.expanduser("~"), ".picture_rename", "stall.log")
+
+# ダイアログ表示中（ユーザーの操作待ち）は停止として扱わない
+_DIALOG_MODULES = {"messagebox.py", "filedialog.py", "commondialog.py", "simpledialog.py"}
+
+
+def _is_waiting_for_dialog(frame) -> bool:
+    """スタックにtkinterのダイアログ表示が含まれるかチェック"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if os.path.basename(filename) in _DIALOG_MODULES and "tkinter" in filename:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class StallWatchdog:
+    """Tkのイベントループの停止を検出してログに記録するクラス"""
+
+    def __init__(self, widget: tk.Misc, threshold_ms: int = STALL_THRESHOLD_MS,
+                 heartbeat_ms: int = HEARTBEAT_INTERVAL_MS, log_path: str = DEFAULT_LOG_PATH):
+        self.widget = widget
+        self.threshold = threshold_ms / 1000
+        self.heartbeat_ms = heartbeat_ms
+        self.log_path = log_path
+        self.stall_count = 0
+
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._operations: List[str] = []  # 実行中の操作（入れ子の場合は外側から順）
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._after_id = None
+
+    def start(self):
+        """ハートビートと監視スレッドを開始"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._last_beat = time.monotonic()
+        self._after_id = self.widget.after(self.heartbeat_ms, self._heartbeat)
+        self._thread = threading.Thread(target=self._monitor, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """監視を停止"""
+        self._stop_event.set()
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._thread = None
+
+    @contextmanager
+    def operation(self, name: str):
+        """with文の間、実行中の操作として記録する（停止時のログに出力される）"""
+        self._operations.append(name)
+        try:
+            yield
+        finally:
+            self._operations.pop()
+
+    def _heartbeat(self):
+        """メインスレッドで定期的に実行され、最後に応答した時刻を更新"""
+        self._last_beat = time.monotonic()
+        if self._stop_event.is_set():
+            return
+        try:
+            self._after_id = self.widget.after(self.heartbeat_ms, self._heartbeat)
+        except tk.TclError:
+            self._stop_event.set()  # ウィンドウが破棄された
+
+    def _monitor(self):
+        """監視スレッド本体（停止を検出したらスタックを取得し、再開した時点でログに記録する）"""
+        interval = self.heartbeat_ms / 1000
+        stalled_beat = None  # 停止を検出した時点の最後のハートビート時刻
+        stall_stack = ""
+        stall_operation = ""
+
+        while not self._stop_event.wait(interval / 2):
+            beat = self._last_beat
+            if stalled_beat is not None:
+                if beat != stalled_beat:
+                    # ハートビートが再開した＝停止が終わった
+                    duration = beat - stalled_beat - interval
+                    self._write_log(duration, stall_operation, stall_stack)
+                    stalled_beat = None
+                continue
+
+            if time.monotonic() - beat - interval < self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self._main_thread_id)
+            if frame is None or _is_waiting_for_dialog(frame):
+                continue
+            stalled_beat = beat
+            stall_stack = "".join(traceback.format_stack(frame))
+            stall_operation = " > ".join(self._operations) or "(不明)"
+            del frame
+
+    def _write_log(self, duration: float, operation: str, stack: str):
+        """停止の情報をログファイルに追記"""
+        self.stall_count += 1
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        logger.warning(f"メインスレッドが{duration * 1000:.0f}ms停止しました (操作: {operation})")
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(f"=== {timestamp} 停止 {duration * 1000:.0f}ms / 操作: {operation}\n")
+                f.write(stack)
+                f.write("\n")
+        except OSError as e:
+            logger.warning(f"停止ログの書き込みに失敗しました: {e}")
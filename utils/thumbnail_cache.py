@@ -0,0 +1,203 @@
+"""
+サムネイルキャッシュモジュール
+ワーカースレッドでサムネイルを作成し、上限付きのキャッシュ（LRU）に保持する
+作成の要求は最新の要求（表示中の範囲）で置き換えられ、スクロールで見えなくなった画像は作成しない
+"""
+import logging
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from utils.image_processor import ensure_heif_support
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# サムネイルのサイズ（幅, 高さ）
+THUMBNAIL_SIZE = (96, 72)
+
+# サムネイルの背景色（余白部分と透明部分）
+THUMBNAIL_BACKGROUND = (241, 245, 249)
+
+# キャッシュに保持するサムネイルの最大数（96x72のRGBで1枚約20KB）
+MAX_CACHE_ENTRIES = 1000
+
+# サムネイルを作成するワーカースレッドの数
+THUMBNAIL_WORKERS = 2
+
+
+def make_thumbnail(image_path: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> "Image.Image":
+    """画像を縮小し、指定サイズの背景の中央に配置したRGB画像を作成（どの画像も同じサイズになる）"""
+    from PIL import Image
+    ensure_heif_support(image_path)
+    with Image.open(image_path) as img:
+        # JPEGは縮小して読み込む（デコード量が1/2〜1/8になる）
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
+        img.thumbnail(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        thumbnail = Image.new('RGB', size, THUMBNAIL_BACKGROUND)
+        offset = ((size[0] - img.width) // 2, (size[1] - img.height) // 2)
+        if img.mode == 'RGBA':
+            thumbnail.paste(img, offset, mask=img.split()[-1])
+        else:
+            thumbnail.paste(img, offset)
+        return thumbnail
+
+
+class ThumbnailCache:
+    """サムネイルの作成（ワーカースレッド）とキャッシュを管理するクラス"""
+
+    # 作成結果を確認する間隔（ミリ秒）
+    POLL_INTERVAL_MS = 30
+
+    def __init__(self, widget: tk.Misc, on_ready: Callable[[str], None],
+                 size: Tuple[int, int] = THUMBNAIL_SIZE, max_entries: int = MAX_CACHE_ENTRIES,
+                 workers: int = THUMBNAIL_WORKERS):
+        """
+        on_ready: サムネイルが作成された時にメインスレッドで呼び出される（引数は画像パス）
+        """
+        self.widget = widget
+        self.on_ready = on_ready
+        self.size = size
+        self.max_entries = max_entries
+        self.worker_count = workers
+
+        self._cache: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self._failed: Dict[str, bool] = {}  # 作成に失敗した画像（再試行しない）
+        self._pending: List[str] = []  # 作成待ち（先頭から作成する）
+        self._in_progress: Dict[str, bool] = {}
+        self._generation = 0  # clear()で増やし、古い作成結果を破棄する
+        self._condition = threading.Condition()
+        self._results: "queue.Queue" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._after_id = None
+        self._closed = False
+
+    def get(self, image_path: str) -> Optional["Image.Image"]:
+        """キャッシュ済みのサムネイルを取得（未作成の場合はNone）"""
+        thumbnail = self._cache.get(image_path)
+        if thumbnail is not None:
+            self._cache.move_to_end(image_path)
+        return thumbnail
+
+    def has_failed(self, image_path: str) -> bool:
+        """サムネイルの作成に失敗した画像かチェック"""
+        return image_path in self._failed
+
+    def request(self, image_paths: List[str]):
+        """
+        サムネイルの作成を要求（指定順に作成する）
+        前回の要求のうち、まだ作成を開始していないものは取り消される
+        """
+        with self._condition:
+            self._pending = [
+                path for path in image_paths
+                if path not in self._cache and path not in self._failed and path not in self._in_progress
+            ]
+            if not self._pending:
+                return
+            self._condition.notify_all()
+        self._start_workers()
+        self._schedule_poll()
+
+    def rename(self, old_path: str, new_path: str):
+        """画像ファイルの名前が変わった場合にキャッシュを引き継ぐ"""
+        thumbnail = self._cache.pop(old_path, None)
+        if thumbnail is not None:
+            self._cache[new_path] = thumbnail
+
+    def clear(self):
+        """キャッシュと作成待ちをすべて破棄（フォルダを変更した場合など）"""
+        with self._condition:
+            self._generation += 1
+            self._pending = []
+            self._in_progress = {}
+        self._cache.clear()
+        self._failed.clear()
+
+    def close(self):
+        """ワーカースレッドを終了"""
+        with self._condition:
+            self._closed = True
+            self._pending = []
+            self._condition.notify_all()
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+    def _start_workers(self):
+        """ワーカースレッドを起動（初回のみ）"""
+        if self._threads:
+            return
+        for number in range(self.worker_count):
+            thread = threading.Thread(target=self._worker, name=f"Thumbnail-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        """ワーカースレッド本体（作成待ちの先頭から順にサムネイルを作成）"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                image_path = self._pending.pop(0)
+                self._in_progress[image_path] = True
+                generation = self._generation
+
+            try:
+                thumbnail = make_thumbnail(image_path, self.size)
+            except Exception as e:
+                logger.warning(f"サムネイルの作成に失敗しました: {os.path.basename(image_path)} ({e})")
+                thumbnail = None
+            self._results.put((generation, image_path, thumbnail))
+
+    def _schedule_poll(self):
+        """作成結果の確認を予約"""
+        if self._after_id is None and not self._closed:
+            try:
+                self._after_id = self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+            except tk.TclError:
+                pass  # ウィンドウが破棄された
+
+    def _poll(self):
+        """作成結果をキャッシュに格納し、メインスレッドでon_readyを呼び出す"""
+        self._after_id = None
+        ready = []
+        try:
+            while True:
+                generation, image_path, thumbnail = self._results.get_nowait()
+                with self._condition:
+                    if generation != self._generation:
+                        continue
+                    self._in_progress.pop(image_path, None)
+                if thumbnail is None:
+                    self._failed[image_path] = True
+                else:
+                    self._cache[image_path] = thumbnail
+                    if len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+                ready.append(image_path)
+        except queue.Empty:
+            pass
+
+        for image_path in ready:
+            self.on_ready(image_path)
+
+        with self._condition:
+            busy = bool(self._pending or self._in_progress)
+        if busy or not self._results.empty():
+            self._schedule_poll()
@@ -0,0 +1,98 @@
+"""
+タイルピラミッドモジュール
+画像を 1/1, 1/2, 1/4, 1/8 ... の縮小段階（レベル）ごとにデコードし、表示範囲のタイルだけを切り出す
+JPEGの縮小段階は縮小デコード（draft）で直接作成するため、等倍以外では全画素をデコードしない
+等倍（レベル0）は画像全体をデコードする（Pillowには範囲を指定したデコードがないため、
+表示範囲のタイルだけを読むことはできない。1度デコードすれば、スクロールしてもデコードし直さない）
+"""
+import math
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Tuple
+from utils.bounded_decode import DEFAULT_MEMORY_BUDGET, decode_rgb
+from utils.image_processor import ensure_heif_support
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+# タイルの一辺（ピクセル）
+TILE_SIZE = 256
+
+# 最も縮小したレベルの長辺の目安（これ以下になるまでレベルを作る）
+MIN_LEVEL_EDGE = 512
+
+# デコード済みのまま保持するレベルの数（48MPの等倍は約140MBのため、必要なレベルだけを保持する）
+MAX_DECODED_LEVELS = 2
+
+
+class TilePyramid:
+    """1枚の画像のレベルごとのデコードとタイルの切り出しを行うクラス（デコードはワーカースレッドから呼び出せる）"""
+
+    def __init__(self, image_path: str):
+        from PIL import Image
+        self.image_path = image_path
+        ensure_heif_support(image_path)
+        with Image.open(image_path) as img:
+            self.width, self.height = img.size
+
+        # レベル0が等倍、レベルが1つ上がるごとに1/2
+        self.level_count = 1
+        while max(self.width, self.height) / 2 ** (self.level_count - 1) > MIN_LEVEL_EDGE:
+            self.level_count += 1
+
+        # 1つのレベルのデコードに使うメモリの上限（等倍が上限を超える画像は等倍で表示できない）
+        self.memory_budget = DEFAULT_MEMORY_BUDGET
+        self._levels: "OrderedDict[int, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def level_size(self, level: int) -> Tuple[int, int]:
+        """指定したレベルの画像サイズ"""
+        scale = 2 ** level
+        return (math.ceil(self.width / scale), math.ceil(self.height / scale))
+
+    def tile_count(self, level: int) -> Tuple[int, int]:
+        """指定したレベルのタイルの列数・行数"""
+        width, height = self.level_size(level)
+        return (math.ceil(width / TILE_SIZE), math.ceil(height / TILE_SIZE))
+
+    def has_level(self, level: int) -> bool:
+        """指定したレベルがデコード済みかチェック"""
+        with self._lock:
+            return level in self._levels
+
+    def decode_level(self, level: int) -> "Image.Image":
+        """指定したレベルをデコード（デコード済みの場合はそのまま返す）"""
+        with self._lock:
+            image = self._levels.get(level)
+            if image is not None:
+                self._levels.move_to_end(level)
+                return image
+
+        image = self._decode(level)
+
+        with self._lock:
+            self._levels[level] = image
+            self._levels.move_to_end(level)
+            while len(self._levels) > MAX_DECODED_LEVELS:
+                self._levels.popitem(last=False)
+        return image
+
+    def crop_tile(self, level: int, column: int, row: int) -> Optional["Image.Image"]:
+        """デコード済みのレベルからタイルを切り出す（レベルが未デコードの場合はNone）"""
+        with self._lock:
+            image = self._levels.get(level)
+        if image is None:
+            return None
+        left, top = column * TILE_SIZE, row * TILE_SIZE
+        box = (left, top, min(left + TILE_SIZE, image.width), min(top + TILE_SIZE, image.height))
+        return image.crop(box)
+
+    def _decode(self, level: int) -> "Image.Image":
+        """画像を開き、指定したレベルのサイズでRGBにデコード（レベル0は画像全体）"""
+        from PIL import Image
+        size = self.level_size(level)
+        # with文で閉じると返す画像のデータも破棄されるため使用しない（load()でファイルは閉じられる）
+        img = Image.open(self.image_path)
+        # 縮小デコード・透過の合成・整数倍の縮小はメモリの上限内で行う（タイルの境目がずれないよう最後はBOX）
+        return decode_rgb(img, size, self.memory_budget, Image.Resampling.BOX)
@@ -0,0 +1,157 @@
+"""
+Tk画像転送モジュール
+Pillowの画像をTkのPhotoImageに転送する方式を、初回に実測して最も速いものに自動で切り替える
+測定結果はTk・Pillowのバージョンごとに保存し、次回以降の起動では測定しない
+どの方式も使えない場合は従来のImageTk.PhotoImageでの変換を使用する
+"""
+import json
+import logging
+import os
+import time
+import tkinter as tk
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# 方式
+METHOD_IMAGETK = "imagetk"              # 毎回ImageTk.PhotoImageを作成（従来の方式）
+METHOD_IMAGETK_PASTE = "imagetk_paste"  # 同じサイズのImageTk.PhotoImageにpasteで上書き
+METHOD_PPM = "ppm"                      # PPMのバイト列からtk.PhotoImageを作成
+METHOD_PPM_PUT = "ppm_put"              # 同じサイズのtk.PhotoImageにPPMのバイト列をputで上書き
+
+# 測定する方式（上書きする方式はサイズが変わった場合に対応する作成方式を使う）
+CANDIDATE_METHODS = (METHOD_IMAGETK, METHOD_IMAGETK_PASTE, METHOD_PPM, METHOD_PPM_PUT)
+
+# 測定結果の保存先
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".picture_rename", "blit.json")
+
+# 測定に使う画像のサイズ（プレビューの最大サイズ）と繰り返し回数
+BENCHMARK_SIZE = (800, 600)
+BENCHMARK_REPEAT = 5
+
+
+def _ppm_bytes(image: "Image.Image") -> bytes:
+    """RGB画像をPPM(P6)形式のバイト列に変換"""
+    header = f"P6 {image.width} {image.height} 255\n".encode("ascii")
+    return header + image.tobytes()
+
+
+class PhotoBlitter:
+    """Pillowの画像をPhotoImageに変換するクラス（直前に返したPhotoImageを同じサイズの画像で再利用する）"""
+
+    def __init__(self, master: Optional[tk.Misc] = None, method: Optional[str] = None,
+                 cache_path: str = DEFAULT_CACHE_PATH):
+        """method: 使用する方式（Noneは初回の変換時に測定して決める）"""
+        self.master = master
+        self.method = method
+        self.cache_path = cache_path
+        self._last_photo = None
+        self._last_kind: Optional[str] = None
+        self._last_size = None
+
+    def to_photo(self, image: "Image.Image"):
+        """
+        画像をPhotoImageに変換
+        再利用する方式では、直前に返したPhotoImageと同じサイズの場合はその内容を上書きして同じオブジェクトを返す
+        """
+        if self.method is None:
+            self.method = self._select_method()
+        if image.mode != "RGB" and self.method in (METHOD_PPM, METHOD_PPM_PUT):
+            return self._convert(METHOD_IMAGETK, image)
+        try:
+            return self._convert(self.method, image)
+        except (tk.TclError, ValueError) as e:
+            logger.warning(f"画像転送方式 {self.method} が使用できないため {METHOD_IMAGETK} に切り替えます ({e})")
+            self.method = METHOD_IMAGETK
+            return self._convert(METHOD_IMAGETK, image)
+
+    def _convert(self, method: str, image: "Image.Image"):
+        """指定した方式で変換"""
+        from PIL import ImageTk
+        reuse = (self._last_photo is not None and self._last_size == image.size and
+                 self._last_kind == method)
+
+        if method == METHOD_IMAGETK_PASTE and reuse:
+            self._last_photo.paste(image)
+            return self._last_photo
+        if method == METHOD_PPM_PUT and reuse:
+            photo = self._last_photo
+            photo.tk.call(photo.name, "put", _ppm_bytes(image), "-format", "ppm", "-to", 0, 0)
+            return photo
+
+        if method in (METHOD_PPM, METHOD_PPM_PUT):
+            photo = tk.PhotoImage(master=self.master, data=_ppm_bytes(image), format="ppm")
+        else:
+            photo = ImageTk.PhotoImage(image, master=self.master)
+
+        if method in (METHOD_IMAGETK_PASTE, METHOD_PPM_PUT):
+            self._last_photo = photo
+            self._last_kind = method
+            self._last_size = image.size
+        return photo
+
+    def _version_key(self) -> str:
+        """測定結果を保存するキー（Tk・Pillowのバージョン）"""
+        import PIL
+        root = self.master if self.master is not None else tk._default_root
+        tk_version = root.tk.call("info", "patchlevel") if root is not None else str(tk.TkVersion)
+        return f"Tk {tk_version} / Pillow {PIL.__version__}"
+
+    def _select_method(self) -> str:
+        """保存済みの測定結果があればそれを使い、なければ各方式を測定して最も速い方式を選ぶ"""
+        key = self._version_key()
+        saved = self._load_results()
+        if key in saved and saved[key] in CANDIDATE_METHODS:
+            return saved[key]
+
+        timings = self.benchmark()
+        method = min(timings, key=timings.get) if timings else METHOD_IMAGETK
+        summary = ", ".join(f"{name} {seconds * 1000:.2f}ms" for name, seconds in timings.items())
+        logger.debug(f"画像転送方式を測定しました ({key}): {summary} -> {method}")
+
+        saved[key] = method
+        self._save_results(saved)
+        return method
+
+    def benchmark(self, size=BENCHMARK_SIZE, repeat: int = BENCHMARK_REPEAT) -> Dict[str, float]:
+        """各方式で同じサイズの画像を繰り返し変換し、1回あたりの最短時間（秒）を取得（使用できない方式は除く）"""
+        from PIL import Image
+        frames = [Image.linear_gradient("L").resize(size).convert("RGB"), Image.new("RGB", size, (200, 120, 40))]
+        timings = {}
+        for method in CANDIDATE_METHODS:
+            tester = PhotoBlitter(self.master, method, self.cache_path)
+            try:
+                best = None
+                for number in range(repeat + 1):
+                    started = time.perf_counter()
+                    tester.to_photo(frames[number % 2])
+                    elapsed = time.perf_counter() - started
+                    if number > 0:  # 1回目は作成のみのため、上書きする方式の比較から除く
+                        best = elapsed if best is None else min(best, elapsed)
+                if tester.method == method:
+                    timings[method] = best
+            except (tk.TclError, ValueError) as e:
+                logger.debug(f"画像転送方式 {method} は使用できません ({e})")
+        return timings
+
+    def _load_results(self) -> Dict[str, str]:
+        """保存済みの測定結果を読み込み"""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                results = json.load(f)
+            return results if isinstance(results, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_results(self, results: Dict[str, str]):
+        """測定結果を保存"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"画像転送方式の測定結果を保存できませんでした: {e}")
@@ -0,0 +1,601 @@
+"""
+xlsx高速読み込みモジュール
+openpyxlのセルオブジェクトを生成せず、xlsx(zip)内のシートXMLと共有文字列を
+逐次パースして必要な列の値だけを取り出す
+
+共有文字列とシートXMLはまず正規表現による走査（要求列のセルだけをCレベルで抽出）で読み、
+想定外の書式（属性順の違い、名前空間プレフィックス、CDATAなど）を検出した場合は
+ElementTreeの逐次パースに切り替える
+
+日付の表示形式（組み込み・ユーザー定義）のセルは、openpyxlと同じ規則でstyles.xmlから判定し、
+datetime/date/time/timedeltaに変換する
+"""
+import datetime
+import html
+import logging
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import fromstring, iterparse
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# SpreadsheetML / OPC の名前空間
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+DOC_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW_TAG = SHEET_NS + "row"
+_CELL_TAG = SHEET_NS + "c"
+_VALUE_TAG = SHEET_NS + "v"
+_FORMULA_TAG = SHEET_NS + "f"
+_INLINE_TAG = SHEET_NS + "is"
+_SI_TAG = SHEET_NS + "si"
+_T_TAG = SHEET_NS + "t"
+_R_TAG = SHEET_NS + "r"
+
+# 正規表現による高速走査で使用するパターン
+_CHUNK_SIZE = 1 << 22
+_ROW_END = b"</row>"
+_CELL_ATTR_TYPE_RE = re.compile(r'\bt="(\w+)"')
+_CELL_VALUE_RE = re.compile(r"<v(?:\s[^>]*)?>([^<]*)</v>")
+_CELL_FORMULA_RE = re.compile(r"<f(?:\s[^>]*)?(?:/>|>([^<]*)</f>)")
+_SIMPLE_TEXT_RE = re.compile(r"<t(?:\s[^>]*)?>([^<]*)</t>|<t(?:\s[^>]*)?/>")
+_SI_RE = re.compile(r"<si><t(?: [^>]*)?>([^<]*)</t></si>|<si>(.*?)</si>|<si/>", re.DOTALL)
+_XML_ENCODING_RE = re.compile(rb'<\?xml[^>]*encoding="([^"]+)"')
+_CELL_ATTR_STYLE_RE = re.compile(r'\bs="(\d+)"')
+
+# 表示形式（openpyxl 3.1のstyles/numbers.pyと同じ規則）
+STYLES_PATH = "xl/styles.xml"
+# 組み込みの表示形式のうち日付・時刻のもの（numFmtId -> 書式）
+_BUILTIN_DATE_FORMATS = {
+    14: "mm-dd-yy", 15: "d-mmm-yy", 16: "d-mmm", 17: "mmm-yy", 18: "h:mm AM/PM",
+    19: "h:mm:ss AM/PM", 20: "h:mm", 21: "h:mm:ss", 22: "m/d/yy h:mm",
+    45: "mm:ss", 46: "[h]:mm:ss", 47: "mmss.0",
+}
+# 判定の前に除く部分（引用符で囲んだ文字列と、[h]・[m]・[s]以外の[]）
+_FORMAT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_DATE_CODE_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_TIMEDELTA_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+
+# シリアル値の起点（1900年基準と1904年基準）
+WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+MAC_EPOCH = datetime.datetime(1904, 1, 1)
+_SECONDS_PER_DAY = 86400
+
+# t="d" のセルの値（ISO 8601の日時と期間）
+_ISO_RE = re.compile(
+    r"(?P<date>(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2}))?T?"
+    r"(?P<time>(?P<hour>\d{2}):(?P<minute>\d{2})(:(?P<second>\d{2})(?P<microsecond>\.\d{1,3})?)?)?Z?"
+)
+_ISO_DURATION_RE = re.compile(r"PT((?P<hours>\d+)H)?((?P<minutes>\d+)M)?((?P<seconds>\d+(\.\d{1,3})?)S)?")
+
+# 日付の範囲外のシリアル値を持つ日付のセルの値（openpyxlと同じ）
+INVALID_DATE_VALUE = "#VALUE!"
+
+
+class _FastPathUnsupported(Exception):
+    """正規表現による走査で扱えない書式を検出した"""
+
+
+def column_index(cell_ref: str) -> int:
+    """セル参照（例: "AB12"）から0始まりの列インデックスを取得"""
+    index = 0
+    for char in cell_ref:
+        if "A" <= char <= "Z":
+            index = index * 26 + (ord(char) - 64)
+        else:
+            break
+    return index - 1
+
+
+def column_letter(index: int) -> str:
+    """0始まりの列インデックスから列記号（例: 27 -> "AB"）を取得"""
+    letters = ""
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _rich_text_content(node) -> str:
+    """<si>/<is>要素からテキストを取得（ふりがな(rPh)は除外、openpyxlと同じ扱い）"""
+    snippets = []
+    plain = node.find(_T_TAG)
+    if plain is not None and plain.text:
+        snippets.append(plain.text)
+    for run in node.findall(_R_TAG):
+        text = run.find(_T_TAG)
+        if text is not None and text.text:
+            snippets.append(text.text)
+    return "".join(snippets)
+
+
+def _unescape(text: str) -> str:
+    """XMLの文字参照を展開"""
+    return html.unescape(text) if "&" in text else text
+
+
+def _unescape_shared_string(text: str) -> str:
+    """
+    共有文字列のOOXMLのエスケープを展開（openpyxlと同じ扱い）
+    openpyxlは「_」自体のエスケープ（_x005F_）だけを戻し、制御文字の _xHHHH_ は文字列のまま返す
+    """
+    return text.replace("x005F_", "") if "x005F_" in text else text
+
+
+def is_date_format(code: Optional[str]) -> bool:
+    """表示形式が日付・時刻かチェック（先頭の区分だけを見る）"""
+    if code is None:
+        return False
+    code = _FORMAT_STRIP_RE.sub("", code.split(";")[0])
+    return _DATE_CODE_RE.search(code) is not None
+
+
+def is_timedelta_format(code: Optional[str]) -> bool:
+    """表示形式が経過時間（[h]:mm:ssなど）かチェック"""
+    if code is None:
+        return False
+    return _TIMEDELTA_RE.search(code.split(";")[0]) is not None
+
+
+def from_excel(value, epoch: datetime.datetime = WINDOWS_EPOCH, timedelta: bool = False):
+    """シリアル値をdatetime（1未満はtime、経過時間の形式はtimedelta）に変換"""
+    if timedelta:
+        delta = datetime.timedelta(days=value)
+        if delta.microseconds:
+            # ミリ秒単位に丸める
+            delta = datetime.timedelta(seconds=delta.total_seconds() // 1,
+                                       microseconds=round(delta.microseconds, -3))
+        return delta
+
+    day, fraction = divmod(value, 1)
+    diff = datetime.timedelta(milliseconds=round(fraction * _SECONDS_PER_DAY * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        minutes, seconds = divmod(diff.seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return datetime.time(hours, minutes, seconds, diff.microseconds)
+    # 1900年基準では、存在しない1900年2月29日の分をずらす
+    if 0 < value < 60 and epoch == WINDOWS_EPOCH:
+        day += 1
+    return epoch + datetime.timedelta(days=day) + diff
+
+
+def from_iso8601(text: str):
+    """t="d" のセルの値（ISO 8601）をdatetime/date/time/timedeltaに変換"""
+    if not text:
+        return None
+    match = _ISO_RE.match(text)
+    if match and any(match.groups()):
+        parts = match.groupdict(0)
+        for key in ("year", "month", "day", "hour", "minute", "second"):
+            if parts[key]:
+                parts[key] = int(parts[key])
+        if parts["microsecond"]:
+            parts["microsecond"] = int(float(parts["microsecond"]) * 1_000_000)
+        if not parts["date"]:
+            return datetime.time(parts["hour"], parts["minute"], parts["second"], parts["microsecond"])
+        if not parts["time"]:
+            return datetime.date(parts["year"], parts["month"], parts["day"])
+        return datetime.datetime(parts["year"], parts["month"], parts["day"], parts["hour"],
+                                 parts["minute"], parts["second"], parts["microsecond"])
+    match = _ISO_DURATION_RE.match(text)
+    if match and any(match.groups()):
+        return datetime.timedelta(**{key: float(value) for key, value in match.groupdict(0).items()})
+    raise ValueError(f"日時の値が不正です: {text}")
+
+
+def _inner_text_content(inner: str) -> str:
+    """<si>/<is>の内側のXML文字列からテキストを取得"""
+    simple = _SIMPLE_TEXT_RE.fullmatch(inner)
+    if simple:
+        return _unescape(simple.group(1) or "")
+    node = fromstring(f'<si xmlns="{SHEET_NS[1:-1]}">{inner}</si>')
+    return _rich_text_content(node)
+
+
+def _check_utf8(head: bytes):
+    """XML宣言のエンコーディングがUTF-8であることを確認"""
+    match = _XML_ENCODING_RE.match(head.lstrip())
+    if match and match.group(1).lower() not in (b"utf-8", b"utf8"):
+        raise _FastPathUnsupported("UTF-8以外のエンコーディング")
+
+
+def _cast_number(value: str):
+    """数値文字列をopenpyxlと同じ規則でint/floatに変換"""
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class XlsxStreamReader:
+    """
+    xlsxのシートを逐次読み込むクラス（openpyxlのread_only読み込みと同じ値を返す）
+    初期状態ではアクティブシートを読み、select_sheet()で別のシートに切り替えられる
+    """
+
+    def __init__(self, file_path: str, sheet_name: Optional[str] = None):
+        self.file_path = file_path
+        self._zip = zipfile.ZipFile(file_path)
+        self._shared_strings: Optional[List[str]] = None
+        self._epoch = WINDOWS_EPOCH
+        # 日付・経過時間の表示形式のセルの書式番号（s属性の文字列）
+        self._date_styles: Set[str] = set()
+        self._timedelta_styles: Set[str] = set()
+        try:
+            self._sheet_paths, active_name = self._read_sheet_paths()
+            self.sheet_name = active_name
+            self.sheet_path = self._sheet_paths[active_name]
+            if sheet_name is not None:
+                self.select_sheet(sheet_name)
+            self._read_date_styles()
+        except Exception:
+            self._zip.close()
+            raise
+
+    def _read_sheet_paths(self) -> Tuple[Dict[str, str], str]:
+        """workbook.xmlとリレーションから シート名 -> XMLパス とアクティブシート名を取得"""
+        workbook_path = "xl/workbook.xml"
+        with self._zip.open("_rels/.rels") as source:
+            for _, node in iterparse(source):
+                if node.tag == PKG_REL_NS + "Relationship" and node.get("Type", "").endswith("/officeDocument"):
+                    workbook_path = node.get("Target").lstrip("/")
+                    break
+
+        active_tab = 0
+        sheets = []  # (シート名, リレーションID)
+        with self._zip.open(workbook_path) as source:
+            for _, node in iterparse(source):
+                if node.tag == SHEET_NS + "workbookView":
+                    active_tab = int(node.get("activeTab", 0))
+                elif node.tag == SHEET_NS + "workbookPr":
+                    if node.get("date1904", "").lower() in ("1", "true"):
+                        self._epoch = MAC_EPOCH
+                elif node.tag == SHEET_NS + "sheet":
+                    sheets.append((node.get("name"), node.get(DOC_REL_NS + "id")))
+
+        if not sheets:
+            raise ValueError("ワークブックにシートがありません")
+        if active_tab >= len(sheets):
+            active_tab = 0
+
+        base_dir = posixpath.dirname(workbook_path)
+        rels_path = posixpath.join(base_dir, "_rels", posixpath.basename(workbook_path) + ".rels")
+        targets: Dict[str, str] = {}
+        with self._zip.open(rels_path) as source:
+            for _, node in iterparse(source):
+                if node.tag == PKG_REL_NS + "Relationship":
+                    targets[node.get("Id")] = node.get("Target")
+
+        sheet_paths: Dict[str, str] = {}
+        for name, rel_id in sheets:
+            target = targets[rel_id]
+            if target.startswith("/"):
+                sheet_paths[name] = target.lstrip("/")
+            else:
+                sheet_paths[name] = posixpath.normpath(posixpath.join(base_dir, target))
+        return sheet_paths, sheets[active_tab][0]
+
+    def _read_date_styles(self):
+        """styles.xmlのセルの書式（cellXfs）から、日付・経過時間の表示形式の書式番号を取得"""
+        try:
+            source = self._zip.open(STYLES_PATH)
+        except KeyError:
+            return
+        custom_formats: Dict[int, str] = {}
+        format_ids: List[int] = []
+        in_cell_xfs = False
+        with source:
+            for event, node in iterparse(source, events=("start", "end")):
+                tag = node.tag
+                if tag == SHEET_NS + "cellXfs":
+                    in_cell_xfs = event == "start"
+                elif event == "end" and tag == SHEET_NS + "numFmt":
+                    custom_formats[int(node.get("numFmtId"))] = node.get("formatCode")
+                elif event == "end" and tag == SHEET_NS + "xf" and in_cell_xfs:
+                    format_ids.append(int(node.get("numFmtId", 0)))
+
+        for index, format_id in enumerate(format_ids):
+            code = custom_formats.get(format_id, _BUILTIN_DATE_FORMATS.get(format_id))
+            if is_date_format(code):
+                self._date_styles.add(str(index))
+            if is_timedelta_format(code):
+                self._timedelta_styles.add(str(index))
+
+    def _number_value(self, value: str, style: str):
+        """数値のセルの値を取得（日付の表示形式の場合は日時に変換）"""
+        number = _cast_number(value)
+        if style not in self._date_styles:
+            return number
+        try:
+            return from_excel(number, self._epoch, style in self._timedelta_styles)
+        except (OverflowError, ValueError):
+            return INVALID_DATE_VALUE
+
+    def sheet_names(self) -> List[str]:
+        """シート名のリストを取得（ブック内の順序）"""
+        return list(self._sheet_paths)
+
+    def select_sheet(self, sheet_name: str):
+        """読み込むシートを切り替える（共有文字列は再利用される）"""
+        if sheet_name not in self._sheet_paths:
+            raise KeyError(f"シート「{sheet_name}」が見つかりません")
+        self.sheet_name = sheet_name
+        self.sheet_path = self._sheet_paths[sheet_name]
+
+    def _load_shared_strings(self) -> List[str]:
+        """共有文字列テーブルを読み込む（初回のみ）"""
+        if self._shared_strings is not None:
+            return self._shared_strings
+
+        try:
+            data = self._zip.read("xl/sharedStrings.xml")
+        except KeyError:
+            self._shared_strings = []
+            return self._shared_strings
+
+        try:
+            strings = self._parse_shared_strings_fast(data)
+        except _FastPathUnsupported:
+            strings = self._parse_shared_strings_generic()
+
+        self._shared_strings = [_unescape_shared_string(text) for text in strings]
+        return self._shared_strings
+
+    def _parse_shared_strings_fast(self, data: bytes) -> List[str]:
+        """共有文字列を正規表現で走査して取得"""
+        _check_utf8(data[:200])
+        if b"<![CDATA[" in data:
+            raise _FastPathUnsupported("CDATAセクション")
+
+        strings = []
+        for simple, inner in _SI_RE.findall(data.decode("utf-8")):
+            if inner:
+                strings.append(_inner_text_content(inner))
+            else:
+                strings.append(_unescape(simple))
+
+        # プレフィックス付きの<x:si>などは拾えないため、件数が合わなければ汎用パースに切り替え
+        if len(strings) != data.count(b"<si>") + data.count(b"<si/>") or (
+                not strings and b"si>" in data):
+            raise _FastPathUnsupported("共有文字列の書式")
+        return strings
+
+    def _parse_shared_strings_generic(self) -> List[str]:
+        """共有文字列をElementTreeで逐次パースして取得"""
+        strings = []
+        with self._zip.open("xl/sharedStrings.xml") as source:
+            for _, node in iterparse(source):
+                if node.tag == _SI_TAG:
+                    strings.append(_rich_text_content(node))
+                    node.clear()
+        return strings
+
+    def _parse_cell(self, cell, shared_strings: List[str]):
+        """<c>要素から値を取得"""
+        data_type = cell.get("t", "n")
+
+        formula = cell.find(_FORMULA_TAG)
+        if formula is not None:
+            return "=" + (formula.text or "")
+
+        if data_type == "inlineStr":
+            inline = cell.find(_INLINE_TAG)
+            return _rich_text_content(inline) if inline is not None else None
+
+        value_node = cell.find(_VALUE_TAG)
+        if value_node is None or value_node.text is None:
+            return None
+        value = value_node.text
+
+        if data_type == "s":
+            return shared_strings[int(value)]
+        if data_type == "n":
+            return self._number_value(value, cell.get("s", "0"))
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_iso8601(value)
+        return value  # str, e(エラー値)
+
+    def header_row(self) -> Tuple:
+        """1行目の値をタプルで取得"""
+        for row in self.iter_rows(min_row=1, max_row=1):
+            return row
+        return ()
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None,
+                  columns: Optional[Iterable[int]] = None) -> Iterator[Tuple]:
+        """
+        行の値をタプルで順に返す
+        columnsを指定した場合はその列だけを解析し、それ以外の列はNoneになる
+        （タプルの長さは指定列の最大インデックス+1、指定列にセルがない行は返さないことがある）
+        """
+        shared_strings = self._load_shared_strings()
+        wanted: Optional[Set[int]] = set(columns) if columns is not None else None
+        last_row = 0
+
+        if wanted:
+            try:
+                for row_number, row in self._iter_rows_fast(min_row, max_row, wanted, shared_strings):
+                    last_row = row_number
+                    yield row
+                return
+            except _FastPathUnsupported as e:
+                logger.debug(f"シートを汎用パーサーで読み込みます ({e})")
+
+        # 高速走査の途中で切り替えた場合は、返却済みの行をスキップして続きから返す
+        for row_number, row in self._iter_rows_generic(max(min_row, last_row + 1), max_row,
+                                                       wanted, shared_strings):
+            yield row
+
+    def _iter_rows_fast(self, min_row: int, max_row: Optional[int], wanted: Set[int],
+                        shared_strings: List[str]) -> Iterator[Tuple[int, Tuple]]:
+        """要求列のセルだけを正規表現で抽出して (行番号, 値タプル) を返す"""
+        width = max(wanted) + 1
+        letters = "|".join(sorted((column_letter(i) for i in wanted), key=len, reverse=True))
+        # 一般的な属性順 (r, s, t) と <v> だけ・書式なしのインライン文字列だけのセルは
+        # 正規表現のグループで直接取り出す
+        cell_re = re.compile(
+            rf'<c r="({letters})(\d+)"(?: s="(\d+)")?(?: t="(\w+)")?([^>]*?)'
+            rf'(?:/>|><v>([^<]*)</v></c>|><is><t(?: [^>]*)?>([^<]+)</t></is></c>|>(.*?)</c>)',
+            re.DOTALL
+        )
+        column_of = {column_letter(i): i for i in wanted}
+        date_styles = self._date_styles
+
+        current_text = ""
+        current_row = 0
+        row: Optional[List] = None
+
+        with self._zip.open(self.sheet_path) as source:
+            pending = b""
+            head_checked = False
+            while True:
+                chunk = source.read(_CHUNK_SIZE)
+                data = pending + chunk
+                if not head_checked:
+                    _check_utf8(data[:200])
+                    head_checked = True
+                if chunk:
+                    cut = data.rfind(_ROW_END)
+                    if cut < 0:
+                        pending = data
+                        continue
+                    cut += len(_ROW_END)
+                    data, pending = data[:cut], data[cut:]
+                elif not data:
+                    break
+                else:
+                    pending = b""
+
+                # r属性が先頭にないセルや名前空間プレフィックスは扱えない
+                if (data.count(b"<c ") != data.count(b'<c r="') or b"<c>" in data
+                        or b"<![CDATA[" in data or b":c " in data or b":row" in data):
+                    raise _FastPathUnsupported("シートXMLの書式")
+
+                text = data.decode("utf-8")
+                for letter, row_text, style, data_type, rest, value, inline, inner in cell_re.findall(text):
+                    if row_text != current_text:
+                        if row is not None and current_row >= min_row:
+                            yield current_row, tuple(row)
+                        current_text = row_text
+                        current_row = int(row_text)
+                        row = [None] * width
+                        if max_row is not None and current_row > max_row:
+                            return
+                    if current_row < min_row:
+                        continue
+                    if inline and data_type == "inlineStr":
+                        row[column_of[letter]] = _unescape(inline)
+                        continue
+                    if value and not rest:
+                        if data_type == "s":
+                            row[column_of[letter]] = shared_strings[int(value)]
+                            continue
+                        if (not data_type or data_type == "n") and style not in date_styles:
+                            row[column_of[letter]] = _cast_number(value)
+                            continue
+                    if value or inner:
+                        attrs = f' t="{data_type}"{rest}' if data_type else rest
+                        if style:
+                            attrs = f' s="{style}"{attrs}'
+                        parsed = self._parse_cell_text(attrs, inner or f"<v>{value}</v>", shared_strings)
+                        if parsed is not None:
+                            row[column_of[letter]] = parsed
+
+                if not chunk:
+                    break
+
+        if row is not None and current_row >= min_row and (max_row is None or current_row <= max_row):
+            yield current_row, tuple(row)
+
+    def _parse_cell_text(self, attrs: str, inner: Optional[str], shared_strings: List[str]):
+        """正規表現で抽出したセルの属性と内側のXMLから値を取得"""
+        if not inner:
+            return None
+        type_match = _CELL_ATTR_TYPE_RE.search(attrs)
+        data_type = type_match.group(1) if type_match else "n"
+        style_match = _CELL_ATTR_STYLE_RE.search(attrs)
+        style = style_match.group(1) if style_match else "0"
+
+        if "<f" in inner:
+            formula = _CELL_FORMULA_RE.search(inner)
+            if formula:
+                return "=" + _unescape(formula.group(1) or "")
+
+        if data_type == "inlineStr":
+            start = inner.find("<is>")
+            end = inner.rfind("</is>")
+            if start < 0 or end < 0:
+                return None
+            return _inner_text_content(inner[start + 4:end])
+
+        value_match = _CELL_VALUE_RE.search(inner)
+        if value_match is None:
+            return None
+        value = value_match.group(1)
+
+        if data_type == "s":
+            return shared_strings[int(value)]
+        if data_type == "n":
+            return self._number_value(value, style)
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_iso8601(value)
+        return _unescape(value)  # str, e(エラー値)
+
+    def _iter_rows_generic(self, min_row: int, max_row: Optional[int], wanted: Optional[Set[int]],
+                           shared_strings: List[str]) -> Iterator[Tuple[int, Tuple]]:
+        """ElementTreeで逐次パースして (行番号, 値タプル) を返す"""
+        width = max(wanted) + 1 if wanted else 0
+
+        with self._zip.open(self.sheet_path) as source:
+            row_number = 0
+            values: Dict[int, object] = {}
+            col = -1
+            for event, node in iterparse(source, events=("start", "end")):
+                tag = node.tag
+                if tag == _CELL_TAG:
+                    if event == "start":
+                        continue
+                    ref = node.get("r")
+                    col = column_index(ref) if ref else col + 1
+                    if wanted is None or col in wanted:
+                        value = self._parse_cell(node, shared_strings)
+                        if value is not None:
+                            values[col] = value
+                    node.clear()
+                elif tag == _ROW_TAG:
+                    if event == "start":
+                        number = node.get("r")
+                        row_number = int(number) if number else row_number + 1
+                        values = {}
+                        col = -1
+                        continue
+                    node.clear()
+                    if row_number < min_row:
+                        continue
+                    if max_row is not None and row_number > max_row:
+                        return
+                    if wanted is None:
+                        size = max(values) + 1 if values else 0
+                        yield row_number, tuple(values.get(i) for i in range(size))
+                    else:
+                        yield row_number, tuple(values.get(i) for i in range(width))
+                    if max_row is not None and row_number >= max_row:
+                        return
+
+    def close(self):
+        """zipファイルを閉じる"""
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()